@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Benchmark for starting agent processes with and without the forkserver.
+
+Starts a number of no-op agents the way the AIP does, first with a new
+interpreter per agent and then forked from the pre-warmed forkserver
+(volttron --agent-forkserver). Each no-op agent imports the modules a
+typical agent imports, prints a line and waits to be stopped. The wall
+time until every agent has printed its line is reported, along with
+the memory used by the agents.
+
+Pss is the resident memory with pages shared between processes divided
+among them, so it shows the savings from sharing the forkserver's
+imported modules. It is only reported where psutil can provide it.
+
+Example:
+
+    python agent_launch_benchmark.py --agents 50
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+import gevent
+from gevent import subprocess
+from gevent.subprocess import PIPE
+import psutil
+
+from volttron.platform.aip import process_wait
+from volttron.platform.forkserver import ForkServer
+
+
+NOOP_AGENT = """
+import time
+from volttron.platform.agent import utils
+from volttron.platform.vip.agent import Agent, Core, RPC
+from volttron.platform.messaging import headers, topics
+print('ready')
+time.sleep(3600)
+"""
+
+
+def agent_environ(index):
+    environ = os.environ.copy()
+    environ['PYTHONPATH'] = ':'.join(sys.path)
+    environ['AGENT_UUID'] = 'noop-{}'.format(index)
+    environ['AGENT_VIP_IDENTITY'] = 'noop.{}'.format(index)
+    environ['_LAUNCHED_BY_PLATFORM'] = '1'
+    return environ
+
+
+def spawn_subprocess(argv, cwd, env):
+    return subprocess.Popen(argv, cwd=cwd, env=env, close_fds=True,
+                            stdin=open(os.devnull), stdout=PIPE, stderr=PIPE)
+
+
+def memory(pids):
+    rss = pss = 0
+    for pid in pids:
+        process = psutil.Process(pid)
+        try:
+            info = process.memory_full_info()
+        except (AttributeError, psutil.AccessDenied):
+            info = process.memory_info()
+        rss += info.rss
+        pss += getattr(info, 'pss', 0)
+    return rss, pss or None
+
+
+def run(name, spawn, agents, launcher_pid=None):
+    argv = [sys.executable, '-c', NOOP_AGENT]
+    cwd = os.getcwd()
+
+    start = time.time()
+    processes = [spawn(argv, cwd, agent_environ(index)) for index in xrange(agents)]
+    spawned = time.time()
+    ready = gevent.joinall([gevent.spawn(process.stdout.readline) for process in processes])
+    finished = time.time()
+
+    failed = [process.pid for process, greenlet in zip(processes, ready)
+              if greenlet.value != 'ready\n']
+    pids = [process.pid for process in processes]
+    rss, pss = memory(pids)
+    result = {"agents": agents,
+              "failed": len(failed),
+              "spawn_seconds": spawned - start,
+              "ready_seconds": finished - start,
+              "agents_per_second": agents / (finished - start),
+              "rss_bytes": rss,
+              "rss_bytes_per_agent": rss / agents,
+              "pss_bytes": pss,
+              "pss_bytes_per_agent": pss / agents if pss else None}
+    if launcher_pid is not None:
+        result["launcher_rss_bytes"], result["launcher_pss_bytes"] = memory([launcher_pid])
+
+    for process in processes:
+        process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            gevent.with_timeout(5, process_wait, process)
+        except gevent.Timeout:
+            process.kill()
+
+    print("{}: {}".format(name, json.dumps(result, indent=4, sort_keys=True)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=50,
+                        help="no-op agents to start")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {"subprocess": run("subprocess", spawn_subprocess, args.agents)}
+
+    forkserver = ForkServer()
+    forkserver.start()
+    try:
+        # Wait for the forkserver to finish importing before timing.
+        probe = forkserver.spawn([sys.executable, '-c', 'pass'], os.getcwd(), agent_environ(-1))
+        gevent.with_timeout(60, process_wait, probe)
+        results["forkserver"] = run("forkserver", forkserver.spawn, args.agents,
+                                    forkserver.process.pid)
+    finally:
+        forkserver.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
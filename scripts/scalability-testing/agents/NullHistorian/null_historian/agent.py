@@ -55,6 +55,7 @@
 
 import logging
 import sys
+import time
 
 from volttron.platform.vip.agent import *
 from volttron.platform.agent.base_historian import BaseHistorian, add_timing_data_to_header
@@ -80,6 +81,8 @@ def historian(config_path, **kwargs):
             if self._gather_timing_data:
                 self._turnaround_times = []
 
+            self.reset_statistics()
+
         @Core.receiver("onstart")
         def starting(self, sender, **kwargs):
             
@@ -105,8 +108,43 @@ def historian(config_path, **kwargs):
             _log.debug("recieved {} items to publish"
                        .format(len(to_publish_list)))
 
+            now = time.time()
+            if self._first_batch_time is None:
+                self._first_batch_time = now
+                self._first_batch_size = len(to_publish_list)
+            self._last_batch_time = now
+            self._records_handled += len(to_publish_list)
+            self._batches_handled += 1
+
             self.report_all_handled()
 
+        @RPC.export
+        def get_statistics(self):
+            """Return ingest statistics since the last reset.
+
+            The ingest rate is measured from the arrival of the first
+            batch so the time spent waiting for data is not counted.
+            """
+            rate = None
+            if self._batches_handled > 1:
+                elapsed = self._last_batch_time - self._first_batch_time
+                if elapsed > 0:
+                    records = self._records_handled - self._first_batch_size
+                    rate = records / elapsed
+            return {"records": self._records_handled,
+                    "batches": self._batches_handled,
+                    "first_batch_time": self._first_batch_time,
+                    "last_batch_time": self._last_batch_time,
+                    "ingest_rate": rate}
+
+        @RPC.export
+        def reset_statistics(self):
+            self._records_handled = 0
+            self._batches_handled = 0
+            self._first_batch_size = 0
+            self._first_batch_time = None
+            self._last_batch_time = None
+
         def query_historian(self, topic, start=None, end=None, agg_type=None,
               agg_period=None, skip=0, count=None, order="FIRST_TO_LAST"):
             """Not implemented
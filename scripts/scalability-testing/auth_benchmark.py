@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Benchmark for authentication and capability lookups.
+
+Loads a number of auth entries into an AuthService, a few of them with
+regular expression credentials, and times:
+
+  * ZAP authentication of connecting agents (AuthService.authenticate)
+  * capability lookups by the auth service (get_capabilities)
+  * the capability check an agent makes on each call to an RPC method
+    exported with RPC.allow
+
+The indexed lookups are compared with the previous linear scans and the
+agent's cached capability sets with building a set on every call.
+
+Example:
+
+    python auth_benchmark.py --entries 5000 --rpc-calls 10000
+"""
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+
+import gevent.local
+
+from volttron.platform.auth import AuthEntry, AuthService, load_user
+from volttron.platform.vip.agent import Agent, RPC
+from volttron.platform.vip.socket import Message
+
+
+class LegacyAuthService(AuthService):
+    def authenticate(self, domain, address, mechanism, credentials):
+        for entry in self.auth_entries:
+            if entry.match(domain, address, mechanism, credentials):
+                return entry.user_id
+
+    def get_authorizations(self, user_id):
+        use_parts = True
+        try:
+            domain, address, mechanism, credentials = load_user(user_id)
+        except ValueError:
+            use_parts = False
+        for entry in self.auth_entries:
+            if entry.user_id == user_id:
+                return [entry.capabilities, entry.groups, entry.roles]
+            elif use_parts:
+                if entry.match(domain, address, mechanism, [credentials]):
+                    return entry.capabilities, entry.groups, entry.roles
+
+
+def make_key(index):
+    return '{:043d}'.format(index)
+
+
+def make_entries(count, regex_count):
+    entries = [AuthEntry(credentials=make_key(index),
+                         user_id='agent{}'.format(index),
+                         capabilities=['cap{}'.format(index % 10)])
+               for index in xrange(count - regex_count)]
+    entries.extend(AuthEntry(credentials='/{:02d}x.*/'.format(index),
+                             user_id='regex{}'.format(index))
+                   for index in xrange(regex_count))
+    entries.sort()
+    return entries
+
+
+def time_calls(func, args_list):
+    start = time.time()
+    for args in args_list:
+        func(*args)
+    elapsed = time.time() - start
+    return {"calls": len(args_list),
+            "seconds": elapsed,
+            "calls_per_second": len(args_list) / elapsed}
+
+
+def bench_service(service_class, entries, lookups, auth_file):
+    service = service_class(auth_file, None, address='inproc://vip',
+                            identity='auth')
+    if service_class is AuthService:
+        service._index_entries(entries)
+    service.auth_entries = entries
+
+    rand = random.Random(0)
+    users = [rand.choice(entries).user_id for _ in xrange(lookups)]
+    zap = [('vip', 'tcp://127.0.0.1', 'CURVE', [make_key(rand.randrange(len(entries)))])
+           for _ in xrange(lookups)]
+    return {"authenticate": time_calls(service.authenticate, zap),
+            "get_capabilities": time_calls(service.get_capabilities,
+                                           [(user,) for user in users])}
+
+
+def legacy_check(agent, required_caps):
+    def checked_method():
+        user = str(agent.vip.rpc.context.vip_message.user)
+        caps = agent.vip.auth.get_capabilities(user)
+        if not required_caps <= set(caps):
+            raise RuntimeError('unauthorized')
+    return checked_method
+
+
+def bench_rpc_checks(entries, calls):
+    agent = Agent(address='inproc://vip', identity='bench')
+    auth = agent.vip.auth
+    auth._user_to_capabilities = {entry.user_id: entry.capabilities
+                                  for entry in entries}
+    auth._dirty = False
+    rpc = agent.vip.rpc
+    rpc.context = gevent.local.local()
+
+    required = {'cap1'}
+    method = RPC.allow('cap1')(lambda: None)
+    checks = {"cached": rpc._add_auth_check(method, required),
+              "legacy": legacy_check(agent, required)}
+    users = ['agent{}'.format(index * 10 + 1) for index in xrange(100)]
+
+    results = {}
+    for name, check in checks.items():
+        start = time.time()
+        for call in xrange(calls):
+            rpc.context.vip_message = Message(user=users[call % len(users)])
+            check()
+        elapsed = time.time() - start
+        results[name] = {"calls": calls, "seconds": elapsed,
+                         "calls_per_second": calls / elapsed}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=5000,
+                        help="auth entries to load")
+    parser.add_argument("--regex-entries", type=int, default=50,
+                        help="entries with regular expression credentials")
+    parser.add_argument("--lookups", type=int, default=2000,
+                        help="authentications and capability lookups to time")
+    parser.add_argument("--rpc-calls", type=int, default=10000,
+                        help="protected RPC calls to check")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries, args.regex_entries)
+    tempdir = tempfile.mkdtemp()
+    try:
+        results = {}
+        for name, service_class in (("indexed", AuthService),
+                                    ("legacy", LegacyAuthService)):
+            results[name] = bench_service(service_class, entries, args.lookups,
+                                          tempdir + '/auth.json')
+        results["rpc_checks"] = bench_rpc_checks(entries, args.rpc_calls)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=4, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,650 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Single host scalability benchmark for the master driver, message bus and
+historian.
+
+Starts a throw away platform, a NullHistorian and the Master Driver
+Agent with N fake, virtual Modbus or virtual BACnet devices, sweeps the
+device and point counts and writes the results as JSON. Everything runs
+on the loopback interface so no remote hosts are required.
+
+Example:
+
+    python benchmark.py --device-type fake --devices 10,100 --points 6,48 \\
+        --output results.json
+
+Each run records:
+
+- The total time for all devices to publish (from the master driver's
+  scalability test mode).
+- Scrape to publish latency of the device all publishes.
+- Message bus messages per second seen by a subscriber.
+- Historian ingest rate.
+- CPU time and RSS of the platform, driver, historian and virtual devices.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import platform as host_platform
+import shutil
+import sys
+import tempfile
+import time
+
+import gevent
+from gevent.subprocess import Popen
+import psutil
+
+from volttron.platform import __version__ as volttron_version
+from volttron.platform.agent import utils
+from volttron.platform.agent import math_utils
+from volttron.platform.agent.known_identities import (CONFIGURATION_STORE,
+                                                      PLATFORM_DRIVER)
+from volttron.platform.messaging import headers as headers_mod
+from volttron.platform.vip.agent import Agent
+from volttrontesting.utils.platformwrapper import PlatformWrapper
+
+from config_builder import BACnetConfig, ModbusConfig, FakeConfig
+
+_log = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+VOLTTRON_ROOT = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..'))
+VIRTUAL_DRIVERS_DIR = os.path.join(BENCHMARK_DIR, 'virtual-drivers')
+
+MASTER_DRIVER_DIR = os.path.join(VOLTTRON_ROOT, 'services', 'core',
+                                 'MasterDriverAgent')
+BACNET_PROXY_DIR = os.path.join(VOLTTRON_ROOT, 'services', 'core',
+                                'BACnetProxy')
+NULL_HISTORIAN_DIR = os.path.join(BENCHMARK_DIR, 'agents', 'NullHistorian')
+
+NULL_HISTORIAN_IDENTITY = 'nullhistorian'
+BACNET_PROXY_IDENTITY = 'platform.bacnet_proxy'
+# Published by the master driver when a scalability test finishes.
+SCALABILITY_TEST_RESULTS_TOPIC = 'scalability/master_driver/results'
+
+LOOPBACK = '127.0.0.1'
+
+device_config_classes = {"bacnet": BACnetConfig,
+                         "modbus": ModbusConfig,
+                         "fake": FakeConfig}
+
+
+def build_registry(device_type, point_count, path):
+    """Write a registry configuration with point_count float points."""
+    if device_type == 'fake':
+        fields = ['Point Name', 'Volttron Point Name', 'Units',
+                  'Units Details', 'Writable', 'Starting Value', 'Type',
+                  'Notes']
+        rows = [{'Point Name': 'Point{}'.format(i),
+                 'Volttron Point Name': 'Point{}'.format(i),
+                 'Units': 'F',
+                 'Units Details': '-100 to 300',
+                 'Writable': 'FALSE',
+                 'Starting Value': '50',
+                 'Type': 'float',
+                 'Notes': ''} for i in range(point_count)]
+    elif device_type == 'modbus':
+        fields = ['Reference Point Name', 'Volttron Point Name', 'Units',
+                  'Units Details', 'Modbus Register', 'Writable',
+                  'Point Address', 'Notes']
+        # Floats take two registers.
+        rows = [{'Reference Point Name': 'Point{}'.format(i),
+                 'Volttron Point Name': 'Point{}'.format(i),
+                 'Units': 'F',
+                 'Units Details': '',
+                 'Modbus Register': '>f',
+                 'Writable': 'FALSE',
+                 'Point Address': str(i * 2),
+                 'Notes': ''} for i in range(point_count)]
+    elif device_type == 'bacnet':
+        fields = ['Point Name', 'Volttron Point Name', 'Units',
+                  'Unit Details', 'BACnet Object Type', 'Property',
+                  'Writable', 'Index', 'Notes']
+        rows = [{'Point Name': 'Point{}'.format(i),
+                 'Volttron Point Name': 'Point{}'.format(i),
+                 'Units': 'degreesFahrenheit',
+                 'Unit Details': '',
+                 'BACnet Object Type': 'analogValue',
+                 'Property': 'presentValue',
+                 'Writable': 'FALSE',
+                 'Index': str(i + 1),
+                 'Notes': ''} for i in range(point_count)]
+    else:
+        raise ValueError("Unknown device type: {}".format(device_type))
+
+    with open(path, 'wb') as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class AgentProcess(object):
+    """An agent run directly from its source directory, outside of the
+    AIP, the same way the launch_*.sh scripts run them."""
+    def __init__(self, name, module, source_dir, volttron_home, run_dir,
+                 config=None, identity=None):
+        self.name = name
+        self.module = module
+        # Files the agent creates in its working directory, such as the
+        # historian backup database, stay with the run.
+        self.cwd = run_dir
+        self.env = os.environ.copy()
+        self.env['VOLTTRON_HOME'] = volttron_home
+        self.env['PYTHONPATH'] = os.pathsep.join(
+            [source_dir, VOLTTRON_ROOT, self.env.get('PYTHONPATH', '')])
+        if config is not None:
+            self.env['AGENT_CONFIG'] = config
+        if identity is not None:
+            self.env['AGENT_VIP_IDENTITY'] = identity
+        self.log_path = os.path.join(run_dir, name + '.log')
+        self.process = None
+
+    def start(self):
+        self._log_file = open(self.log_path, 'ab')
+        self.process = Popen([sys.executable, '-m', self.module],
+                             cwd=self.cwd, env=self.env,
+                             stdout=self._log_file, stderr=self._log_file)
+        return self.process.pid
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout=10):
+        if self.running():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except gevent.Timeout:
+                self.process.kill()
+        if self.process is not None:
+            self._log_file.close()
+
+
+class VirtualDevice(object):
+    """A virtual Modbus or BACnet device from the virtual-drivers
+    directory."""
+    def __init__(self, command_line, registry_path, log_path):
+        # The config builder refers to the registry by its file name.
+        script, _, arguments = command_line.split(' ', 2)
+        self.args = [sys.executable, os.path.join(VIRTUAL_DRIVERS_DIR, script),
+                     registry_path]
+        self.args.extend(arguments.split())
+        self.args.append('--no-daemon')
+        self.log_path = log_path
+        self.process = None
+
+    def start(self):
+        self._log_file = open(self.log_path, 'ab')
+        self.process = Popen(self.args, cwd=VIRTUAL_DRIVERS_DIR,
+                             stdout=self._log_file, stderr=self._log_file)
+        return self.process.pid
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except gevent.Timeout:
+                self.process.kill()
+        if self.process is not None:
+            self._log_file.close()
+
+
+class ProcessMonitor(object):
+    """Samples CPU time and RSS of groups of processes.
+
+    Each group is a name and a list of pids. CPU time is reported as the
+    total seconds used by the group during the measurement and as a
+    percentage of one core.
+    """
+    def __init__(self, sample_interval=0.5):
+        self.sample_interval = sample_interval
+        self.groups = {}
+        self._greenlet = None
+
+    def add(self, name, pids):
+        processes = []
+        for pid in pids:
+            try:
+                processes.append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                _log.warning("Process {} for {} already exited".format(pid,
+                                                                       name))
+        self.groups[name] = {'processes': processes,
+                             'start_cpu': None,
+                             'last_cpu': 0.0,
+                             'max_rss': 0,
+                             'rss_samples': []}
+
+    @staticmethod
+    def _sample(processes):
+        cpu = 0.0
+        rss = 0
+        for process in processes:
+            try:
+                times = process.cpu_times()
+                cpu += times.user + times.system
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return cpu, rss
+
+    def _sample_all(self):
+        for group in self.groups.itervalues():
+            cpu, rss = self._sample(group['processes'])
+            if group['start_cpu'] is None:
+                group['start_cpu'] = cpu
+            # Exited processes drop out of the sum, keep the high water mark.
+            group['last_cpu'] = max(group['last_cpu'], cpu)
+            if rss:
+                group['max_rss'] = max(group['max_rss'], rss)
+                group['rss_samples'].append(rss)
+
+    def _run(self):
+        while True:
+            self._sample_all()
+            gevent.sleep(self.sample_interval)
+
+    def start(self):
+        self._start_time = time.time()
+        self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+        self._sample_all()
+        elapsed = time.time() - self._start_time
+
+        results = {}
+        for name, group in self.groups.iteritems():
+            cpu_seconds = group['last_cpu'] - (group['start_cpu'] or 0.0)
+            samples = group['rss_samples']
+            results[name] = {
+                'processes': len(group['processes']),
+                'cpu_seconds': cpu_seconds,
+                'cpu_percent': 100.0 * cpu_seconds / elapsed if elapsed else None,
+                'max_rss': group['max_rss'],
+                'mean_rss': math_utils.mean(samples) if samples else None}
+        return results
+
+
+class BusMonitor(Agent):
+    """Counts device publishes on the message bus and measures the time
+    between the scrape timestamp in the header and delivery."""
+    def __init__(self, **kwargs):
+        super(BusMonitor, self).__init__(**kwargs)
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.first_message = None
+        self.last_message = None
+        self.latencies = []
+        self.driver_results = None
+
+    def on_device_publish(self, peer, sender, bus, topic, headers, message):
+        now = utils.get_aware_utc_now()
+        receipt_time = time.time()
+        if self.first_message is None:
+            self.first_message = receipt_time
+        self.last_message = receipt_time
+        self.messages += 1
+
+        if topic.endswith('/all'):
+            timestamp = headers.get(headers_mod.TIMESTAMP)
+            if timestamp is not None:
+                scrape_time = utils.parse_timestamp_string(timestamp)
+                self.latencies.append((now - scrape_time).total_seconds())
+
+    def on_driver_results(self, peer, sender, bus, topic, headers, message):
+        self.driver_results = message
+
+    def subscribe_all(self):
+        self.vip.pubsub.subscribe('pubsub', 'devices/',
+                                  self.on_device_publish).get(timeout=10)
+        self.vip.pubsub.subscribe('pubsub', SCALABILITY_TEST_RESULTS_TOPIC,
+                                  self.on_driver_results).get(timeout=10)
+
+    def summary(self):
+        result = {'messages': self.messages,
+                  'msgs_per_sec': None,
+                  'scrape_to_publish_latency': None}
+        if self.messages > 1 and self.last_message > self.first_message:
+            result['msgs_per_sec'] = (self.messages /
+                                      (self.last_message - self.first_message))
+        if self.latencies:
+            result['scrape_to_publish_latency'] = {
+                'count': len(self.latencies),
+                'mean': math_utils.mean(self.latencies),
+                'stdev': (math_utils.stdev(self.latencies)
+                          if len(self.latencies) > 1 else 0.0),
+                'min': min(self.latencies),
+                'max': max(self.latencies)}
+        return result
+
+
+class Benchmark(object):
+    def __init__(self, args):
+        self.args = args
+        self.work_dir = tempfile.mkdtemp(prefix='volttron-benchmark-')
+        self.wrapper = None
+        self.monitor = None
+
+    def start_platform(self):
+        self.wrapper = PlatformWrapper()
+        self.wrapper.startup_platform(vip_address=self.args.vip_address)
+        # Agents started outside of the AIP generate their own keys.
+        self.wrapper.allow_all_connections()
+        self.monitor = self.wrapper.build_agent(agent_class=BusMonitor,
+                                                identity='benchmark.monitor',
+                                                enable_store=False)
+        self.monitor.subscribe_all()
+
+    def shutdown(self):
+        if self.monitor is not None:
+            self.monitor.core.stop()
+        if self.wrapper is not None:
+            self.wrapper.shutdown_platform()
+        if not self.args.keep:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def store_driver_configs(self, device_type, device_count, point_count,
+                             run_dir):
+        registry_name = 'benchmark{}.csv'.format(point_count)
+        registry_path = os.path.join(run_dir, registry_name)
+        build_registry(device_type, point_count, registry_path)
+        registry_ref = "config://registry_configs/" + registry_name
+
+        call = self.monitor.vip.rpc.call
+        call(CONFIGURATION_STORE, 'manage_delete_store',
+             PLATFORM_DRIVER).get(timeout=10)
+
+        master_config = {
+            'scalability_test': True,
+            'scalability_test_iterations': self.args.iterations,
+            'driver_scrape_interval': self.args.driver_scrape_interval}
+        if self.args.publish_only_depth_all:
+            master_config['publish_breadth_first_all'] = False
+            master_config['publish_depth_first'] = False
+            master_config['publish_breadth_first'] = False
+        call(CONFIGURATION_STORE, 'manage_store', PLATFORM_DRIVER, 'config',
+             json.dumps(master_config), 'json').get(timeout=10)
+
+        with open(registry_path) as f:
+            call(CONFIGURATION_STORE, 'manage_store', PLATFORM_DRIVER,
+                 'registry_configs/' + registry_name, f.read(),
+                 'csv').get(timeout=10)
+
+        klass = device_config_classes[device_type]
+        # The BACnet proxy owns the default BACnet port.
+        offset = 1 if device_type == 'bacnet' else 0
+        command_lines = []
+        for i in range(device_count):
+            config = klass(LOOPBACK, i + offset, registry_ref,
+                           interval=self.args.interval)
+            call(CONFIGURATION_STORE, 'manage_store', PLATFORM_DRIVER,
+                 'devices/benchmark/{}{}'.format(device_type, i),
+                 str(config), 'json').get(timeout=10)
+            command_lines.append(config.get_virtual_driver_commandline())
+        return registry_path, command_lines
+
+    def wait_for_agents(self, agents, timeout):
+        """Wait until every agent has connected to the platform."""
+        identities = set(agent.env['AGENT_VIP_IDENTITY'] for agent in agents)
+        end = time.time() + timeout
+        while time.time() < end:
+            for agent in agents:
+                if not agent.running():
+                    raise RuntimeError("{} exited during startup, see {}"
+                                       .format(agent.name, agent.log_path))
+            peers = self.monitor.vip.peerlist().get(timeout=10)
+            if identities.issubset(peers):
+                # Give the agents a moment to finish subscribing.
+                gevent.sleep(1.0)
+                return
+            gevent.sleep(0.5)
+        raise RuntimeError("Timed out waiting for {} to start".format(
+            ', '.join(sorted(identities))))
+
+    def wait_for_historian(self, expected, timeout):
+        """Wait until the historian has handled expected records or stops
+        receiving any."""
+        call = self.monitor.vip.rpc.call
+        stats = None
+        last_records = -1
+        end = time.time() + timeout
+        while time.time() < end:
+            stats = call(NULL_HISTORIAN_IDENTITY,
+                         'get_statistics').get(timeout=10)
+            if stats['records'] >= expected:
+                break
+            if stats['records'] == last_records:
+                break
+            last_records = stats['records']
+            gevent.sleep(2.0)
+        return stats
+
+    def run_one(self, device_type, device_count, point_count):
+        run_name = '{}-{}-{}'.format(device_type, device_count, point_count)
+        run_dir = os.path.join(self.work_dir, run_name)
+        os.makedirs(run_dir)
+        home = self.wrapper.volttron_home
+        _log.info("Starting run {}".format(run_name))
+
+        registry_path, command_lines = self.store_driver_configs(
+            device_type, device_count, point_count, run_dir)
+
+        devices = []
+        if device_type in ('modbus', 'bacnet'):
+            for i, command_line in enumerate(command_lines):
+                device = VirtualDevice(command_line, registry_path,
+                                       os.path.join(run_dir,
+                                                    'device{}.log'.format(i)))
+                device.start()
+                devices.append(device)
+
+        historian_config = os.path.join(run_dir, 'historian.config')
+        with open(historian_config, 'w') as f:
+            json.dump({"gather_timing_data": False}, f)
+        agents = [AgentProcess('historian', 'null_historian.agent',
+                               NULL_HISTORIAN_DIR, home, run_dir,
+                               config=historian_config,
+                               identity=NULL_HISTORIAN_IDENTITY)]
+        if device_type == 'bacnet':
+            proxy_config = os.path.join(run_dir, 'bacnet-proxy.config')
+            with open(proxy_config, 'w') as f:
+                json.dump({"device_address": LOOPBACK}, f)
+            agents.append(AgentProcess('bacnet_proxy', 'bacnet_proxy.agent',
+                                       BACNET_PROXY_DIR, home, run_dir,
+                                       config=proxy_config,
+                                       identity=BACNET_PROXY_IDENTITY))
+        driver = AgentProcess('master_driver', 'master_driver.agent',
+                              MASTER_DRIVER_DIR, home, run_dir,
+                              identity=PLATFORM_DRIVER)
+
+        processes = ProcessMonitor(self.args.sample_interval)
+        processes.add('platform', [self.wrapper.p_process.pid])
+        try:
+            for agent in agents:
+                processes.add(agent.name, [agent.start()])
+            self.wait_for_agents(agents, self.args.startup_timeout)
+
+            self.monitor.reset()
+            self.monitor.vip.rpc.call(NULL_HISTORIAN_IDENTITY,
+                                      'reset_statistics').get(timeout=10)
+            if devices:
+                processes.add('virtual_devices',
+                              [device.process.pid for device in devices])
+            processes.add(driver.name, [driver.start()])
+            processes.start()
+            start = time.time()
+
+            end = start + self.args.timeout
+            while (driver.running() and self.monitor.driver_results is None
+                   and time.time() < end):
+                gevent.sleep(0.5)
+            timed_out = self.monitor.driver_results is None
+
+            # The historian stores every point of the device all publishes.
+            expected = device_count * point_count * self.args.iterations
+            historian = self.wait_for_historian(expected,
+                                                self.args.historian_timeout)
+            process_stats = processes.stop()
+            elapsed = time.time() - start
+        finally:
+            driver.stop()
+            for agent in agents:
+                agent.stop()
+            for device in devices:
+                device.stop()
+
+        result = {'name': run_name,
+                  'device_type': device_type,
+                  'devices': device_count,
+                  'points': point_count,
+                  'iterations': self.args.iterations,
+                  'elapsed': elapsed,
+                  'timed_out': timed_out,
+                  'driver': self.monitor.driver_results,
+                  'bus': self.monitor.summary(),
+                  'historian': historian,
+                  'processes': process_stats}
+        _log.info("Finished run {}: {}".format(run_name, result))
+        return result
+
+    def run(self):
+        results = {'volttron_version': volttron_version,
+                   'python_version': host_platform.python_version(),
+                   'host': {'platform': host_platform.platform(),
+                            'cpu_count': psutil.cpu_count(),
+                            'memory': psutil.virtual_memory().total},
+                   'started': utils.format_timestamp(
+                       utils.get_aware_utc_now()),
+                   'settings': vars(self.args),
+                   'runs': []}
+        self.start_platform()
+        try:
+            for device_type in self.args.device_type:
+                for device_count in self.args.devices:
+                    for point_count in self.args.points:
+                        results['runs'].append(
+                            self.run_one(device_type, device_count,
+                                         point_count))
+        finally:
+            self.shutdown()
+        return results
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv=sys.argv):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device-type', action='append',
+                        choices=['fake', 'modbus', 'bacnet'],
+                        help='type of device to benchmark, may be repeated '
+                             '(default: fake)')
+    parser.add_argument('--devices', type=int_list, default=[10],
+                        help='comma separated device counts to sweep')
+    parser.add_argument('--points', type=int_list, default=[18],
+                        help='comma separated points per device to sweep')
+    parser.add_argument('--iterations', type=int, default=3,
+                        help='scalability test iterations per run')
+    parser.add_argument('--interval', type=float, default=30.0,
+                        help='scrape interval for every device')
+    parser.add_argument('--driver-scrape-interval', type=float, default=0.02,
+                        help='interval between individual device scrapes')
+    parser.add_argument('--publish-only-depth-all', action='store_true',
+                        help='only publish the depth first all topic')
+    parser.add_argument('--sample-interval', type=float, default=0.5,
+                        help='seconds between CPU and RSS samples')
+    parser.add_argument('--startup-timeout', type=float, default=60.0,
+                        help='maximum seconds to wait for agents to connect')
+    parser.add_argument('--timeout', type=float, default=600.0,
+                        help='maximum seconds for a single run')
+    parser.add_argument('--historian-timeout', type=float, default=60.0,
+                        help='maximum seconds to wait for the historian '
+                             'to catch up after a run')
+    parser.add_argument('--vip-address', default='tcp://127.0.0.1:22916',
+                        help='address of the benchmark platform')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='file to write the JSON results to')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the working directory with agent logs')
+    args = parser.parse_args(argv[1:])
+    if not args.device_type:
+        args.device_type = ['fake']
+
+    logging.basicConfig(level=logging.INFO)
+    results = Benchmark(args).run()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
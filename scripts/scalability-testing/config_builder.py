@@ -98,19 +98,24 @@ class DeviceConfig(object):
 
 class BACnetConfig(DeviceConfig):
     starting_port = 47808
+    starting_device_id = 1000
         
     def device_type(self):
         return "bacnet"
         
     @staticmethod
     def get_driver_config(host_address, instance_number):
-        return {"device_address": host_address + ":" + str(BACnetConfig.starting_port + instance_number)}
+        return {"device_address": host_address + ":" + str(BACnetConfig.starting_port + instance_number),
+                "device_id": BACnetConfig.starting_device_id + instance_number}
     
 
     def get_virtual_driver_commandline(self):
         config_file = os.path.basename(self.configuration["registry_config"])
         interface = self.configuration["driver_config"]["device_address"]
-        return "bacnet.py {config} {interface}".format(config=config_file, interface=interface)
+        device_id = self.configuration["driver_config"]["device_id"]
+        return "bacnet.py {config} {interface} --device-id={device_id}".format(config=config_file,
+                                                                                interface=interface,
+                                                                                device_id=device_id)
 
 class ModbusConfig(DeviceConfig):
     starting_port = 50200
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Benchmark for the configuration store's on disk format.
+
+Times sequential configuration updates for a single agent whose store
+already holds a large number of configurations, as the master driver's
+does with its registry files. Each update goes through
+ConfigStoreService.store_config, the same path manage_store uses, with
+the update notification to the agent disabled so no platform is needed.
+
+The journaled store is compared with the previous format, which rewrote
+the whole JSON file on every update.
+
+Example:
+
+    python config_store_benchmark.py --existing 3000 --updates 10000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from volttron.platform.store import ConfigStoreService
+from volttron.utils.persistance import PersistentDict
+
+
+IDENTITY = "platform.driver"
+
+
+class LegacyConfigStoreService(ConfigStoreService):
+    def _create_disk_store(self, store_path):
+        return PersistentDict(filename=store_path, flag='c', format='json')
+
+
+def registry_contents(index, points):
+    rows = ["Volttron Point Name,Units,Modbus Register,Writable,Point Address"]
+    for point in xrange(points):
+        rows.append("Point{0}_{1},F,>f,TRUE,{1}".format(index, point))
+    return "\n".join(rows)
+
+
+def run(service_class, existing, updates, points):
+    volttron_home = tempfile.mkdtemp()
+    os.environ['VOLTTRON_HOME'] = volttron_home
+    try:
+        service = service_class(address='inproc://vip', identity='config.store')
+        service._setup(None)
+
+        for index in xrange(existing):
+            service.store_config(IDENTITY, "registry_configs/registry{}.csv".format(index),
+                                 registry_contents(index, points), send_update=False)
+        PersistentDict.wait_for_writes()
+
+        call_times = []
+        start = time.time()
+        for update in xrange(updates):
+            index = update % max(existing, 1)
+            contents = registry_contents(index, points) + "\n# update {}".format(update)
+            call_start = time.time()
+            service.store_config(IDENTITY, "registry_configs/registry{}.csv".format(index),
+                                 contents, send_update=False)
+            call_times.append(time.time() - call_start)
+        calls_done = time.time()
+        PersistentDict.wait_for_writes()
+        finished = time.time()
+
+        store_file = os.path.join(service.store_path, IDENTITY + ".store")
+        on_disk = sum(os.path.getsize(os.path.join(service.store_path, name))
+                      for name in os.listdir(service.store_path))
+
+        call_times.sort()
+        return {"updates": updates,
+                "existing_configs": existing,
+                "store_bytes": os.path.getsize(store_file),
+                "bytes_on_disk": on_disk,
+                "call_seconds": calls_done - start,
+                "total_seconds": finished - start,
+                "updates_per_second": updates / (finished - start),
+                "mean_call_ms": 1000.0 * sum(call_times) / len(call_times),
+                "p99_call_ms": 1000.0 * call_times[int(len(call_times) * 0.99)]}
+    finally:
+        shutil.rmtree(volttron_home, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing", type=int, default=3000,
+                        help="configurations in the store before timing starts")
+    parser.add_argument("--updates", type=int, default=10000,
+                        help="sequential updates to time")
+    parser.add_argument("--points", type=int, default=10,
+                        help="points in each registry configuration")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, service_class in (("journaled", ConfigStoreService),
+                                ("legacy", LegacyConfigStoreService)):
+        results[name] = run(service_class, args.existing, args.updates, args.points)
+        print("{}: {}".format(name, json.dumps(results[name], indent=4, sort_keys=True)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
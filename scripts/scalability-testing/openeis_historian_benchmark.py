@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Benchmark for the OpenEIS historian's dataset mapping and append requests.
+
+Builds dataset definitions with the given number of datasets and points
+and a batch of cached records for their topics. Then times sending the
+batch to a local HTTP stand-in for openeis, which waits --latency seconds
+before answering each append:
+
+  * the previous implementation, which compared every record with every
+    point of every dataset and sent one request per dataset in turn
+  * the topic index, with the appends sent concurrently over a session
+
+Example:
+
+    python openeis_historian_benchmark.py --datasets 50 --points 500
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from multiprocessing.pool import ThreadPool
+from SocketServer import ThreadingMixIn
+
+import requests
+from requests.adapters import HTTPAdapter
+from zmq.utils import jsonapi
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', 'services', 'core',
+                                'OpenEISHistorian'))
+from openeis.historian import build_topic_index, bucket_records
+
+HEADERS = {'content-type': 'application/json'}
+
+
+class AppendHandler(BaseHTTPRequestHandler):
+    def do_PUT(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.latency)
+        self.server.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    protocol_version = 'HTTP/1.1'
+
+
+def build_datasets(dataset_count, point_count):
+    datasets = {}
+    for ds in range(dataset_count):
+        points = [{"campus/building{}/point{}".format(ds, p):
+                   "building{}/Sensor{}".format(ds, p)}
+                  for p in range(point_count)]
+        datasets["ds{}".format(ds)] = {"dataset_id": ds, "points": points}
+    return datasets
+
+
+def build_records(datasets, count):
+    topics = [topic for dsv in datasets.values() for point in dsv['points']
+              for topic in point]
+    now = datetime.datetime.utcnow()
+    return [{'_id': index, 'topic': random.choice(topics),
+             'timestamp': now, 'value': random.random()}
+            for index in range(count)]
+
+
+def legacy(datasets, to_publish_list, dataset_uri):
+    handled = []
+    for dsk, dsv in datasets.items():
+        ds_id = dsv["dataset_id"]
+        ds_points = dsv['points']
+
+        point_map = {}
+        try_publish = []
+        for to_pub in to_publish_list:
+            for point in ds_points:
+                if to_pub['topic'] in point.keys():
+                    try_publish.append(to_pub)
+                    openeis_sensor = point[to_pub['topic']]
+                    if not openeis_sensor in point_map:
+                        point_map[openeis_sensor] = []
+                    point_map[openeis_sensor].append([to_pub['timestamp'],
+                                                      to_pub['value']])
+
+        if len(point_map) > 0:
+            payload = jsonapi.dumps({'dataset_id': ds_id,
+                                     'point_map': point_map},
+                                    default=datetime.datetime.isoformat)
+            resp = requests.put(dataset_uri, verify=False, headers=HEADERS,
+                                data=payload)
+            if resp.status_code == requests.codes.ok:
+                handled.extend(try_publish)
+    return handled
+
+
+def indexed(index, session, pool, to_publish_list, dataset_uri):
+    payloads, unmapped = bucket_records(index, to_publish_list)
+
+    def append(item):
+        ds_id, (point_map, records) = item
+        payload = jsonapi.dumps({'dataset_id': ds_id,
+                                 'point_map': point_map},
+                                default=datetime.datetime.isoformat)
+        resp = session.put(dataset_uri, verify=False, headers=HEADERS,
+                           data=payload)
+        if resp.status_code == requests.codes.ok:
+            return records
+
+    handled = []
+    for records in pool.map(append, payloads.items()):
+        handled.extend(records or [])
+    return handled
+
+
+def timed(server, function, *args):
+    server.requests = 0
+    start = time.time()
+    handled = function(*args)
+    return {"seconds": time.time() - start,
+            "requests": server.requests,
+            "handled": len(handled)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", type=int, default=50,
+                        help="number of datasets")
+    parser.add_argument("--points", type=int, default=500,
+                        help="points in each dataset")
+    parser.add_argument("--records", type=int, default=1000,
+                        help="records in the batch, the historian's default "
+                             "submit size")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds the stand-in takes to answer")
+    parser.add_argument("--concurrency", type=int, default=10,
+                        help="concurrent append requests")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = StubServer(('127.0.0.1', 0), AppendHandler)
+    server.latency = args.latency
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    dataset_uri = 'http://127.0.0.1:{}/api/datasets/append'.format(
+        server.server_address[1])
+
+    datasets = build_datasets(args.datasets, args.points)
+    records = build_records(datasets, args.records)
+
+    start = time.time()
+    index = build_topic_index(datasets)
+    index_seconds = time.time() - start
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount('http://', adapter)
+    pool = ThreadPool(args.concurrency)
+
+    results = {
+        "datasets": args.datasets,
+        "points_per_dataset": args.points,
+        "records": args.records,
+        "latency": args.latency,
+        "index_build_seconds": index_seconds,
+        "legacy": timed(server, legacy, datasets, records, dataset_uri),
+        "indexed": timed(server, indexed, index, session, pool, records,
+                         dataset_uri)}
+
+    server.shutdown()
+    print(json.dumps(results, indent=4, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Benchmark for RPC and pubsub message body serializers.
+
+Builds the pubsub.push request a subscriber receives for a device "all"
+publish, with the given number of float points and their metadata, and
+times encoding and decoding it with each available serializer. The
+size of the encoded message is also reported.
+
+Example:
+
+    python serializer_benchmark.py --points 500 --iterations 1000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from volttron.platform import jsonrpc
+from volttron.platform.vip import serialization
+
+
+def device_push(points):
+    rand = random.Random(0)
+    values = {'Point{}'.format(i): rand.random() * 100
+              for i in xrange(points)}
+    meta = {'Point{}'.format(i): {'type': 'float', 'tz': 'US/Pacific',
+                                  'units': 'degreesFahrenheit'}
+            for i in xrange(points)}
+    headers = {'Date': '2017-06-01T12:00:00.000000+00:00',
+               'TimeStamp': '2017-06-01T12:00:00.000000+00:00',
+               'min_compatible_version': '3.0',
+               'max_compatible_version': ''}
+    return jsonrpc.json_method(
+        None, 'pubsub.push',
+        ['', '', 'devices/campus/building/unit/all', headers, [values, meta]],
+        None)
+
+
+def bench(serializer, request, iterations):
+    dumps = serializer.dumps
+    loads = serializer.loads
+    start = time.time()
+    for _ in xrange(iterations):
+        data = dumps(request)
+    encode = time.time() - start
+    start = time.time()
+    for _ in xrange(iterations):
+        loads(data)
+    decode = time.time() - start
+    return {"bytes": len(data),
+            "encode_per_second": iterations / encode,
+            "decode_per_second": iterations / decode,
+            "encode_ms": encode * 1000 / iterations,
+            "decode_ms": decode * 1000 / iterations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=500,
+                        help="points in the device payload")
+    parser.add_argument("--iterations", type=int, default=1000,
+                        help="encodes and decodes to time")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    request = device_push(args.points)
+    results = {}
+    for serializer in (serialization.MSGPACK, serialization.JSON):
+        if serializer is not None:
+            results[serializer.name] = bench(serializer, request,
+                                             args.iterations)
+
+    print(json.dumps(results, indent=4, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Load test for the websocket fan-out of the master web service.
+
+Serves a WebApplicationWrapper on a local port and starts a separate
+process with a number of ws4py clients connected to one websocket
+endpoint. It then:
+
+  * sends messages to the endpoint, as agents do with vip.web.send, and
+    measures the time and CPU used by the server until every client has
+    received all of them
+  * has every client send messages, and counts the RPC calls the
+    registered agent receives for them
+
+The batched wrapper is compared with the previous implementation, which
+wrote each message to each client and made one RPC call per client for
+each received message.
+
+Example:
+
+    python websocket_load_test.py --clients 30 --messages 2000
+"""
+
+from gevent import monkey
+# The ws4py clients use the socket module directly.
+monkey.patch_socket()
+
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+
+import gevent
+import gevent.event
+from gevent import subprocess
+from ws4py.client.geventclient import WebSocketClient
+from ws4py.server.geventserver import WSGIServer
+
+from volttron.platform.web import WebApplicationWrapper
+
+ENDPOINT = '/vc/ws/load'
+
+
+class LoadTestMasterWeb(object):
+    """Stands in for the MasterWebService and its RPC subsystem.
+
+    Counts the RPC calls and notifications the registered agent would
+    receive.
+    """
+
+    def __init__(self):
+        self.vip = self
+        self.rpc = self
+        self.calls = 0
+        self.received = 0
+
+    def call(self, identity, method, *args):
+        if method == 'client.message':
+            self.calls += 1
+            self.received += 1
+        return True
+
+    def notify(self, identity, method, endpoint, messages):
+        self.calls += 1
+        self.received += len(messages)
+
+
+class LegacyWrapper(WebApplicationWrapper):
+    def client_received(self, endpoint, message):
+        clients = self.endpoint_clients.get(endpoint, [])
+        for identity, _ in clients:
+            self.masterweb.vip.rpc.call(identity, 'client.message',
+                                        str(endpoint), str(message))
+
+    def websocket_send(self, endpoint, message):
+        self._log.debug('Sending message to clients!')
+        clients = self.endpoint_clients.get(endpoint, [])
+        for identity, client in clients:
+            self._log.debug('Sending endpoint&&message {}&&{}'.format(
+                endpoint, message))
+            client.send(message)
+
+
+class CountingClient(WebSocketClient):
+    def __init__(self, url, expected):
+        super(CountingClient, self).__init__(url)
+        self.count = 0
+        self.expected = expected
+        self.done = gevent.event.Event()
+
+    def received_message(self, message):
+        self.count += 1
+        if self.count >= self.expected:
+            self.done.set()
+
+
+def run_clients(url, clients, messages, inbound):
+    """Connect the clients, wait for the messages and send inbound
+    messages. Runs in the client process."""
+    connected = []
+    for _ in xrange(clients):
+        client = CountingClient(url, messages)
+        client.connect()
+        connected.append(client)
+    for client in connected:
+        client.done.wait(120)
+    print(json.dumps({"received": sum(c.count for c in connected)}))
+    sys.stdout.flush()
+    for client in connected:
+        for _ in xrange(inbound):
+            client.send('{"subscribe": "devices"}')
+    gevent.sleep(1)
+    for client in connected:
+        client.close()
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(wrapper_class, port, clients, messages, inbound, size, **kwargs):
+    masterweb = LoadTestMasterWeb()
+    app = wrapper_class(masterweb, '127.0.0.1', port, **kwargs)
+    app.create_ws_endpoint(ENDPOINT, 'load.agent')
+    server = WSGIServer(('127.0.0.1', port), app, log=None)
+    server.start()
+    url = 'ws://127.0.0.1:{}{}'.format(port, ENDPOINT)
+    process = subprocess.Popen(
+        [sys.executable, __file__, '--client-url', url,
+         '--clients', str(clients), '--messages', str(messages),
+         '--inbound', str(inbound)], stdout=subprocess.PIPE)
+    try:
+        while sum(len(c) for c in app.endpoint_clients.values()) < clients:
+            gevent.sleep(0.01)
+
+        payload = json.dumps({'topic': 'devices/campus/building/unit/all',
+                              'message': 'x' * size})
+        start = time.time()
+        cpu = cpu_seconds()
+        for index in xrange(messages):
+            app.websocket_send(ENDPOINT, payload)
+            if index % 10 == 0:
+                gevent.sleep(0)
+        received = json.loads(process.stdout.readline())["received"]
+        outbound = time.time() - start
+        cpu = cpu_seconds() - cpu
+
+        start = time.time()
+        expected = clients * inbound
+        while masterweb.received < expected and time.time() - start < 60:
+            gevent.sleep(0.01)
+        process.wait()
+        return {"clients": clients,
+                "messages_per_client": messages,
+                "received": received,
+                "outbound_seconds": outbound,
+                "outbound_server_cpu_seconds": cpu,
+                "inbound_messages": masterweb.received,
+                "inbound_rpc_calls": masterweb.calls}
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=30,
+                        help="websocket clients to connect")
+    parser.add_argument("--messages", type=int, default=2000,
+                        help="messages to send to the endpoint")
+    parser.add_argument("--inbound", type=int, default=50,
+                        help="messages each client sends")
+    parser.add_argument("--size", type=int, default=1000,
+                        help="approximate size of each message in bytes")
+    parser.add_argument("--flush-interval", type=float, default=0.05,
+                        help="batch flush interval in seconds")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="maximum messages per batch")
+    parser.add_argument("--port", type=int, default=18080,
+                        help="local port to serve on")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--client-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.client_url:
+        run_clients(args.client_url, args.clients, args.messages,
+                    args.inbound)
+        return
+
+    common = (args.clients, args.messages, args.inbound, args.size)
+    results = {
+        "batched": run(WebApplicationWrapper, args.port, *common,
+                       flush_interval=args.flush_interval,
+                       batch_size=args.batch_size),
+        "legacy": run(LegacyWrapper, args.port + 1, *common)}
+
+    print(json.dumps(results, indent=4, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
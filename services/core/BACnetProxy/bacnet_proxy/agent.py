@@ -71,6 +71,7 @@ __version__ = '0.2'
 
 import os.path
 import errno
+import hashlib
 from zmq.utils import jsonapi
 from collections import defaultdict
 
@@ -104,11 +105,15 @@ from bacpypes.apdu import (ReadPropertyRequest,
                            ReadAccessSpecification,
                            encode_max_apdu_response,
                            WhoIsRequest,
-                           IAmRequest)
-from bacpypes.primitivedata import Null, Atomic, Enumerated, Integer, Unsigned, Real
+                           IAmRequest,
+                           SubscribeCOVRequest,
+                           ConfirmedCOVNotificationRequest,
+                           UnconfirmedCOVNotificationRequest)
+from bacpypes.primitivedata import Null, Atomic, Enumerated, Integer, Unsigned, Real, BitString
 from bacpypes.constructeddata import Array, Any, Choice
 from bacpypes.basetypes import ServicesSupported
 from bacpypes.task import TaskManager
+import gevent
 from gevent.event import AsyncResult
 
 path = os.path.dirname(os.path.abspath(__file__))
@@ -117,6 +122,97 @@ configFile = os.path.join(path, "bacnet_example_config.csv")
 #Make sure the TaskManager singleton exists...
 task_manager = TaskManager()
 
+UNKNOWN_READ_PLAN = "Unknown read plan"
+
+#Fraction of a COV subscription's lifetime to wait before renewing it.
+COV_RENEWAL_FRACTION = 0.75
+
+
+def build_read_plan(point_map, max_per_request):
+    """Groups the properties in point_map by object and splits the objects
+    into chunks of at most max_per_request objects, one chunk per
+    ReadPropertyMultipleRequest.
+
+    Returns the reverse point map used to map the results back
+    on to the point names and the list of chunks."""
+    # This will be used to get the results mapped
+    # back on the the names
+    reverse_point_map = {}
+
+    #Used to group properties together for the request.
+    object_property_map = defaultdict(list)
+
+    for name, properties in point_map.iteritems():
+        if len(properties) == 3:
+            object_type, instance_number, property_name = properties
+            property_index = None
+        elif len(properties) == 4:
+            object_type, instance_number, property_name, property_index = properties
+        else:
+            _log.error("skipping {} in read plan: incorrect number of parameters".format(name))
+            continue
+        reverse_point_map[object_type,
+                          instance_number,
+                          property_name,
+                          property_index] = name
+
+        object_property_map[object_type,
+                            instance_number].append((property_name, property_index))
+
+    objects = sorted(object_property_map.iteritems())
+    max_per_request = max(int(max_per_request), 1)
+    chunks = [objects[i:i+max_per_request] for i in xrange(0, len(objects), max_per_request)]
+
+    return reverse_point_map, chunks
+
+
+def cast_cov_value(object_type, property_value):
+    """Returns the python value of a PropertyValue from a COV notification
+    or None if the datatype is unknown."""
+    datatype = get_datatype(object_type, property_value.propertyIdentifier)
+    if not datatype:
+        return None
+
+    if issubclass(datatype, Array) and (property_value.propertyArrayIndex is not None):
+        if property_value.propertyArrayIndex == 0:
+            return property_value.value.cast_out(Unsigned)
+        return property_value.value.cast_out(datatype.subtype)
+
+    value = property_value.value.cast_out(datatype)
+    if issubclass(datatype, Enumerated):
+        value = datatype(value).get_long()
+    elif isinstance(value, BitString):
+        value = value.value
+    return value
+
+
+class COVSubscription(object):
+    """A change of value subscription created by
+    :py:meth:`BACnetProxyAgent.create_cov_subscription`."""
+    def __init__(self, process_id, subscriber, target_address, point_name,
+                 object_type, instance_number, property_name, lifetime):
+        self.process_id = process_id
+        self.subscriber = subscriber
+        self.target_address = target_address
+        self.point_name = point_name
+        self.object_type = object_type
+        self.instance_number = instance_number
+        self.property_name = property_name
+        self.lifetime = lifetime
+        self.renewal = None
+
+
+class ReadPlan(object):
+    """A scrape of a device precomputed by
+    :py:meth:`BACnetProxyAgent.register_read_plan`."""
+    def __init__(self, target_address, point_map, max_per_request, use_read_multiple):
+        self.target_address = target_address
+        self.point_map = point_map
+        self.max_per_request = max_per_request
+        self.use_read_multiple = use_read_multiple
+        self.reverse_point_map, self.chunks = build_read_plan(point_map, max_per_request)
+
+
 #IO callback
 # class IOCB:
 #
@@ -133,11 +229,12 @@ task_manager = TaskManager()
 #         self.ioCall.send(None, self.ioResult.set_exception, exception)
 
 class BACnet_application(BIPSimpleApplication, RecurringTask):
-    def __init__(self, i_am_callback, *args):
+    def __init__(self, i_am_callback, cov_callback, *args):
         BIPSimpleApplication.__init__(self, *args)
         RecurringTask.__init__(self, 250)
 
         self.i_am_callback = i_am_callback
+        self.cov_callback = cov_callback
 
         self.request_queue = Queue()
 
@@ -240,7 +337,7 @@ class BACnet_application(BIPSimpleApplication, RecurringTask):
                     value = datatype(value).get_long()
             iocb.set(value)
 
-        elif (isinstance(iocb.ioRequest, WritePropertyRequest) and
+        elif (isinstance(iocb.ioRequest, (WritePropertyRequest, SubscribeCOVRequest)) and
               isinstance(apdu, SimpleAckPDU)):
             iocb.set(apdu)
             return
@@ -329,6 +426,24 @@ class BACnet_application(BIPSimpleApplication, RecurringTask):
                                str(apdu.segmentationSupported),
                                apdu.vendorID)
 
+        elif isinstance(apdu, (ConfirmedCOVNotificationRequest, UnconfirmedCOVNotificationRequest)):
+            if isinstance(apdu, ConfirmedCOVNotificationRequest):
+                #Acknowledge the notification so the device does not resend it.
+                self.response(SimpleAckPDU(context=apdu))
+
+            object_type = apdu.monitoredObjectIdentifier[0]
+            values = {}
+            for property_value in apdu.listOfValues:
+                try:
+                    value = cast_cov_value(object_type, property_value)
+                except StandardError as e:
+                    _log.error("Unable to decode COV value for {}: {}".format(property_value.propertyIdentifier, e))
+                    continue
+                if value is not None:
+                    values[property_value.propertyIdentifier] = value
+
+            self.cov_callback(apdu.subscriberProcessIdentifier, values)
+
         # forward it along
         BIPSimpleApplication.indication(self, apdu)
 
@@ -383,6 +498,11 @@ class BACnetProxyAgent(Agent):
 
         self.iocb_class = IOCB
         self._max_per_request = max_per_request
+        self._read_plans = {}
+        self._read_plan_refs = defaultdict(int)
+        self._cov_subscriptions = {}
+        self._cov_subscription_ids = {}
+        self._next_cov_process_id = 1
 
         self.setup_device(async_call, device_address,
                          max_apdu_len, seg_supported,
@@ -428,9 +548,12 @@ class BACnetProxyAgent(Agent):
         def i_am_callback(address, device_id, max_apdu_len, seg_supported, vendor_id):
             async_call.send(None, self.i_am, address, device_id, max_apdu_len, seg_supported, vendor_id)
 
+        def cov_callback(process_id, values):
+            async_call.send(None, self.cov_notification, process_id, values)
+
         #i_am_callback('foo', 'bar', 'baz', 'foobar', 'foobaz')
 
-        self.this_application = BACnet_application(i_am_callback, this_device, address)
+        self.this_application = BACnet_application(i_am_callback, cov_callback, this_device, address)
 
         server_thread = threading.Thread(target=bacpypes.core.run)
 
@@ -458,6 +581,124 @@ class BACnetProxyAgent(Agent):
         self.vip.pubsub.publish('pubsub', topics.BACNET_I_AM, header, message=value)
 
 
+    def cov_notification(self, process_id, values):
+        """Called by the BACnet application when a COV notification is received.
+        Forwards the subscribed value to the agent that created the subscription."""
+        subscription = self._cov_subscriptions.get(process_id)
+        if subscription is None:
+            _log.debug("COV notification for unknown subscription {}".format(process_id))
+            return
+
+        if subscription.property_name not in values:
+            return
+
+        point_values = {subscription.point_name: values[subscription.property_name]}
+        # Notify rather than call so a slow subscriber does not hold up
+        # the notifications that follow.
+        self.vip.rpc.notify(subscription.subscriber, 'forward_bacnet_cov_value',
+                            subscription.target_address, point_values)
+
+    @RPC.export
+    def create_cov_subscription(self, target_address, point_name, object_type, instance_number,
+                                property_name='presentValue', lifetime=180):
+        """Subscribe to change of value notifications for an object.
+
+        Notifications for property_name are forwarded to the
+        forward_bacnet_cov_value RPC of the calling agent as
+        {point_name: value}. The subscription is renewed until it is
+        cancelled with :py:meth:`cancel_cov_subscription` or the proxy
+        stops. Raises an error if the device rejects the subscription."""
+        subscriber = bytes(self.vip.rpc.context.vip_message.peer)
+        key = (subscriber, target_address, point_name)
+
+        process_id = self._cov_subscription_ids.get(key)
+        if process_id is None:
+            process_id = self._next_cov_process_id
+            self._next_cov_process_id += 1
+        else:
+            self.cancel_cov_renewal(process_id)
+
+        subscription = COVSubscription(process_id, subscriber, target_address, point_name,
+                                       object_type, instance_number, property_name, int(lifetime))
+
+        self.send_cov_subscription(subscription)
+
+        self._cov_subscriptions[process_id] = subscription
+        self._cov_subscription_ids[key] = process_id
+        self.schedule_cov_renewal(subscription)
+
+    @RPC.export
+    def cancel_cov_subscription(self, target_address, point_name):
+        """Cancel a subscription made by the calling agent with
+        :py:meth:`create_cov_subscription`. Unknown subscriptions are
+        ignored."""
+        subscriber = bytes(self.vip.rpc.context.vip_message.peer)
+        process_id = self._cov_subscription_ids.pop((subscriber, target_address, point_name), None)
+        if process_id is None:
+            return
+
+        self.cancel_cov_renewal(process_id)
+        subscription = self._cov_subscriptions.pop(process_id)
+
+        _log.debug("Cancelling COV of {type} {instance} on {target}".format(type=subscription.object_type,
+                                                                           instance=subscription.instance_number,
+                                                                           target=subscription.target_address))
+        #A request without a lifetime or confirmation flag cancels the subscription.
+        request = SubscribeCOVRequest(subscriberProcessIdentifier=subscription.process_id,
+                                      monitoredObjectIdentifier=(subscription.object_type,
+                                                                 subscription.instance_number))
+        request.pduDestination = Address(subscription.target_address)
+
+        iocb = self.iocb_class(request)
+        self.this_application.submit_request(iocb)
+        try:
+            iocb.ioResult.get(10)
+        except Exception as e:
+            #The device drops the subscription when its lifetime runs out anyway.
+            _log.warning("Failed to cancel COV subscription for {} on {}: {}".format(point_name,
+                                                                                   target_address,
+                                                                                   e))
+
+    def send_cov_subscription(self, subscription):
+        _log.debug("Subscribing to COV of {type} {instance} on {target}".format(type=subscription.object_type,
+                                                                               instance=subscription.instance_number,
+                                                                               target=subscription.target_address))
+        request = SubscribeCOVRequest(subscriberProcessIdentifier=subscription.process_id,
+                                      monitoredObjectIdentifier=(subscription.object_type,
+                                                                 subscription.instance_number),
+                                      issueConfirmedNotifications=True,
+                                      lifetime=subscription.lifetime)
+        request.pduDestination = Address(subscription.target_address)
+
+        iocb = self.iocb_class(request)
+        self.this_application.submit_request(iocb)
+        try:
+            iocb.ioResult.get(10)
+        except gevent.Timeout:
+            raise RuntimeError("Timed out subscribing to COV on " + subscription.target_address)
+
+    def schedule_cov_renewal(self, subscription):
+        next_renewal = datetime.datetime.now() + datetime.timedelta(seconds=subscription.lifetime * COV_RENEWAL_FRACTION)
+        subscription.renewal = self.core.schedule(next_renewal, self.renew_cov_subscription, subscription.process_id)
+
+    def cancel_cov_renewal(self, process_id):
+        subscription = self._cov_subscriptions.get(process_id)
+        if subscription is not None and subscription.renewal is not None:
+            subscription.renewal.cancel()
+
+    def renew_cov_subscription(self, process_id):
+        subscription = self._cov_subscriptions.get(process_id)
+        if subscription is None:
+            return
+
+        try:
+            self.send_cov_subscription(subscription)
+        except Exception as e:
+            _log.warning("Failed to renew COV subscription for {} on {}: {}".format(subscription.point_name,
+                                                                                  subscription.target_address,
+                                                                                  e))
+        self.schedule_cov_renewal(subscription)
+
     @RPC.export
     def who_is(self, low_device_id=None, high_device_id=None, target_address=None):
         _log.debug("Sending WhoIs: low_id: {low} high: {high} address: {address}".format(low=low_device_id,
@@ -590,41 +831,70 @@ class BACnetProxyAgent(Agent):
                                            target=target_address,
                                            max=max_per_request))
 
-        # This will be used to get the results mapped
-        # back on the the names
-        reverse_point_map = {}
+        reverse_point_map, chunks = build_read_plan(point_map, max_per_request)
 
-        #Used to group properties together for the request.
-        object_property_map = defaultdict(list)
+        return self.read_chunks(target_address, reverse_point_map, chunks)
 
-        for name, properties in point_map.iteritems():
-            if len(properties) == 3:
-                object_type, instance_number, property_name = properties
-                property_index = None
-            elif len(properties) == 4:
-                object_type, instance_number, property_name, property_index = properties
-            else:
-                _log.error("skipping {} in request to {}: incorrect number of parameters".format(name, target_address))
-            reverse_point_map[object_type,
-                              instance_number,
-                              property_name,
-                              property_index] = name
+    @RPC.export
+    def register_read_plan(self, target_address, point_map, max_per_request=None, use_read_multiple=True):
+        """Precompute a read of a set of points and return a handle for
+        :py:meth:`read_plan`.
 
-            object_property_map[object_type,
-                                instance_number].append((property_name, property_index))
+        Registering the same points for the same device again replaces the
+        previous plan and returns the same handle. Each registration should
+        be released with :py:meth:`unregister_read_plan` when it is no
+        longer used."""
 
+        #Set max_per_request really high if not set.
+        if max_per_request is None:
+            max_per_request = self._max_per_request
+
+        handle = hashlib.sha1(jsonapi.dumps([target_address, point_map], sort_keys=True)).hexdigest()
+        self._read_plans[handle] = ReadPlan(target_address, point_map, max_per_request, use_read_multiple)
+        self._read_plan_refs[handle] += 1
+
+        _log.debug("Registered read plan {handle} for {count} points on {target}, max per"
+                   " scrape: {max}".format(handle=handle,
+                                           count=len(point_map),
+                                           target=target_address,
+                                           max=max_per_request))
+        return handle
+
+    @RPC.export
+    def unregister_read_plan(self, handle):
+        """Release a registration made with :py:meth:`register_read_plan`.
+
+        The plan is removed once every registration of it has been
+        released. Unknown handles are ignored."""
+        if handle not in self._read_plan_refs:
+            return
+        self._read_plan_refs[handle] -= 1
+        if self._read_plan_refs[handle] <= 0:
+            del self._read_plan_refs[handle]
+            self._read_plans.pop(handle, None)
+            _log.debug("Removed read plan {handle}".format(handle=handle))
+
+    @RPC.export
+    def read_plan(self, handle):
+        """Read the points of a plan registered with
+        :py:meth:`register_read_plan` and return the results"""
+        try:
+            plan = self._read_plans[handle]
+        except KeyError:
+            raise ValueError("{}: {}".format(UNKNOWN_READ_PLAN, handle))
+
+        if not plan.use_read_multiple:
+            return self.read_using_single_request(plan.target_address, plan.point_map)
+
+        return self.read_chunks(plan.target_address, plan.reverse_point_map, plan.chunks)
+
+    def read_chunks(self, target_address, reverse_point_map, chunks):
         result_dict={}
-        finished = False
 
-        while not finished:
+        for chunk in chunks:
             read_access_spec_list = []
             count = 0
-            for _ in xrange(max_per_request):
-                try:
-                    obj_data, properties = object_property_map.popitem()
-                except KeyError:
-                    finished = True
-                    break
+            for obj_data, properties in chunk:
                 obj_type, obj_inst = obj_data
                 prop_ref_list = []
                 for prop, prop_index in properties:
@@ -637,23 +907,22 @@ class BACnetProxyAgent(Agent):
                                                            listOfPropertyReferences=prop_ref_list)
                 read_access_spec_list.append(read_access_spec)
 
-            if read_access_spec_list:
-                _log.debug("Requesting {count} properties from {target}".format(count=count,
-                                                                                target=target_address))
-                request = ReadPropertyMultipleRequest(listOfReadAccessSpecs=read_access_spec_list)
-                request.pduDestination = Address(target_address)
+            _log.debug("Requesting {count} properties from {target}".format(count=count,
+                                                                            target=target_address))
+            request = ReadPropertyMultipleRequest(listOfReadAccessSpecs=read_access_spec_list)
+            request.pduDestination = Address(target_address)
 
-                iocb = self.iocb_class(request)
-                self.this_application.submit_request(iocb)
-                bacnet_results = iocb.ioResult.get(10)
+            iocb = self.iocb_class(request)
+            self.this_application.submit_request(iocb)
+            bacnet_results = iocb.ioResult.get(10)
 
-                _log.debug("Received read response from {target} count: {count}".format(count=count,
-                                                                         target=target_address))
+            _log.debug("Received read response from {target} count: {count}".format(count=count,
+                                                                     target=target_address))
 
 
-                for prop_tuple, value in bacnet_results.iteritems():
-                    name = reverse_point_map[prop_tuple]
-                    result_dict[name] = value
+            for prop_tuple, value in bacnet_results.iteritems():
+                name = reverse_point_map[prop_tuple]
+                result_dict[name] = value
 
         return result_dict
 
@@ -1,5 +1,7 @@
 import logging
 
+from crate.client.exceptions import ProgrammingError
+
 
 def select_all_topics_query(schema):
     return "SELECT topic FROM {schema}.topic".format(schema=schema)
@@ -21,6 +23,39 @@ def insert_data_query(schema):
     return query.replace("\n", " ")
 
 
+def insert_data(cursor, schema, batch, handled):
+    """
+    Bulk inserts a batch of (record, parameters) pairs into the data table,
+    adding the records that are done with to handled.
+
+    Crate reports rows it rejects in the bulk result. When the whole request
+    is rejected, the batch is split in half and each half is retried, so bad
+    rows are found in a logarithmic number of requests. Rejected rows are
+    dropped.
+    """
+    _log = logging.getLogger(__name__)
+    try:
+        results = cursor.executemany(insert_data_query(schema),
+                                     [params for _, params in batch])
+    except ProgrammingError as ex:
+        if len(batch) == 1:
+            _log.debug('Invalid data not saved {}: {}'.format(batch[0][0],
+                                                              ex.args))
+            handled.append(batch[0][0])
+            return
+        _log.debug("Invalid data in batch of {}, splitting.".format(
+            len(batch)))
+        middle = len(batch) // 2
+        insert_data(cursor, schema, batch[:middle], handled)
+        insert_data(cursor, schema, batch[middle:], handled)
+        return
+
+    for (record, _), result in zip(batch, results or []):
+        if result.get('rowcount') == -2:
+            _log.debug('Invalid data not saved {}'.format(record))
+    handled.extend(record for record, _ in batch)
+
+
 def drop_schema(connection, schema=None, truncate=False):
     _log = logging.getLogger(__name__)
     if not schema:
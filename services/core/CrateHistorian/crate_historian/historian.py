@@ -72,18 +72,21 @@ except ImportError:
 
 import logging
 import sys
+import threading
 from collections import defaultdict
+from multiprocessing.pool import ThreadPool
 
 from crate.client.exceptions import ConnectionError, ProgrammingError
 from crate import client
 from zmq.utils import jsonapi
 
 from . crate_utils import (create_schema, select_all_topics_query,
-                           insert_data_query, insert_topic_query)
+                           insert_data, insert_topic_query)
 from volttron.platform.agent.utils import get_utc_seconds_from_epoch
 from volttron.utils.docs import doc_inherit
 from volttron.platform.agent import utils
 from volttron.platform.agent.base_historian import BaseHistorian
+from volttron.platform.vip.agent import Core
 
 
 utils.setup_logging()
@@ -135,7 +138,8 @@ class CrateHistorian(BaseHistorian):
 
         The historian makes a crateclient connection to the crate cluster.
         This connection is thread-safe and therefore we create it before
-        starting the main loop of the agent.
+        starting the main loop of the agent. When insert_pipeline_depth is
+        greater than 1 each insert thread also opens its own connection.
 
         In addition, the topic_map and topic_meta are used for caching meta
         data and topics respectively.
@@ -168,8 +172,31 @@ class CrateHistorian(BaseHistorian):
         self._agg_topic_id_map = {}
         self._initialized = False
         self._wait_until = None
+
+        # Number of inserts sent to crate at the same time. Each batch from
+        # the cache is split into this many parts.
+        self._pipeline_depth = max(int(config.get('insert_pipeline_depth', 1)),
+                                   1)
+        self._insert_pool = None
+        if self._pipeline_depth > 1:
+            self._insert_pool = ThreadPool(self._pipeline_depth)
+        # Each pool thread inserts on its own connection.
+        self._worker = threading.local()
+        self._worker_connections = []
         super(CrateHistorian, self).__init__(**kwargs)
 
+    @Core.receiver("onstop")
+    def close_insert_pool(self, sender, **kwargs):
+        """
+        Stop the insert threads and close their connections.
+        """
+        if self._insert_pool is not None:
+            self._insert_pool.close()
+            self._insert_pool.join()
+        for connection in self._worker_connections:
+            connection.close()
+        self._worker_connections = []
+
     @doc_inherit
     def publish_to_historian(self, to_publish_list):
         _log.debug("publish_to_historian number of items: {}".format(
@@ -188,90 +215,87 @@ class CrateHistorian(BaseHistorian):
             else:
                 _log.debug('Waiting to attempt to write to database.')
                 return
+
+        batch = []
+        new_topics = set()
+        for row in to_publish_list:
+            ts = utils.format_timestamp(row['timestamp'])
+            source = row['source']
+            topic = row['topic']
+            value = row['value']
+            meta = row['meta']
+
+            # Handle the serialization of data here because we can't pass
+            # an array as a string so we create a string from the value.
+            if isinstance(value, list) or isinstance(value, dict):
+                value = dumps(value)
+
+            if topic not in self._topic_set:
+                new_topics.add(topic)
+
+            batch.append((row, (ts, topic, source, value, meta)))
+
         try:
             if self._connection is None:
                 self._connection = self.get_connection()
 
-            cursor = self._connection.cursor()
-
-            batch_data = []
-
-            for row in to_publish_list:
-                ts = utils.format_timestamp(row['timestamp'])
-                source = row['source']
-                topic = row['topic']
-                value = row['value']
-                meta = row['meta']
-
-                # Handle the serialization of data here because we can't pass
-                # an array as a string so we create a string from the value.
-                if isinstance(value, list) or isinstance(value, dict):
-                    value = dumps(value)
-
-                if topic not in self._topic_set:
-                    try:
-                        cursor.execute(insert_topic_query(self._schema),
-                                       (topic,))
-                    except ProgrammingError as ex:
-                        if ex.args[0].startswith(
-                                'DocumentAlreadyExistsException'):
-                            self._topic_set.add(topic)
-                        else:
-                            _log.error(
-                                "Unknown error during topic insert {} {}".format(
-                                    type(ex), ex.args
-                                ))
-                    else:
-                        self._topic_set.add(topic)
-
-                batch_data.append(
-                    (ts, topic, source, value, meta)
-                )
-
-            try:
-                query = insert_data_query(self._schema)
-                _log.debug("Inserting batch data: {}".format(batch_data))
-                cursor.executemany(query, batch_data)
-            except ProgrammingError as ex:
-                _log.error(
-                    "Invalid data detected during batch insert: {}".format(
-                        ex.args))
-                _log.debug("Attempting singleton insert.")
-                insert = insert_data_query(self._schema)
-                for id in range(len(batch_data)):
-                    try:
-                        batch = batch_data[id]
-                        cursor.execute(insert, batch)
-                    except ProgrammingError:
-                        _log.debug('Invalid data not saved {}'.format(
-                            to_publish_list[id]
-                        ))
-                        self.report_handled(to_publish_list[id])
-                    except Exception as ex:
-                        _log.error(
-                            "Exception Type: {} ARGS: {}".format(type(ex),
-                                                                 ex.args))
-                    else:
-                        self.report_handled(to_publish_list[id])
-
-            except Exception as ex:
-                _log.error(
-                    "Exception Type: {} ARGS: {}".format(type(ex), ex.args))
+            if new_topics:
+                self._insert_topics(new_topics)
 
+            if self._pipeline_depth > 1 and len(batch) > 1:
+                size = -(-len(batch) // self._pipeline_depth)
+                chunks = [batch[i:i + size]
+                          for i in range(0, len(batch), size)]
+                results = self._insert_pool.map(self._insert_data, chunks)
             else:
-                self.report_all_handled()
-        except TypeError as ex:
-            _log.error(
-                "AFTER EXCEPTION: {} ARGS: {}".format(type(ex), ex.args))
+                results = [self._insert_data(batch)]
         except Exception as ex:
             _log.error(
-                "Unknown Exception {} {}".format(type(ex), ex.args)
-            )
+                "Unknown Exception {} {}".format(type(ex), ex.args))
+            return
+
+        for handled, error in results:
+            if handled:
+                self.report_handled(handled)
+            if error is not None:
+                _log.error("Exception Type: {} ARGS: {}".format(type(error),
+                                                                error.args))
 
+    def _insert_topics(self, topics):
+        """
+        Adds topics to the topic table with a single bulk insert.
+
+        Topics that already exist come back as failed rows in the bulk
+        result and are treated as inserted.
+        """
+        cursor = self._connection.cursor()
+        try:
+            cursor.executemany(insert_topic_query(self._schema),
+                               [(topic,) for topic in topics])
+        except ProgrammingError as ex:
+            _log.error("Unknown error during topic insert {} {}".format(
+                type(ex), ex.args))
+        else:
+            self._topic_set.update(topics)
         finally:
-            if cursor is not None:
-                cursor.close()
-                cursor = None
+            cursor.close()
+
+    def _insert_data(self, batch):
+        """
+        Inserts a batch of (record, parameters) pairs.
+
+        :returns: The records that were handled and the exception that
+                  stopped the insert, if any.
+        """
+        handled = []
+        cursor = self._insert_connection().cursor()
+        try:
+            insert_data(cursor, self._schema, batch, handled)
+        except Exception as ex:
+            return handled, ex
+        finally:
+            cursor.close()
+        return handled, None
 
     @staticmethod
     def _build_single_topic_select_query(start, end, agg_type, agg_period, skip,
@@ -410,6 +434,20 @@ class CrateHistorian(BaseHistorian):
         results = [x[0] for x in cursor.fetchall()]
         return results
 
+    def _insert_connection(self):
+        """
+        Returns the connection to insert data on from the current thread.
+        """
+        if self._insert_pool is None:
+            return self._connection
+        connection = getattr(self._worker, 'connection', None)
+        if connection is None:
+            connection = client.connect(self._connection_params['host'],
+                                        error_trace=True)
+            self._worker.connection = connection
+            self._worker_connections.append(connection)
+        return connection
+
     def get_connection(self):
         if self._connection is None:
             self._connection = client.connect(self._connection_params['host'],
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for the bulk insert helpers of the crate historian that do not need a
+crate server.
+"""
+
+import pytest
+
+pytest.importorskip("crate.client")
+
+from crate.client.exceptions import ProgrammingError
+from crate_historian.crate_utils import insert_data
+
+
+class FakeCursor(object):
+    """Rejects a whole bulk request that contains a "bad" value and marks
+    "rejected" values as failed rows in the bulk result."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def executemany(self, sql, seq_of_parameters):
+        self.requests += 1
+        values = [params[3] for params in seq_of_parameters]
+        if "bad" in values:
+            raise ProgrammingError("SQLActionException[Validation failed]")
+        return [{"rowcount": -2 if value == "rejected" else 1}
+                for value in values]
+
+
+def make_batch(values):
+    return [({"_id": index}, ("ts", "topic", "scrape", value, {}))
+            for index, value in enumerate(values)]
+
+
+def test_good_batch_is_one_request():
+    cursor = FakeCursor()
+    handled = []
+    insert_data(cursor, "historian", make_batch(["1"] * 5000), handled)
+
+    assert cursor.requests == 1
+    assert len(handled) == 5000
+
+
+def test_rejected_rows_do_not_split_batch():
+    cursor = FakeCursor()
+    handled = []
+    values = ["1"] * 100
+    values[10] = "rejected"
+    insert_data(cursor, "historian", make_batch(values), handled)
+
+    assert cursor.requests == 1
+    assert len(handled) == 100
+
+
+def test_bad_row_is_found_by_bisection():
+    cursor = FakeCursor()
+    handled = []
+    values = ["1"] * 5000
+    values[1234] = "bad"
+    insert_data(cursor, "historian", make_batch(values), handled)
+
+    # One request per level of the split on the side with the bad row,
+    # plus one for each good half.
+    assert cursor.requests <= 2 * 13 + 1
+    assert sorted(record["_id"] for record in handled) == range(5000)
@@ -57,7 +57,11 @@
 
 from __future__ import absolute_import, print_function
 
-from collections import defaultdict
+from gevent import monkey
+# Emails are sent by a background greenlet so smtplib must not block the hub.
+monkey.patch_socket()
+
+from collections import defaultdict, OrderedDict
 
 # Import the email modules we'll need
 from email.mime.text import MIMEText
@@ -69,6 +73,7 @@ import smtplib
 import sys
 
 import gevent
+from gevent.queue import Queue, Empty
 from volttron.platform.agent.utils import get_utc_seconds_from_epoch
 
 from volttron.platform.agent import utils
@@ -79,7 +84,13 @@ from volttron.platform.vip.agent import Agent
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '1.3'
+__version__ = '1.4'
+
+# Close the SMTP connection after this many seconds without email to send.
+SMTP_IDLE_SECONDS = 60
+
+# Alerts listed in full in one digest email.
+MAX_DIGEST_ALERTS = 500
 
 """
 The `pyclass:EmailAgent` is responsible for sending emails for an instance.  It
@@ -94,12 +105,17 @@ A default configuration for this agent is as follows.
         "smtp_address": "smtp.foo.com",
         "from_address": "billy@foo.com",
         "to_addresses=to_address": ["ann@foo.com", "bob@gmail.com"],
-        "allow_frequency_minutes": 10
+        "allow_frequency_minutes": 10,
+        "alert_digest_seconds": 10
     }
 
-By default any alerts will be sent through this agent.  In addition all emails
-will be published to the record/sent_email topic for a historian to be able
-to capture that data.
+By default any alerts will be sent through this agent.  Alerts that arrive
+within `alert_digest_seconds` of each other are sent to their recipients as
+one digest email.  In addition all emails will be published to the
+record/sent_email topic for a historian to be able to capture that data.
+
+Emails are sent in order by a single background greenlet that keeps its SMTP
+connection open between emails and reconnects when the server drops it.
 """
 
 
@@ -115,6 +131,7 @@ class EmailerAgent(Agent):
 
         allow_frequency_minutes = config.get("allow-frequency-minutes", 60)
         self._allow_frequency_seconds = allow_frequency_minutes * 60
+        alert_digest_seconds = config.get("alert-digest-seconds", 10)
 
         self.default_config = dict(smtp_address=smtp_address,
                                    from_address=from_address,
@@ -122,6 +139,7 @@ class EmailerAgent(Agent):
                                    allow_frequency_minutes=allow_frequency_minutes,
                                    alert_from_address=from_address,
                                    alert_to_addresses=to_address,
+                                   alert_digest_seconds=alert_digest_seconds,
                                    send_alerts_enabled=True,
                                    record_sent_emails=True)
         self.current_config = None
@@ -130,10 +148,19 @@ class EmailerAgent(Agent):
         self.vip.config.subscribe(self.configure_main,
                                   actions=["NEW", "UPDATE"], pattern="config")
 
-        # Keep track of keys that have been added to send with.
-        self.tosend = {}
+        # Emails waiting for the sender greenlet and its SMTP connection.
+        self._outbox = Queue()
+        self._smtp = None
+        self._sender = None
+
+        # Alerts waiting to be sent as a digest, keyed by sender and
+        # recipients.
+        self._pending_alerts = OrderedDict()
+        self._digest_greenlet = None
 
         def onstart(sender, **kwargs):
+            self._sender = gevent.spawn(self._send_loop)
+
             self.vip.pubsub.subscribe('pubsub', topics.PLATFORM_SEND_EMAIL,
                                       self.on_email_message)
 
@@ -146,6 +173,13 @@ class EmailerAgent(Agent):
 
         self.core.onstart.connect(onstart, self)
 
+        def onstop(sender, **kwargs):
+            if self._sender is not None:
+                self._sender.kill()
+            self._close_smtp()
+
+        self.core.onstop.connect(onstop, self)
+
         self.sent_alert_emails = defaultdict(int)
 
     def _test_smtp_address(self, smtp_address):
@@ -171,6 +205,9 @@ class EmailerAgent(Agent):
             'allow_frequency_minutes', 60) * 60
         smtp_address = self.current_config.get('smtp_address', None)
 
+        # The sender reconnects with the new settings.
+        self._close_smtp()
+
         if action == "NEW":
             try:
                 with gevent.with_timeout(3, self._test_smtp_address, smtp_address):
@@ -226,6 +263,49 @@ class EmailerAgent(Agent):
 
         self.send_email(from_address, to_addresses, subject, msg)
 
+    def _send_loop(self):
+        """
+        Sends the emails in the outbox in order over one SMTP connection.
+
+        The connection is closed when no email has been sent for
+        `SMTP_IDLE_SECONDS`.
+        """
+        while True:
+            try:
+                from_address, to_addresses, mime_message = self._outbox.get(
+                    timeout=SMTP_IDLE_SECONDS)
+            except Empty:
+                self._close_smtp()
+                continue
+            self._send_email(from_address, to_addresses, mime_message)
+
+    def _connect_smtp(self):
+        if self._smtp is None:
+            self._smtp = smtplib.SMTP(self.current_config['smtp_address'])
+        return self._smtp
+
+    def _close_smtp(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, socket.error):
+                smtp.close()
+
+    def _sendmail(self, from_address, to_addresses, message_string):
+        """
+        Sends over the open connection. A connection the server has dropped
+        is reopened once before giving up.
+        """
+        try:
+            self._connect_smtp().sendmail(from_address, to_addresses,
+                                          message_string)
+        except (smtplib.SMTPServerDisconnected, socket.error):
+            _log.debug("SMTP connection lost, reconnecting")
+            self._close_smtp()
+            self._connect_smtp().sendmail(from_address, to_addresses,
+                                          message_string)
+
     def _send_email(self, from_address, to_addresses, mime_message):
         """
         The method that actually sends the data to the smtp server to be
@@ -253,15 +333,12 @@ class EmailerAgent(Agent):
         sent_email_record = None
         try:
             _log.info("Sending email {}".format(mime_message['Subject']))
+            message_string = mime_message.as_string()
             sent_email_record = {"from_address": from_address,
                                  "recipients": to_addresses,
                                  "subject": mime_message['Subject'],
-                                 "message_content": mime_message.as_string()}
-            cfg = self.vip.config.get("config")
-            smtp_address = cfg['smtp_address']
-            s = smtplib.SMTP(smtp_address)
-            s.sendmail(from_address, to_addresses, mime_message.as_string())
-            s.quit()
+                                 "message_content": message_string}
+            self._sendmail(from_address, to_addresses, message_string)
             self.vip.health.set_status(STATUS_GOOD,
                                        "Successfully sent email.")
             send_successful = True
@@ -269,10 +346,12 @@ class EmailerAgent(Agent):
             _log.error(
                 'Unable to send email message: %s' % mime_message.as_string())
             _log.error(e.args)
+            self._close_smtp()
             self.vip.health.set_status(STATUS_BAD,
                                        "Unable to send email to recipients")
         finally:
-            if sent_email_record is not None:
+            if sent_email_record is not None and \
+                    self.current_config.get('record_sent_emails', True):
                 sent_email_record['successful'] = send_successful
                 self.vip.pubsub.publish("pubsub", "record/sent_email",
                                         message=sent_email_record)
@@ -283,6 +362,8 @@ class EmailerAgent(Agent):
 
         One can also send an email through the pubsub mechanism.
 
+        The email is queued and sent in the background.
+
         :param from_address:
         :param to_addresses:
         :param subject:
@@ -301,13 +382,15 @@ class EmailerAgent(Agent):
         msg['FROM'] = from_address
         msg['Subject'] = subject
 
-        gevent.spawn(self._send_email, from_address, recipients, msg)
-        gevent.sleep(0.1)
+        self._outbox.put((from_address, recipients, msg))
 
     def on_alert_message(self, peer, sender, bus, topic, headers, message):
         """
         Callback for alert messages that come into the platform.
 
+        The alert is added to the pending digest for its recipients and sent
+        when the digest window closes.
+
         :param peer:
         :param sender:
         :param bus:
@@ -328,49 +411,60 @@ class EmailerAgent(Agent):
             return
 
         last_sent_key = tuple([mailkey, topic])
-        if last_sent_key in self.tosend:
-            return
-
-        self.tosend[last_sent_key] = 1
-
         last_sent_time = self.sent_alert_emails[last_sent_key]
+        current_time = get_utc_seconds_from_epoch()
 
-        should_send = False
         # python sets this to 0 if it hasn't ever been sent.
-        if not last_sent_time:
-            should_send = True
-        else:
-            current_time = get_utc_seconds_from_epoch()
+        if last_sent_time:
             allow_frequency_seconds = self.current_config['allow_frequency_seconds']
-            if last_sent_time + allow_frequency_seconds < current_time:
-                should_send=True
-
-        if not should_send:
-            _log.debug('Waiting for time to pass for email.')
-            if last_sent_key in self.tosend:
-                del self.tosend[last_sent_key]
-            return
+            if last_sent_time + allow_frequency_seconds >= current_time:
+                _log.debug('Waiting for time to pass for email.')
+                return
 
         # we assume the email will go through.
-        self.sent_alert_emails[last_sent_key] = get_utc_seconds_from_epoch()
+        self.sent_alert_emails[last_sent_key] = current_time
 
         from_address = self.current_config['alert_from_address']
         recipients = self.current_config['alert_to_addresses']
         if isinstance(recipients, basestring):
             recipients = [recipients]
 
-        # After here we are going to attempt to send the email out
-        subject = "Alert for {} {}".format(topic, mailkey)
+        digest_key = (from_address, tuple(recipients))
+        alerts = self._pending_alerts.setdefault(digest_key, [])
+        alerts.append((topic, mailkey, message))
 
-        # Use unicode to protect against encod error
-        # http://stackoverflow.com/questions/25891541/attributeerror-encode
-        msg = MIMEText(unicode(message))
-        msg['To'] = ', '.join(recipients)
-        msg['FROM'] = from_address
-        msg['Subject'] = subject
-        self.send_email(from_address, recipients, subject, msg)
-        if last_sent_key in self.tosend:
-            del self.tosend[last_sent_key]
+        if self._digest_greenlet is None:
+            window = self.current_config.get('alert_digest_seconds', 10)
+            self._digest_greenlet = gevent.spawn_later(window,
+                                                       self._send_digests)
+
+    def _send_digests(self):
+        """
+        Queues one email per recipient set for the alerts received during
+        the digest window.
+        """
+        self._digest_greenlet = None
+        pending, self._pending_alerts = self._pending_alerts, OrderedDict()
+
+        for (from_address, recipients), alerts in pending.items():
+            if len(alerts) == 1:
+                topic, mailkey, message = alerts[0]
+                subject = "Alert for {} {}".format(topic, mailkey)
+                body = unicode(message)
+            else:
+                subject = "{} alerts for {}".format(
+                    len(alerts), ", ".join(sorted(set(a[1] for a in alerts))))
+                if len(subject) > 200:
+                    subject = "{} alerts".format(len(alerts))
+                lines = [u"Alert for {} {}\n{}\n".format(topic, mailkey,
+                                                          unicode(message))
+                         for topic, mailkey, message in
+                         alerts[:MAX_DIGEST_ALERTS]]
+                if len(alerts) > MAX_DIGEST_ALERTS:
+                    lines.append(u"{} more alerts not shown.".format(
+                        len(alerts) - MAX_DIGEST_ALERTS))
+                body = u"\n".join(lines)
+            self.send_email(from_address, list(recipients), subject, body)
 
 
 def main(argv=sys.argv):
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for the EmailerAgent against a local smtpd debugging server.
+"""
+
+import json
+import socket
+import subprocess
+import sys
+import textwrap
+
+import gevent
+import pytest
+
+from emailer.agent import EmailerAgent
+from volttron.platform.messaging.health import ALERT_KEY
+
+# A DebuggingServer that also reports each connection it accepts.
+SMTP_SERVER = textwrap.dedent("""
+    import asyncore, smtpd, sys
+
+    class Server(smtpd.DebuggingServer):
+        def handle_accept(self):
+            sys.stdout.write("CONNECTION\\n")
+            smtpd.DebuggingServer.handle_accept(self)
+
+    Server(("127.0.0.1", int(sys.argv[1])), None)
+    sys.stdout.write("READY\\n")
+    sys.stdout.flush()
+    asyncore.loop()
+""")
+
+MESSAGE_MARKER = "---------- MESSAGE FOLLOWS ----------"
+
+
+class SMTPServer(object):
+    def __init__(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        sock.close()
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-c", SMTP_SERVER, str(self.port)],
+            stdout=subprocess.PIPE)
+        assert self.process.stdout.readline().strip() == "READY"
+        self.output = None
+
+    @property
+    def address(self):
+        return "127.0.0.1:{}".format(self.port)
+
+    def stop(self):
+        if self.output is None:
+            self.process.terminate()
+            self.output = self.process.stdout.read()
+        return self.output
+
+
+@pytest.fixture
+def smtp_server(request):
+    server = SMTPServer()
+    request.addfinalizer(server.stop)
+    return server
+
+
+@pytest.fixture
+def emailer(request, smtp_server, tmpdir):
+    config_path = tmpdir.join("emailer.config")
+    config_path.write(json.dumps({"smtp-address": smtp_server.address,
+                                  "from-address": "platform@localhost",
+                                  "to-addresses": ["admin@localhost"]}))
+    agent = EmailerAgent(str(config_path), address="inproc://emailer_test")
+    agent.configure_main("config", "UPDATE",
+                         {"alert_digest_seconds": 0.5,
+                          "record_sent_emails": False})
+    agent._sender = gevent.spawn(agent._send_loop)
+
+    def cleanup():
+        agent._sender.kill()
+        agent._close_smtp()
+
+    request.addfinalizer(cleanup)
+    return agent
+
+
+def wait_for_outbox(agent):
+    while not agent._outbox.empty() or agent._digest_greenlet is not None:
+        gevent.sleep(0.1)
+    gevent.sleep(0.5)
+
+
+def test_emails_share_connection(emailer, smtp_server):
+    for index in range(10):
+        emailer.send_email("platform@localhost", "admin@localhost",
+                           "Subject {}".format(index), "Message body")
+    wait_for_outbox(emailer)
+
+    output = smtp_server.stop()
+    assert output.count(MESSAGE_MARKER) == 10
+    assert output.count("CONNECTION") == 1
+
+
+def test_alert_storm_sent_as_digest(emailer, smtp_server):
+    for index in range(10000):
+        emailer.on_alert_message("pubsub", "agent", "", "alerts/agent",
+                                 {ALERT_KEY: "key{}".format(index)},
+                                 "Alert number {}".format(index))
+    # The callback only queues the alert.
+    assert emailer._outbox.empty()
+
+    wait_for_outbox(emailer)
+
+    output = smtp_server.stop()
+    assert output.count(MESSAGE_MARKER) == 1
+    assert "Subject: 10000 alerts" in output
+    assert "9500 more alerts not shown." in output
+
+
+def test_repeated_alert_key_is_rate_limited(emailer, smtp_server):
+    for _ in range(100):
+        emailer.on_alert_message("pubsub", "agent", "", "alerts/agent",
+                                 {ALERT_KEY: "same_key"}, "Bad status")
+    wait_for_outbox(emailer)
+
+    output = smtp_server.stop()
+    assert output.count(MESSAGE_MARKER) == 1
+    assert "Subject: Alert for alerts/agent same_key" in output
+
+
+def test_reconnect_after_server_drops_connection(emailer, smtp_server):
+    emailer.send_email("platform@localhost", "admin@localhost", "First",
+                       "Message body")
+    wait_for_outbox(emailer)
+    # Simulate the server closing an idle connection.
+    emailer._smtp.sock.close()
+    emailer.send_email("platform@localhost", "admin@localhost", "Second",
+                       "Message body")
+    wait_for_outbox(emailer)
+
+    output = smtp_server.stop()
+    assert output.count(MESSAGE_MARKER) == 2
+    assert output.count("CONNECTION") == 2
@@ -59,12 +59,21 @@
 
 from __future__ import absolute_import
 
+from gevent import monkey
+# Sources are read concurrently so requests must not block the hub.
+monkey.patch_socket()
+monkey.patch_ssl()
+
+import hashlib
 import logging
 import sys
 import csv
 from ast import literal_eval
 from StringIO import StringIO
+import gevent
+from gevent.pool import Pool
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from volttron.platform.messaging.utils import Topic
 
@@ -92,25 +101,39 @@ def external_data_agent(config_path, **kwargs):
     default_password = config.get('default_password')
     global_topic_prefix = config.get('global_topic_prefix', "")
     sources = config.get("sources", [])
+    timeout = config.get('timeout', 30.0)
+    max_concurrent_requests = config.get('max_concurrent_requests', 10)
 
-    return ExternalData(interval, default_user, default_password, sources, global_topic_prefix, **kwargs)
+    return ExternalData(interval, default_user, default_password, sources, global_topic_prefix,
+                        timeout=timeout, max_concurrent_requests=max_concurrent_requests, **kwargs)
 
 
 class ExternalData(Agent):
     """Gathers and publishes JSON data available via a web api.
+
+    Sources are read concurrently over a shared keep-alive session. Data
+    that has not changed since the last read of a source is not published
+    again.
     """
-    def __init__(self, interval, default_user, default_password, sources, global_topic_prefix, **kwargs):
+    def __init__(self, interval, default_user, default_password, sources, global_topic_prefix,
+                 timeout=30.0, max_concurrent_requests=10, **kwargs):
         super(ExternalData, self).__init__(**kwargs)
         self.interval = interval
         self.default_user = default_user
         self.default_password = default_password
+        self.timeout = timeout
 
         self.periodic_greenlet = None
+        self.pool = None
+        self.session = None
+        self.source_states = []
 
         self.default_config = {"interval": interval,
                                "global_topic_prefix": global_topic_prefix,
                                "default_user": default_user,
-                               "default_password": default_password}
+                               "default_password": default_password,
+                               "timeout": timeout,
+                               "max_concurrent_requests": max_concurrent_requests}
 
         self.default_config["sources"] = self.sources = self._validate_sources(sources, global_topic_prefix)
 
@@ -165,49 +188,114 @@ class ExternalData(Agent):
             _log.error("Error setting scrape interval, reverting to default of 300 seconds")
             interval = 300.0
 
+        try:
+            self.timeout = float(config.get("timeout", 30.0))
+        except ValueError:
+            _log.error("Error setting request timeout, reverting to default of 30 seconds")
+            self.timeout = 30.0
+
+        try:
+            max_concurrent_requests = max(int(config.get("max_concurrent_requests", 10)), 1)
+        except ValueError:
+            _log.error("Error setting max_concurrent_requests, reverting to default of 10")
+            max_concurrent_requests = 10
+
         if self.periodic_greenlet is not None:
             self.periodic_greenlet.kill()
 
+        if self.pool is not None:
+            self.pool.kill()
+
+        if self.session is not None:
+            self.session.close()
+
+        self.pool = Pool(max_concurrent_requests)
+        self.session = self._create_session(max_concurrent_requests)
+        self.source_states = [{"greenlet": None, "etag": None, "last_modified": None, "digest": None}
+                              for _ in self.sources]
+
         self.periodic_greenlet = self.core.periodic(interval, self._publish_data)
 
+    @staticmethod
+    def _create_session(max_concurrent_requests):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrent_requests)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def _publish_data(self):
-        for source in self.sources:
-            now = utils.get_aware_utc_now()
-            now = utils.format_timestamp(now)
-            headers = {
-                headers_mod.DATE: now,
-                headers_mod.TIMESTAMP: now
-            }
+        for source, state in zip(self.sources, self.source_states):
+            greenlet = state["greenlet"]
+            if greenlet is not None and not greenlet.ready():
+                _log.warning("Source {url} is still being read from the last interval, "
+                             "skipping it".format(url=source.get("url")))
+                continue
 
-            url = source.get("url")
-            params = source.get("params")
-            source_topic = source.get("topic", "")
-            user = source.get("user", self.default_user)
-            password = source.get("password", self.default_password)
-            source_type = source.get("type", "raw")
+            state["greenlet"] = self.pool.spawn(self._read_source, source, state)
+
+    def _read_source(self, source, state):
+        url = source.get("url")
+        params = source.get("params")
+        source_topic = source.get("topic", "")
+        user = source.get("user", self.default_user)
+        password = source.get("password", self.default_password)
+        source_type = source.get("type", "raw")
+        timeout = source.get("timeout", self.timeout)
 
-            kwargs = {"params":params}
+        request_headers = {}
+        if state["etag"] is not None:
+            request_headers["If-None-Match"] = state["etag"]
+        if state["last_modified"] is not None:
+            request_headers["If-Modified-Since"] = state["last_modified"]
 
-            if user is not None:
-                kwargs["auth"] = HTTPBasicAuth(user, password)
+        kwargs = {"params": params, "headers": request_headers, "timeout": timeout}
 
-            try:
-                r = requests.get(url, **kwargs)
+        if user is not None:
+            kwargs["auth"] = HTTPBasicAuth(user, password)
+
+        try:
+            with gevent.Timeout(timeout):
+                r = self.session.get(url, **kwargs)
                 r.raise_for_status()
-            except StandardError as e:
-                _log.error("Failure to read from source {url} {reason}".format(url=url, reason=str(e)))
-                continue
+        except gevent.Timeout:
+            _log.error("Failure to read from source {url} timed out after {timeout} seconds".format(
+                url=url, timeout=timeout))
+            return
+        except StandardError as e:
+            _log.error("Failure to read from source {url} {reason}".format(url=url, reason=str(e)))
+            return
+
+        if r.status_code == requests.codes.not_modified:
+            _log.debug("Source {url} not modified".format(url=url))
+            return
+
+        digest = hashlib.sha1(r.content).digest()
+        state["etag"] = r.headers.get("ETag")
+        state["last_modified"] = r.headers.get("Last-Modified")
+        if digest == state["digest"]:
+            _log.debug("Source {url} unchanged".format(url=url))
+            return
+
+        now = utils.get_aware_utc_now()
+        now = utils.format_timestamp(now)
+        headers = {
+            headers_mod.DATE: now,
+            headers_mod.TIMESTAMP: now
+        }
+
+        try:
+            if source_type.lower() == "json":
+                self._handle_json(headers, r, url, source_topic, source)
+            elif source_type.lower() == "csv":
+                self._handle_csv(headers, r, url, source_topic, source)
+            elif source_type.lower() == "raw":
+                self._handle_raw(headers, r, url, source_topic, source)
+        except StandardError as e:
+            _log.error("General failure during processing of source {url} {reason}".format(url=url, reason=str(e)))
+            return
 
-            try:
-                if source_type.lower() == "json":
-                    self._handle_json(headers, r, url, source_topic, source)
-                elif source_type.lower() == "csv":
-                    self._handle_csv(headers, r, url, source_topic, source)
-                elif source_type.lower() == "raw":
-                    self._handle_raw(headers, r, url, source_topic, source)
-            except StandardError as e:
-                _log.error("General failure during processing of source {url} {reason}".format(url=url, reason=str(e)))
+        state["digest"] = digest
 
 
     def _handle_json(self, headers, request, url, source_topic, source_params):
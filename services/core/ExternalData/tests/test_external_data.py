@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for reading ExternalData sources from a local HTTP stub server.
+"""
+
+import gevent
+import gevent.pool
+import pytest
+from gevent.pywsgi import WSGIServer
+
+from external_data.agent import ExternalData
+
+
+class StubServer(object):
+    """Serves fixed content per path with optional latency and ETags."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.server = WSGIServer(('127.0.0.1', 0), self, log=None)
+        self.server.start()
+
+    def add(self, path, body, delay=0, etag=None):
+        self.routes[path] = (body, delay, etag)
+
+    def url(self, path):
+        return 'http://127.0.0.1:{}{}'.format(self.server.server_port, path)
+
+    def __call__(self, environ, start_response):
+        path = environ['PATH_INFO']
+        self.requests.append(path)
+        body, delay, etag = self.routes[path]
+        gevent.sleep(delay)
+        headers = [('Content-Type', 'text/plain')]
+        if etag is not None:
+            headers.append(('ETag', etag))
+            if environ.get('HTTP_IF_NONE_MATCH') == etag:
+                start_response('304 Not Modified', headers)
+                return []
+        start_response('200 OK', headers)
+        return [body]
+
+
+@pytest.fixture
+def server(request):
+    server = StubServer()
+    request.addfinalizer(server.server.stop)
+    return server
+
+
+def build_agent(sources, timeout=30.0):
+    agent = ExternalData(300, None, None, sources, "record", timeout=timeout,
+                         max_concurrent_requests=4, address="inproc://external_data_test")
+    agent.pool = gevent.pool.Pool(4)
+    agent.session = agent._create_session(4)
+    agent.source_states = [{"greenlet": None, "etag": None, "last_modified": None, "digest": None}
+                           for _ in agent.sources]
+    agent.published = []
+
+    def handle_raw(headers, request, url, source_topic, source_params):
+        agent.published.append((source_topic, request.content))
+
+    agent._handle_raw = handle_raw
+    return agent
+
+
+def test_slow_source_does_not_delay_others(server):
+    server.add('/slow', 'slow data', delay=1.0)
+    server.add('/fast', 'fast data')
+    agent = build_agent([{"url": server.url('/slow'), "topic": "slow"},
+                         {"url": server.url('/fast'), "topic": "fast"}])
+
+    agent._publish_data()
+    gevent.sleep(0.3)
+    assert agent.published == [("fast", "fast data")]
+
+    agent.pool.join()
+    assert agent.published == [("fast", "fast data"), ("slow", "slow data")]
+
+
+def test_source_still_reading_skips_cycle(server):
+    server.add('/slow', 'slow data', delay=0.5)
+    server.add('/fast', 'fast data')
+    agent = build_agent([{"url": server.url('/slow'), "topic": "slow"},
+                         {"url": server.url('/fast'), "topic": "fast"}])
+
+    agent._publish_data()
+    gevent.sleep(0.1)
+    server.add('/fast', 'new fast data')
+    agent._publish_data()
+    agent.pool.join()
+
+    assert server.requests.count('/slow') == 1
+    assert server.requests.count('/fast') == 2
+
+
+def test_source_timeout(server):
+    server.add('/hung', 'late data', delay=2.0)
+    agent = build_agent([{"url": server.url('/hung'), "topic": "hung", "timeout": 0.2}])
+
+    agent._publish_data()
+    gevent.sleep(0.5)
+
+    assert agent.source_states[0]["greenlet"].ready()
+    assert agent.published == []
+
+
+def test_not_modified_is_not_published(server):
+    server.add('/etag', 'data', etag='"v1"')
+    agent = build_agent([{"url": server.url('/etag'), "topic": "etag"}])
+
+    for _ in range(2):
+        agent._publish_data()
+        agent.pool.join()
+
+    assert server.requests == ['/etag', '/etag']
+    assert agent.published == [("etag", "data")]
+
+    server.add('/etag', 'new data', etag='"v2"')
+    agent._publish_data()
+    agent.pool.join()
+    assert agent.published == [("etag", "data"), ("etag", "new data")]
+
+
+def test_identical_content_is_not_published(server):
+    server.add('/plain', 'data')
+    agent = build_agent([{"url": server.url('/plain'), "topic": "plain"}])
+
+    for _ in range(2):
+        agent._publish_data()
+        agent.pool.join()
+
+    assert len(server.requests) == 2
+    assert agent.published == [("plain", "data")]
@@ -59,17 +59,51 @@ import datetime
 import logging
 import time
 
+import gevent
+from gevent.lock import Semaphore
+
 from volttron.platform.agent import utils
 from volttron.platform.agent.known_identities import CONTROL
 from volttron.platform.jsonrpc import RemoteError
 from volttron.platform.keystore import KnownHostsStore
 from volttron.platform.messaging.health import Status, STATUS_BAD, STATUS_GOOD
-from volttron.platform.vip.agent import Agent, Core, PubSub, Unreachable
+from volttron.platform.vip.agent import (Agent, Core, PubSub, Unreachable,
+                                         VIPError)
 from volttron.platform.vip.agent.connection import Connection
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '0.2'
+__version__ = '0.3'
+
+
+class RemoteLiveness(object):
+    """Track whether the remote failover agent is alive from ping results.
+
+    The remote is up while a pong has been received within the detection
+    window. An unreachable remote, or one dropped from the peer list, is
+    down at once. Until the remote has been seen once it is given a grace
+    period so that an instance does not take over while its peer starts.
+
+    :param window: Seconds without a pong before the remote is down.
+    :param grace: Seconds the remote is assumed up after startup.
+    """
+    def __init__(self, window, grace, clock=time.time):
+        self.window = window
+        self._clock = clock
+        self._deadline = clock() + grace
+        self._seen = False
+
+    def pong(self):
+        self._seen = True
+        self._deadline = self._clock() + self.window
+
+    def lost(self):
+        """The remote is unreachable or was dropped from the peer list."""
+        if self._seen:
+            self._deadline = 0
+
+    def is_up(self):
+        return self._clock() < self._deadline
 
 
 class FailoverAgent(Agent):
@@ -107,17 +141,39 @@ class FailoverAgent(Agent):
         self.heartbeat_period = config["heartbeat_period"]
         self.timeout = config["timeout"]
 
+        # "heartbeat" publishes heartbeats and polls every second. "vip"
+        # pings the remote failover agent and reacts to peer list changes.
+        self.liveness = config.get("liveness", "heartbeat")
+        if self.liveness not in ("heartbeat", "vip"):
+            _log.error("liveness must be either 'heartbeat' or 'vip'")
+        self.detection_window = config.get("detection_window", 0.5)
+        self._event_driven = self.liveness == "vip"
+
         self.vc_timeout = self.timeout
         self.remote_timeout = self.timeout
         self.agent_uuid = None
         self.heartbeat = None
         self.last_connected = None
 
+        # Identities the failover agents connect to the other instance with.
+        self.link_identity = 'failover.' + self.agent_id
+        self.remote_link_identity = 'failover.' + self.remote_id
+        self.remote_liveness = RemoteLiveness(self.detection_window,
+                                              self.timeout)
+        self._remote_is_up = True
+        self._vc_deadline = time.time() + self.timeout
+        self._target_status = None
+        self._evaluating = Semaphore()
+
         self._state = True, True
         self._state_machine = getattr(self, self.agent_id + '_state_machine')
 
     @Core.receiver("onstart")
     def onstart(self, sender, **kwargs):
+        if self._event_driven:
+            self._start_vip_liveness()
+            return
+
         # Start an agent to send heartbeats to the other failover instance
         self.heartbeat = self.build_connection()
 
@@ -138,34 +194,107 @@ class FailoverAgent(Agent):
         self.core.periodic(self.heartbeat_period, periodic)
         self.core.periodic(1, self.check_pulse)
 
+    def _start_vip_liveness(self):
+        """Detect failure of the remote from VIP pings and peer changes.
+
+        The link to the remote instance is an agent with a known identity
+        so that the remote failover agent can ping it through its own
+        router, which fails at once if the link has gone away. Pings are
+        sent three times per detection window. The target agent's status
+        is only refreshed when it joins or leaves the local peer list and
+        otherwise once every timeout as a safety net.
+        """
+        self.vip.peerlist.onadd.connect(self._on_peer_add, self)
+        self.vip.peerlist.ondrop.connect(self._on_peer_drop, self)
+        self.core.spawn(self._connect_link)
+        self.core.periodic(self.detection_window / 3.0, self._probe_remote)
+        self.core.periodic(self.timeout, self._reconcile,
+                           wait=self.timeout)
+        self._evaluate()
+
+    def _connect_link(self):
+        while self.heartbeat is None:
+            try:
+                self.heartbeat = self.build_connection(
+                    identity=self.link_identity)
+            except gevent.Timeout:
+                _log.debug("Remote instance not reachable, retrying")
+
+    def _probe_remote(self):
+        try:
+            self.vip.ping(self.remote_link_identity).get(
+                timeout=self.detection_window / 3.0)
+            self.remote_liveness.pong()
+        except Unreachable:
+            self.remote_liveness.lost()
+        except (gevent.Timeout, VIPError):
+            pass
+        self._update_remote()
+
+    def _on_peer_add(self, sender, peer, **kwargs):
+        if peer == self.agent_vip_identity:
+            self._target_status = None
+            self._evaluate()
+
+    def _on_peer_drop(self, sender, peer, **kwargs):
+        if peer == self.remote_link_identity:
+            self.remote_liveness.lost()
+            self._update_remote()
+        elif peer == self.agent_vip_identity:
+            self._target_status = None
+            self._evaluate()
+
+    def _update_remote(self):
+        is_up = self.remote_liveness.is_up()
+        if is_up != self._remote_is_up:
+            _log.debug("Remote failover agent is {}".format(
+                "up" if is_up else "down"))
+            self._remote_is_up = is_up
+            self._evaluate()
+
+    def _reconcile(self):
+        self.agent_uuid = None
+        self._target_status = None
+        self._evaluate()
+
+    def _evaluate(self):
+        with self._evaluating:
+            vc_is_up = time.time() < self._vc_deadline
+            current_state = self._remote_is_up, vc_is_up
+
+            if self.agent_uuid is None:
+                self._find_agent_uuid()
+                if self.agent_uuid is None:
+                    return
+
+            self._state_machine(current_state)
+
     def timestamp(self):
         return time.mktime(datetime.datetime.now().timetuple())
 
-    def build_connection(self):
+    def build_connection(self, **kwargs):
         return Connection(self.remote_vip,
                           peer='',
                           serverkey=self.remote_serverkey,
                           publickey=self.core.publickey,
-                          secretkey=self.core.secretkey)
+                          secretkey=self.core.secretkey,
+                          **kwargs)
 
     @PubSub.subscribe('pubsub', 'heartbeat')
     def on_match(self, peer, sender, bus, topic, headers, message):
         if topic.startswith('heartbeat/VolttronCentralAgent'):
             self.vc_timeout = self.timeout
+            self._vc_deadline = time.time() + self.timeout
         elif topic.startswith('heartbeat/' + self.remote_id):
             self.remote_timeout = self.timeout
 
     def _find_agent_uuid(self):
         self.agent_uuid = None
+        self._target_status = None
         agents = self.vip.rpc.call(CONTROL, 'list_agents').get()
-        uuids = [a['uuid'] for a in agents]
-        for uuid in uuids:
-            vip_id = self.vip.rpc.call(CONTROL,
-                                       'agent_vip_identity',
-                                       uuid).get()
-
-            if vip_id == self.agent_vip_identity:
-                self.agent_uuid = uuid
+        for agent in agents:
+            if agent['identity'] == self.agent_vip_identity:
+                self.agent_uuid = agent['uuid']
 
         if self.agent_uuid is None:
             _log.error("Agent {} is not installed"
@@ -186,10 +315,29 @@ class FailoverAgent(Agent):
         self._state_machine(current_state)
 
     def _agent_control(self, command):
+        self._target_status = None
         try:
             self.vip.rpc.call(CONTROL, command, self.agent_uuid).get()
         except RemoteError as e:
             _log.error("Error calling {} on control".format(command))
+            # The agent may have been reinstalled under a new uuid.
+            self.agent_uuid = None
+
+    def _target_is_running(self):
+        """Return whether the target agent is running.
+
+        In vip liveness mode the status is cached until the target joins or
+        leaves the peer list or is started or stopped by this agent.
+        """
+        if self._target_status is None or not self._event_driven:
+            try:
+                self._target_status = self.vip.rpc.call(
+                    CONTROL, 'agent_status', self.agent_uuid).get()
+            except RemoteError:
+                self.agent_uuid = None
+                return False
+        pid, returncode = self._target_status
+        return pid > 0 and returncode is None
 
     def primary_state_machine(self, current_state):
         """Function representing the state machine for a primary
@@ -246,12 +394,7 @@ class FailoverAgent(Agent):
             status = Status.build(STATUS_GOOD, context=context)
             self.vip.health.send_alert(alert_key, status)
 
-        proc_info = self.vip.rpc.call(CONTROL,
-                                      'agent_status',
-                                      self.agent_uuid).get()
-
-        is_running = proc_info[0] > 0 and proc_info[1] == None
-        if not is_running:
+        if not self._target_is_running():
             self._agent_control('start_agent')
 
     def simple_secondary_state_machine(self, current_state):
@@ -276,7 +419,8 @@ class FailoverAgent(Agent):
                 status = Status.build(STATUS_GOOD, context=context)
                 self.vip.health.send_alert(alert_key, status)
 
-            self._agent_control('stop_agent')
+            if self._target_is_running():
+                self._agent_control('stop_agent')
 
         else:
             context = 'Primary is inactive starting agent {}'.format(
@@ -287,11 +431,7 @@ class FailoverAgent(Agent):
                 status = Status.build(STATUS_BAD, context=context)
                 self.vip.health.send_alert(alert_key, status)
 
-            proc_info = self.vip.rpc.call(CONTROL,
-                                          'agent_status',
-                                          self.agent_uuid).get()
-            is_running = proc_info[0] > 0 and proc_info[1] == None
-            if not is_running:
+            if not self._target_is_running():
                 self._agent_control('start_agent')
 
 
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for VIP based liveness detection in the FailoverAgent.
+"""
+
+import json
+import time
+
+import gevent
+import pytest
+
+from failover.agent import FailoverAgent, RemoteLiveness
+
+DETECTION_WINDOW = 0.5
+# Long enough that only VIP liveness can fail over in time.
+HEARTBEAT_TIMEOUT = 10
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_remote_liveness():
+    clock = Clock()
+    liveness = RemoteLiveness(0.5, 10, clock=clock)
+
+    # Grace period while the remote starts, unreachable is ignored.
+    liveness.lost()
+    assert liveness.is_up()
+    clock.now += 10
+    assert not liveness.is_up()
+
+    liveness.pong()
+    clock.now += 0.4
+    assert liveness.is_up()
+    clock.now += 0.2
+    assert not liveness.is_up()
+
+    liveness.pong()
+    liveness.lost()
+    assert not liveness.is_up()
+
+
+class SimulatedFailover(FailoverAgent):
+    """FailoverAgent that manages a pretend agent and records commands."""
+
+    def __init__(self, config_path, **kwargs):
+        self.commands = []
+        self.running = False
+        super(SimulatedFailover, self).__init__(config_path, **kwargs)
+
+    def _find_agent_uuid(self):
+        self.agent_uuid = 'simulated'
+
+    def _target_is_running(self):
+        return self.running
+
+    def _agent_control(self, command):
+        self.commands.append((command, time.time()))
+        self.running = command == 'start_agent'
+
+
+def build_failover(instance, remote, agent_id, tmpdir):
+    config = tmpdir.join(agent_id)
+    config.write(json.dumps({
+        "agent_id": agent_id,
+        "simple_behavior": True,
+        "remote_vip": remote.vip_address,
+        "remote_serverkey": remote.serverkey,
+        "agent_vip_identity": "listener",
+        "heartbeat_period": 1,
+        "timeout": HEARTBEAT_TIMEOUT,
+        "liveness": "vip",
+        "detection_window": DETECTION_WINDOW
+    }))
+    return instance.build_agent(agent_class=SimulatedFailover,
+                                identity='failover',
+                                config_path=str(config))
+
+
+def wait_for(condition, timeout=10):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            return False
+        gevent.sleep(0.05)
+    return True
+
+
+@pytest.mark.timeout(60)
+def test_failover_time(get_volttron_instances, tmpdir):
+    primary_instance, secondary_instance = get_volttron_instances(2)
+    primary_instance.allow_all_connections()
+    secondary_instance.allow_all_connections()
+
+    primary = build_failover(primary_instance, secondary_instance,
+                             'primary', tmpdir)
+    secondary = build_failover(secondary_instance, primary_instance,
+                               'secondary', tmpdir)
+
+    assert wait_for(lambda: primary.running)
+    # Wait until the secondary has heard from the primary.
+    assert wait_for(lambda: secondary.remote_liveness._seen)
+    gevent.sleep(2)
+    assert not secondary.running
+
+    # Simulate a crash of the primary failover agent.
+    crashed = time.time()
+    primary.heartbeat.kill()
+    primary.core.stop()
+
+    assert wait_for(lambda: secondary.running, HEARTBEAT_TIMEOUT)
+    # Generous slack for a loaded machine, still well inside the
+    # heartbeat timeout.
+    failover_time = secondary.commands[-1][1] - crashed
+    assert failover_time < DETECTION_WINDOW * 8
+
+    secondary.heartbeat.kill()
+    secondary.core.stop()
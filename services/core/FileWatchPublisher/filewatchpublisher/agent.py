@@ -57,7 +57,9 @@
 #}}}
 
 import gevent
+import json
 import logging
+import os
 import os.path
 import sys
 
@@ -65,12 +67,12 @@ from datetime import datetime
 from volttron.platform.agent.utils import watch_file_with_fullpath
 from volttron.platform.vip.agent import Agent, RPC, Core
 from volttron.platform.agent import utils
+from volttron.utils.filetail import FileTail
 
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '3.6'
-
+__version__ = '3.7'
 
 def file_watch_publisher(config_path, **kwargs):
     """Load the FileWatchPublisher agent configuration and returns and instance
@@ -93,15 +95,25 @@ class FileWatchPublisher(Agent):
     in configuration with an error message.
     Exists if all files does not exist.
 
-    :param config: Configuration dict
-    :type config: dict
+    Files are kept open and followed across truncation and rotation. The
+    offset of the last published line of each file is saved to
+    `offsets_file` every `flush_interval` seconds and when the agent stops
+    so that a restarted agent continues where it stopped.
+
+    By default every line is published as its own message. If
+    `max_batch_size` is greater than zero lines are collected and published
+    as ``{"timestamp": ..., "lines": [...]}`` every `flush_interval` seconds
+    or as soon as `max_batch_size` lines are waiting.
+
+    :param config: Configuration list, or dict with a "publish_file" list
+    :type config: list or dict
 
     Example configuration:
 
     .. code-block:: python
 
         {
-	        "publish_file": [
+            "publish_file": [
                 {
                     "file": "/var/log/syslog",
                     "topic": "platform/syslog",
@@ -110,25 +122,45 @@ class FileWatchPublisher(Agent):
                     "file": "/home/volttron/tempfile.txt",
                     "topic": "temp/filepublisher",
                 }
-	        ]
+            ],
+            "max_batch_size": 500,
+            "flush_interval": 1.0,
+            "offsets_file": "filewatchpublisher.offsets"
         }
     """
     def __init__(self, config, **kwargs):
         super(FileWatchPublisher, self).__init__(**kwargs)
-        self.config = config
-        items = config[:]
+        if isinstance(config, dict):
+            items = config.get("publish_file", [])
+        else:
+            items, config = config, {}
+        self.max_batch_size = int(config.get("max_batch_size", 0))
+        self.flush_interval = float(config.get("flush_interval", 1.0))
+        self.offsets_file = config.get("offsets_file",
+                                       "filewatchpublisher.offsets")
+        offsets = self._load_offsets()
+
+        self.config = []
         self.file_topic = {}
-        self.file_end_position = {}
-        for item in self.config:
-            file =  item["file"]
-            self.file_topic[file] = item["topic"]
-            if os.path.isfile(file):
-                with open(file, 'r') as f:
-                    self.file_end_position[file] = self.get_end_position(f)
-            else:
+        self.tails = {}
+        self.state = {}
+        for item in items:
+            file = item["file"]
+            if not os.path.isfile(file):
                 _log.error("File " + file + " does not exists. Ignoring this file.")
-                items.remove(item)
-        self.config = items
+                continue
+            saved = offsets.get(file, {})
+            tail = FileTail(file, saved.get("inode"), saved.get("offset"))
+            self.config.append(item)
+            self.file_topic[file] = item["topic"]
+            self.tails[file] = tail
+            # Offset of the first line not yet published and the lines
+            # read from that offset that are waiting to be published.
+            self.state[file] = {"inode": tail.inode,
+                                "offset": tail.position,
+                                "pending": [],
+                                "pending_bytes": 0}
+        self._offsets_dirty = False
 
     @Core.receiver('onstart')
     def starting(self, sender, **kwargs):
@@ -140,25 +172,106 @@ class FileWatchPublisher(Agent):
             for item in self.config:
                 file = item["file"]
                 self.core.spawn(watch_file_with_fullpath, file, self.read_file)
+            self.core.periodic(self.flush_interval, self._poll_and_flush)
+            # Pick up anything written while the agent was not running.
+            for file in self.tails:
+                self.read_file(file)
+
+    @Core.receiver('onstop')
+    def stopping(self, sender, **kwargs):
+        for file in self.tails:
+            self._flush(file, flush_all=True)
+        self._save_offsets()
+        for tail in self.tails.values():
+            tail.close()
 
-    def read_file(self,file):
-        _log.debug('loading file %s', file)
-        with open(file, 'r') as f:
-            f.seek(self.file_end_position[file])
-            for line in f:
-                self.publish_file(line.strip(),self.file_topic[file])
-            self.file_end_position[file] = self.get_end_position(f)
+    def read_file(self, file):
+        state = self.state[file]
+        for inode, start, lines in self.tails[file].read():
+            if (inode != state["inode"] or
+                    start != state["offset"] + state["pending_bytes"]):
+                # Truncated or replaced, finish with the old file first.
+                self._flush(file, flush_all=True)
+                state["inode"] = inode
+                state["offset"] = start
+                self._offsets_dirty = True
+            state["pending"].extend(lines)
+            state["pending_bytes"] += sum(len(line) + 1 for line in lines)
+
+        # Offsets are saved by the periodic flush.
+        if self.max_batch_size > 0:
+            self._flush(file)
+        else:
+            self._flush(file, flush_all=True)
+
+    def _poll_and_flush(self):
+        # Also catches changes that were not reported by inotify.
+        for file in self.tails:
+            self.read_file(file)
+            self._flush(file, flush_all=True)
+        self._save_offsets()
+
+    def _flush(self, file, flush_all=False):
+        """Publish waiting lines for `file`.
+
+        Only full batches are published unless `flush_all` is set.
+        """
+        state = self.state[file]
+        pending = state["pending"]
+        topic = self.file_topic[file]
+        if self.max_batch_size > 0:
+            batch_size = self.max_batch_size
+        else:
+            batch_size = 1
+        while pending and (flush_all or len(pending) >= batch_size):
+            lines = pending[:batch_size]
+            del pending[:batch_size]
+            if self.max_batch_size > 0:
+                self.publish_lines([line.strip() for line in lines], topic)
+            else:
+                self.publish_file(lines[0].strip(), topic)
+            size = sum(len(line) + 1 for line in lines)
+            state["offset"] += size
+            state["pending_bytes"] -= size
+            self._offsets_dirty = True
 
     def publish_file(self, line, topic):
         message = {'timestamp':  datetime.utcnow().isoformat() + 'Z',
                    'line': line}
-        _log.debug('publishing message {} on topic {}'.format(message, topic))
         self.vip.pubsub.publish(peer="pubsub", topic=topic,
                                 message=message)
 
-    def get_end_position(self, f):
-        f.seek(0,2)
-        return f.tell()
+    def publish_lines(self, lines, topic):
+        message = {'timestamp':  datetime.utcnow().isoformat() + 'Z',
+                   'lines': lines}
+        self.vip.pubsub.publish(peer="pubsub", topic=topic,
+                                message=message)
+
+    def _load_offsets(self):
+        if not self.offsets_file or not os.path.isfile(self.offsets_file):
+            return {}
+        try:
+            with open(self.offsets_file, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            _log.error("Unable to read offsets from %s: %s",
+                       self.offsets_file, e)
+            return {}
+
+    def _save_offsets(self):
+        if not self.offsets_file or not self._offsets_dirty:
+            return
+        offsets = {file: {"inode": state["inode"], "offset": state["offset"]}
+                   for file, state in self.state.items()}
+        tmp = self.offsets_file + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(offsets, f)
+            os.rename(tmp, self.offsets_file)
+            self._offsets_dirty = False
+        except (IOError, OSError) as e:
+            _log.error("Unable to save offsets to %s: %s",
+                       self.offsets_file, e)
 
 
 def main(argv=sys.argv):
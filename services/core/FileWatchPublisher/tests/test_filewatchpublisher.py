@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for batching lines and saving offsets in the FileWatchPublisher.
+"""
+
+from filewatchpublisher.agent import FileWatchPublisher
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def make_agent(tmpdir, path, **config):
+    config.update({"publish_file": [{"file": path, "topic": "log"}],
+                   "offsets_file": str(tmpdir.join('offsets'))})
+    agent = FileWatchPublisher(config, address="inproc://filewatch")
+    published = []
+    agent.publish_lines = lambda lines, topic: published.append(lines)
+    agent.publish_file = lambda line, topic: published.append(line)
+    return agent, published
+
+
+def test_batches_and_offsets(tmpdir):
+    path = str(tmpdir.join('log'))
+    append(path, 'old\n')
+    agent, published = make_agent(tmpdir, path, max_batch_size=2)
+
+    append(path, 'a\nb\nc\n')
+    agent.read_file(path)
+    assert published == [['a', 'b']]
+
+    agent._poll_and_flush()
+    assert published == [['a', 'b'], ['c']]
+
+    # A restarted agent continues after the last published line.
+    append(path, 'd\n')
+    agent, published = make_agent(tmpdir, path, max_batch_size=2)
+    agent._poll_and_flush()
+    assert published == [['d']]
+
+
+def test_lines_published_one_at_a_time_by_default(tmpdir):
+    path = str(tmpdir.join('log'))
+    append(path, 'old\n')
+    agent, published = make_agent(tmpdir, path)
+
+    append(path, 'a\nb\n')
+    agent.read_file(path)
+    assert published == ['a', 'b']
+
+
+def test_offsets_saved_periodically_not_per_line(tmpdir):
+    path = str(tmpdir.join('log'))
+    append(path, 'old\n')
+    agent, published = make_agent(tmpdir, path)
+    offsets = tmpdir.join('offsets')
+
+    append(path, 'a\n')
+    agent.read_file(path)
+    assert published == ['a']
+    assert not offsets.check()
+
+    agent._poll_and_flush()
+    assert offsets.check()
+    agent, published = make_agent(tmpdir, path)
+    append(path, 'b\n')
+    agent.read_file(path)
+    assert published == ['b']
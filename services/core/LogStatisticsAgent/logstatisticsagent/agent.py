@@ -58,17 +58,22 @@
 
 import datetime
 import logging
+import math
 import os
+import re
 import sys
 import statistics
+import time
+from collections import defaultdict
 
 from volttron.platform.vip.agent import Agent, RPC, Core
 from volttron.platform.agent import utils
 from volttron.platform.agent.utils import get_aware_utc_now
+from volttron.utils.filetail import FileTail
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '1.0'
+__version__ = '1.1'
 
 
 def log_statistics(config_path, **kwargs):
@@ -85,11 +90,122 @@ def log_statistics(config_path, **kwargs):
     return LogStatisticsAgent(config, **kwargs)
 
 
+# Matches the start of a record written by the platform's AgentFormatter,
+# for example "2017-01-01 00:00:00,000 (listeneragent-3.2 1234) listener.agent
+# INFO: ...". Lines that do not match belong to the previous record.
+RECORD_RE = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+ '
+                       r'\(([^ )]*)[^)]*\) (\S+) ([A-Z]+): ')
+
+
+class RunningStats(object):
+    """Mean and standard deviation of a stream of values (Welford)."""
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def stdev(self):
+        if self.n < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.n - 1))
+
+
+class LogRates(object):
+    """Count log lines and bytes per level and per source and keep running
+    statistics of their rates over each interval.
+
+    The source of a record is the process name of the agent that logged it,
+    or the logger name for records logged by the platform itself.
+    """
+    def __init__(self):
+        self._current = None
+        self._counts = {'levels': defaultdict(lambda: [0, 0]),
+                        'loggers': defaultdict(lambda: [0, 0])}
+        self._stats = {'levels': {}, 'loggers': {}}
+
+    def add(self, line):
+        size = len(line) + 1
+        match = RECORD_RE.match(line)
+        if match is not None:
+            process, name, level = match.groups()
+            self._current = level, process or name
+            lines = 1
+        elif self._current is None:
+            return
+        else:
+            # Continuation of the previous record, e.g. a traceback.
+            lines = 0
+        level, source = self._current
+        for group, key in (('levels', level), ('loggers', source)):
+            counts = self._counts[group][key]
+            counts[0] += lines
+            counts[1] += size
+
+    def summarize(self, elapsed, top_loggers, flood_zscore):
+        """Return a summary of the interval and start a new one.
+
+        :param elapsed: Length of the interval in seconds.
+        :param top_loggers: Number of sources, by bytes, to include.
+        :param flood_zscore: A source whose byte rate is this many standard
+                             deviations above its mean is listed as flooding.
+        """
+        summary = {'lines': 0, 'bytes': 0, 'levels': {}, 'loggers': {},
+                   'floods': []}
+        for group in ('levels', 'loggers'):
+            counts = self._counts[group]
+            stats = self._stats[group]
+            for key in set(stats) | set(counts):
+                lines, size = counts.get(key, (0, 0))
+                line_stats, byte_stats = stats.setdefault(
+                    key, (RunningStats(), RunningStats()))
+                line_rate = lines / elapsed
+                byte_rate = size / elapsed
+                if (group == 'loggers' and byte_stats.n >= 2 and
+                        byte_rate > byte_stats.mean +
+                        flood_zscore * byte_stats.stdev):
+                    summary['floods'].append(key)
+                line_stats.update(line_rate)
+                byte_stats.update(byte_rate)
+                summary[group][key] = {
+                    'lines': lines,
+                    'bytes': size,
+                    'line_rate': line_rate,
+                    'byte_rate': byte_rate,
+                    'mean_line_rate': line_stats.mean,
+                    'std_line_rate': line_stats.stdev,
+                    'mean_byte_rate': byte_stats.mean,
+                    'std_byte_rate': byte_stats.stdev}
+                if group == 'levels':
+                    summary['lines'] += lines
+                    summary['bytes'] += size
+            counts.clear()
+
+        loggers = summary['loggers']
+        top = sorted(loggers, key=lambda key: loggers[key]['bytes'],
+                     reverse=True)[:top_loggers]
+        summary['loggers'] = {key: loggers[key]
+                              for key in set(top) | set(summary['floods'])}
+        return summary
+
+
 class LogStatisticsAgent(Agent):
     """
     LogStatisticsAgent reads volttron.log file size every hour,
     compute the size delta from previous hour and publish the difference
     with timestamp. It also publishes standard deviation every 24 hours.
+
+    With "mode": "stream" the log is instead read as it grows and the
+    number of lines and bytes logged per level and per agent or logger is
+    published every interval, with the running mean and standard deviation
+    of their rates. Sources logging far more than usual are listed under
+    "floods".
     :param config: Configuration dict
     :type config: dict
 
@@ -99,7 +215,10 @@ class LogStatisticsAgent(Agent):
     "file_path" : "/home/volttron/volttron.log",
     "analysis_interval_sec" : 60,
     "publish_topic" : "platform/log_statistics",
-    "historian_topic" : "analysis/log_statistics"
+    "historian_topic" : "analysis/log_statistics",
+    "mode" : "size",
+    "top_loggers" : 10,
+    "flood_zscore" : 3.0
     }
     """
 
@@ -114,10 +233,58 @@ class LogStatisticsAgent(Agent):
         self.prev_file_size = None
         self._scheduled_event = None
 
+        self.mode = config.get("mode", "size")
+        self.top_loggers = config.get("top_loggers", 10)
+        self.flood_zscore = config.get("flood_zscore", 3.0)
+        self.log_tail = None
+        self.log_rates = LogRates()
+        self.last_summary = None
+
     @Core.receiver('onstart')
     def starting(self, sender, **kwargs):
         _log.info("Starting " + self.__class__.__name__ + " agent")
-        self.publish_analysis()
+        if self.mode == "stream":
+            self.log_tail = FileTail(self.file_path)
+            self.last_summary = time.time()
+            self.core.periodic(self.analysis_interval_sec,
+                               self.publish_stream_analysis,
+                               wait=self.analysis_interval_sec)
+        else:
+            self.publish_analysis()
+
+    def publish_stream_analysis(self):
+        """
+        Publishes the lines and bytes logged per level and per source since
+        the previous call with running statistics of their rates.
+        """
+        add = self.log_rates.add
+        for line in self.log_tail.lines():
+            add(line)
+
+        now = time.time()
+        summary = self.log_rates.summarize(now - self.last_summary,
+                                           self.top_loggers,
+                                           self.flood_zscore)
+        self.last_summary = now
+        timestamp = datetime.datetime.utcnow().isoformat() + 'Z'
+        summary['timestamp'] = timestamp
+        if summary['floods']:
+            _log.warning("Sources logging far more than usual: {}".format(
+                summary['floods']))
+        self.vip.pubsub.publish(peer="pubsub", topic=self.publish_topic,
+                                message=summary)
+
+        values = {'log_lines': summary['lines'],
+                  'log_bytes': summary['bytes']}
+        for level, level_summary in summary['levels'].iteritems():
+            values[level + '_lines'] = level_summary['lines']
+            values[level + '_bytes'] = level_summary['bytes']
+        meta = {key: {'units': 'bytes' if key.endswith('bytes') else 'lines',
+                      'tz': 'UTC', 'type': 'integer'}
+                for key in values}
+        self.vip.pubsub.publish(peer="pubsub", topic=self.historian_topic,
+                                headers={'Date': timestamp},
+                                message=[values, meta])
 
     def publish_analysis(self):
         """
@@ -138,6 +305,9 @@ class LogStatisticsAgent(Agent):
 
             # calculate size delta
             size_delta = curr_file_size - self.prev_file_size
+            if size_delta < 0:
+                # Rotated or truncated, count what has been written since.
+                size_delta = curr_file_size
             self.prev_file_size = curr_file_size
 
             self.size_delta_list.append(size_delta)
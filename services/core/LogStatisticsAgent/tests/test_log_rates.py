@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for streaming log statistics in the LogStatisticsAgent.
+"""
+
+import pytest
+
+from logstatisticsagent.agent import LogRates, RunningStats
+
+AGENT_LINE = ('2017-01-01 00:00:00,000 (listeneragent-3.2 1234) '
+              'listener.agent INFO: Peer: pubsub')
+PLATFORM_LINE = ('2017-01-01 00:00:00,000 () volttron.platform.auth '
+                 'WARNING: denied')
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def test_running_stats():
+    stats = RunningStats()
+    for value in (2, 4, 4, 4, 5, 5, 7, 9):
+        stats.update(value)
+
+    assert stats.mean == 5
+    assert stats.stdev == pytest.approx(2.138, abs=1e-3)
+
+
+def test_rates_by_level_and_source():
+    rates = LogRates()
+    rates.add(AGENT_LINE)
+    rates.add('Traceback (most recent call last):')
+    rates.add(PLATFORM_LINE)
+
+    summary = rates.summarize(2.0, 10, 3.0)
+
+    assert summary['lines'] == 2
+    assert summary['bytes'] == (len(AGENT_LINE) + len(PLATFORM_LINE) +
+                                len('Traceback (most recent call last):') + 3)
+    assert summary['levels']['INFO']['lines'] == 1
+    assert summary['levels']['WARNING']['line_rate'] == 0.5
+    assert sorted(summary['loggers']) == ['listeneragent-3.2',
+                                          'volttron.platform.auth']
+
+
+def test_flooding_source_is_reported():
+    rates = LogRates()
+    for lines in (10, 12, 11, 9, 10):
+        for _ in range(lines):
+            rates.add(AGENT_LINE)
+        rates.add(PLATFORM_LINE)
+        assert rates.summarize(1.0, 1, 3.0)['floods'] == []
+
+    for _ in range(500):
+        rates.add(AGENT_LINE)
+    rates.add(PLATFORM_LINE)
+    summary = rates.summarize(1.0, 1, 3.0)
+
+    assert summary['floods'] == ['listeneragent-3.2']
+    assert sorted(summary['loggers']) == ['listeneragent-3.2']
+    assert summary['loggers']['listeneragent-3.2']['lines'] == 500
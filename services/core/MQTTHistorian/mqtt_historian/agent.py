@@ -56,22 +56,198 @@
 # }}}
 from __future__ import absolute_import, print_function
 
-import datetime
 import logging
 import sys
+import threading
 import time
-import gevent
 
 from volttron.platform.agent.base_historian import BaseHistorian, add_timing_data_to_header
 from volttron.platform.agent import utils
+from volttron.platform.vip.agent import Core
 
-from paho.mqtt.client import MQTTv311, MQTTv31
-import paho.mqtt.publish as publish
+from paho.mqtt.client import Client, MQTTv311, MQTTv31, MQTT_ERR_SUCCESS
 
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '0.1'
+__version__ = '0.2'
+
+
+class MQTTPublisher(object):
+    """Publishes over one long-lived MQTT connection.
+
+    The paho network loop runs on its own thread, which also reconnects
+    with exponential backoff when the connection is lost. Messages with
+    a QoS above 0 are sent with at most `max_inflight` of them waiting
+    for their PUBACK/PUBCOMP.
+    """
+
+    def __init__(self, hostname='localhost', port=1883, client_id='',
+                 keepalive=60, will=None, auth=None, tls=None,
+                 protocol=MQTTv311, max_inflight=20,
+                 min_reconnect_delay=1.0, max_reconnect_delay=60.0):
+        self.hostname = hostname
+        self.port = port
+        self.keepalive = keepalive
+        self.max_inflight = max_inflight
+        self.min_reconnect_delay = min_reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnect_delay = min_reconnect_delay
+
+        self.client = Client(client_id=client_id, protocol=protocol)
+        self.client.max_inflight_messages_set(max_inflight)
+        if auth is not None:
+            self.client.username_pw_set(auth['username'], auth.get('password'))
+        if will is not None:
+            self.client.will_set(will['topic'], will.get('payload'),
+                                 will.get('qos', 0), will.get('retain', False))
+        if tls is not None:
+            tls = dict(tls)
+            insecure = tls.pop('insecure', False)
+            self.client.tls_set(**tls)
+            if insecure:
+                self.client.tls_insecure_set(insecure)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+
+        # Guards connected and acked, which the network thread updates.
+        self._condition = threading.Condition()
+        self.connected = False
+        self._acked = set()
+
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._network_loop,
+                                        name='mqtt-network')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        self._thread.join(5.0)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            _log.warning("MQTT broker refused connection: {}".format(rc))
+            return
+        _log.info("Connected to MQTT broker {}:{}".format(self.hostname,
+                                                         self.port))
+        self.reconnect_delay = self.min_reconnect_delay
+        with self._condition:
+            self.connected = True
+            self._condition.notify_all()
+
+    def _on_disconnect(self, client, userdata, rc):
+        with self._condition:
+            self.connected = False
+            self._condition.notify_all()
+
+    def _on_publish(self, client, userdata, mid):
+        # Called from the network thread while paho holds its own message
+        # lock, so this must not wait on the publishing thread.
+        with self._condition:
+            self._acked.add(mid)
+            self._condition.notify_all()
+
+    def _connect(self):
+        try:
+            self.client.connect(self.hostname, self.port, self.keepalive)
+            return True
+        except Exception as e:
+            _log.warning("Unable to connect to MQTT broker {}:{} ({}), "
+                         "retrying in {} seconds".format(
+                             self.hostname, self.port, e,
+                             self.reconnect_delay))
+            self._stopping.wait(self.reconnect_delay)
+            self.reconnect_delay = min(self.reconnect_delay * 2,
+                                       self.max_reconnect_delay)
+            return False
+
+    def _network_loop(self):
+        socket_open = False
+        while not self._stopping.is_set():
+            if not socket_open:
+                socket_open = self._connect()
+                continue
+            rc = self.client.loop(timeout=1.0)
+            if rc != MQTT_ERR_SUCCESS and not self._stopping.is_set():
+                _log.warning("Lost connection to MQTT broker ({}), "
+                             "reconnecting in {} seconds".format(
+                                 rc, self.reconnect_delay))
+                self._on_disconnect(self.client, None, rc)
+                socket_open = False
+                self._stopping.wait(self.reconnect_delay)
+                self.reconnect_delay = min(self.reconnect_delay * 2,
+                                           self.max_reconnect_delay)
+
+    def wait_connected(self, timeout):
+        with self._condition:
+            if not self.connected:
+                self._condition.wait(timeout)
+            return self.connected
+
+    def publish(self, messages, timeout=None):
+        """Publishes messages and waits for the broker to acknowledge them.
+
+        :param messages: (key, topic, payload, qos, retain) tuples.
+        :param timeout: Seconds to wait for outstanding acknowledgements.
+            Defaults to the keepalive interval.
+        :returns: The keys of the messages the broker has acknowledged.
+            Messages with a QoS of 0 count once they are written.
+        :rtype: list
+        """
+        if timeout is None:
+            timeout = self.keepalive
+        handled = []
+        pending = {}
+
+        with self._condition:
+            self._acked.clear()
+
+        def collect():
+            for mid in [m for m in pending if m in self._acked]:
+                handled.append(pending.pop(mid))
+                self._acked.discard(mid)
+
+        for key, topic, payload, qos, retain in messages:
+            with self._condition:
+                collect()
+                deadline = time.time() + timeout
+                while (self.connected and len(pending) >= self.max_inflight
+                       and time.time() < deadline):
+                    self._condition.wait(deadline - time.time())
+                    collect()
+                if not self.connected or len(pending) >= self.max_inflight:
+                    break
+
+            try:
+                rc, mid = self.client.publish(topic, payload, qos, retain)
+            except (TypeError, ValueError) as e:
+                _log.error("Unable to publish to {}: {}".format(topic, e))
+                break
+            if rc != MQTT_ERR_SUCCESS:
+                break
+
+            if qos == 0:
+                handled.append(key)
+            else:
+                with self._condition:
+                    pending[mid] = key
+
+        deadline = time.time() + timeout
+        with self._condition:
+            collect()
+            while pending and self.connected and time.time() < deadline:
+                self._condition.wait(deadline - time.time())
+                collect()
+
+        return handled
 
 
 class MQTTHistorian(BaseHistorian):
@@ -95,6 +271,9 @@ class MQTTHistorian(BaseHistorian):
         self.mqtt_will = config.get('mqtt_will', None)
         self.mqtt_auth = config.get('mqtt_auth', None)
         self.mqtt_tls = config.get('mqtt_tls', None)
+        self.mqtt_max_inflight = config.get('mqtt_max_inflight', 20)
+        self.mqtt_max_reconnect_delay = config.get('mqtt_max_reconnect_delay',
+                                                   60)
 
         protocol = config.get('mqtt_protocol', MQTTv311)
         if protocol == "MQTTv311":
@@ -107,26 +286,39 @@ class MQTTHistorian(BaseHistorian):
 
         self.mqtt_protocol = protocol
 
-        # will be available in both threads.
-        self._last_error = 0
+        # Created in the publishing thread by historian_setup.
+        self._publisher = None
 
         super(MQTTHistorian, self).__init__(
             backup_storage_limit_gb=backup_storage_limit_gb,
             **kwargs)
 
-    def timestamp(self):
-        return time.mktime(datetime.datetime.now().timetuple())
+    def historian_setup(self):
+        self._publisher = MQTTPublisher(
+            hostname=self.mqtt_hostname,
+            port=self.mqtt_port,
+            client_id=self.mqtt_client_id,
+            keepalive=self.mqtt_keepalive,
+            will=self.mqtt_will,
+            auth=self.mqtt_auth,
+            tls=self.mqtt_tls,
+            protocol=self.mqtt_protocol,
+            max_inflight=self.mqtt_max_inflight,
+            max_reconnect_delay=self.mqtt_max_reconnect_delay)
+        self._publisher.start()
+
+    @Core.receiver("onstop")
+    def stop_publisher(self, sender, **kwargs):
+        if self._publisher is not None:
+            self._publisher.stop()
 
     def publish_to_historian(self, to_publish_list):
         _log.debug("publish_to_historian number of items: {}"
                    .format(len(to_publish_list)))
-        current_time = self.timestamp()
 
-        if self._last_error:
-            # if we failed we need to wait 60 seconds before we go on.
-            if self.timestamp() < self._last_error + 60:
-                _log.debug('Not allowing send < 60 seconds from failure')
-                return
+        if not self._publisher.connected:
+            _log.debug('Not connected to MQTT broker, not publishing')
+            return
 
         to_send = []
         for x in to_publish_list:
@@ -136,27 +328,15 @@ class MQTTHistorian(BaseHistorian):
             # Available fields: 'value', 'headers', and 'meta'
             payload = x['value']
 
-            to_send.append({'topic': topic,
-                            'payload': payload,
-                            'qos': self.mqtt_qos,
-                            'retain': self.mqtt_retain})
+            to_send.append((x, topic, payload, self.mqtt_qos,
+                            self.mqtt_retain))
 
-        try:
-            publish.multiple(to_send,
-                             hostname=self.mqtt_hostname,
-                             port=self.mqtt_port,
-                             client_id=self.mqtt_client_id,
-                             keepalive=self.mqtt_keepalive,
-                             will=self.mqtt_will,
-                             auth=self.mqtt_auth,
-                             tls=self.mqtt_tls,
-                             protocol=self.mqtt_protocol)
-            self.report_all_handled()
-        except Exception as e:
-            _log.warning("Exception ({}) raised by publish: {}".format(
-                e.__class__.__name__,
-                e.message))
-            self._last_error = self.timestamp()
+        handled = self._publisher.publish(to_send)
+        if len(handled) < len(to_send):
+            _log.warning("Broker acknowledged {} of {} records".format(
+                len(handled), len(to_send)))
+        if handled:
+            self.report_handled(handled)
 
 
 def main(argv=sys.argv):
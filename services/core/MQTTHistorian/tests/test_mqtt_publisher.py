@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for the MQTT historian's publisher against a minimal MQTT 3.1.1
+broker stand-in.
+"""
+
+import SocketServer
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("paho.mqtt.client")
+
+from mqtt_historian.agent import MQTTPublisher
+
+
+class _BrokerHandler(SocketServer.BaseRequestHandler):
+    def _read(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+    def _read_packet(self):
+        header = ord(self._read(1))
+        length = 0
+        multiplier = 1
+        while True:
+            byte = ord(self._read(1))
+            length += (byte & 127) * multiplier
+            multiplier *= 128
+            if not byte & 128:
+                break
+        return header, self._read(length)
+
+    def handle(self):
+        broker = self.server.broker
+        try:
+            while True:
+                header, body = self._read_packet()
+                packet_type = header >> 4
+                if packet_type == 1:
+                    broker.connections += 1
+                    self.request.sendall(b'\x20\x02\x00\x00')
+                elif packet_type == 3:
+                    qos = (header >> 1) & 3
+                    topic_length, = struct.unpack('!H', body[:2])
+                    topic = body[2:2 + topic_length]
+                    rest = body[2 + topic_length:]
+                    if qos:
+                        mid, rest = rest[:2], rest[2:]
+                    broker.published.append((topic, rest, qos))
+                    if qos and broker.ack(topic):
+                        reply = b'\x40\x02' if qos == 1 else b'\x50\x02'
+                        self.request.sendall(reply + mid)
+                elif packet_type == 6:
+                    self.request.sendall(b'\x70\x02' + body)
+                elif packet_type == 12:
+                    self.request.sendall(b'\xd0\x00')
+                elif packet_type == 14:
+                    return
+        except (EOFError, socket.error):
+            return
+
+
+class StubBroker(object):
+    def __init__(self, ack=lambda topic: True):
+        self.ack = ack
+        self.connections = 0
+        self.published = []
+        self.server = SocketServer.ThreadingTCPServer(('127.0.0.1', 0),
+                                                      _BrokerHandler)
+        self.server.daemon_threads = True
+        self.server.broker = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def broker(request):
+    broker = StubBroker()
+    request.addfinalizer(broker.stop)
+    return broker
+
+
+def start_publisher(request, port, **kwargs):
+    publisher = MQTTPublisher(port=port, **kwargs)
+    publisher.start()
+    request.addfinalizer(publisher.stop)
+    return publisher
+
+
+def messages(count, qos, topic='devices/campus/building/point{}'):
+    return [(index, topic.format(index), str(index), qos, False)
+            for index in range(count)]
+
+
+@pytest.mark.parametrize("qos", [0, 1, 2])
+def test_publish_all_acknowledged(request, broker, qos):
+    publisher = start_publisher(request, broker.port, max_inflight=5)
+    assert publisher.wait_connected(5)
+
+    handled = publisher.publish(messages(100, qos), timeout=5)
+    time.sleep(0.1)
+
+    assert sorted(handled) == range(100)
+    assert len(broker.published) == 100
+
+
+def test_connection_reused(request, broker):
+    publisher = start_publisher(request, broker.port)
+    assert publisher.wait_connected(5)
+
+    for _ in range(3):
+        assert len(publisher.publish(messages(10, 1), timeout=5)) == 10
+
+    assert broker.connections == 1
+
+
+def test_only_acknowledged_records_handled(request):
+    broker = StubBroker(ack=lambda topic: not topic.endswith('7'))
+    request.addfinalizer(broker.stop)
+    publisher = start_publisher(request, broker.port, max_inflight=50)
+    assert publisher.wait_connected(5)
+
+    handled = publisher.publish(messages(30, 1), timeout=1)
+
+    assert sorted(handled) == [i for i in range(30) if i % 10 != 7]
+
+
+def test_reconnect_backs_off(request):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    publisher = start_publisher(request, port, min_reconnect_delay=0.05,
+                                max_reconnect_delay=0.2)
+    assert not publisher.wait_connected(0.5)
+    assert publisher.reconnect_delay == 0.2
+    assert publisher.publish(messages(10, 1), timeout=1) == []
@@ -61,6 +61,7 @@ from volttron.platform.vip.agent import Agent, Core, RPC
 from volttron.platform.agent import utils
 from volttron.platform.agent import math_utils
 from volttron.platform.agent.known_identities import PLATFORM_DRIVER
+from volttron.platform.messaging import headers as headers_mod
 from driver import DriverAgent
 import resource
 from datetime import datetime, timedelta
@@ -74,6 +75,8 @@ utils.setup_logging()
 _log = logging.getLogger(__name__)
 __version__ = '3.1.1'
 
+SCALABILITY_TEST_RESULTS_TOPIC = 'scalability/master_driver/results'
+
 class OverrideError(DriverInterfaceError):
     """Error raised when the user tries to set/revert point when global override is set."""
     pass
@@ -410,10 +413,28 @@ class MasterDriverAgent(Agent):
             if self.test_iterations >= self.scalability_test_iterations:
                 #Test is now over. Button it up and shutdown.
                 mean = math_utils.mean(self.test_results) 
-                stdev = math_utils.stdev(self.test_results) 
+                stdev = math_utils.stdev(self.test_results) if len(self.test_results) > 1 else 0.0
                 _log.info("Mean total publish time: "+str(mean))
                 _log.info("Std dev publish time: "+str(stdev))
+                self._publish_scalability_results(mean, stdev)
                 sys.exit(0)
+
+    def _publish_scalability_results(self, mean, stdev):
+        """Publish the results of a scalability test so a benchmark harness
+        can collect them without reading the log."""
+        headers = {headers_mod.DATE: utils.format_aware_utc_now()}
+        message = {"device_count": len(self.instances),
+                   "iterations": self.test_iterations,
+                   "publish_times": self.test_results,
+                   "mean": mean,
+                   "stdev": stdev}
+        try:
+            self.vip.pubsub.publish('pubsub',
+                                    SCALABILITY_TEST_RESULTS_TOPIC,
+                                    headers=headers,
+                                    message=message).get(timeout=10.0)
+        except (gevent.Timeout, Exception) as ex:
+            _log.error("Failed to publish scalability test results: " + str(ex))
         
     @RPC.export
     def get_point(self, path, point_name, **kwargs):
@@ -453,6 +474,22 @@ class MasterDriverAgent(Agent):
     def scrape_all(self, path):
         return self.instances[path].scrape_all()
 
+    @RPC.export
+    def forward_bacnet_cov_value(self, source_address, point_values):
+        """RPC method
+
+        Called by the BACnet proxy to deliver change of value notifications
+        for points a BACnet driver subscribed to.
+        :param source_address: address of the BACnet device
+        :type source_address: str
+        :param point_values: changed point names and values
+        :type point_values: dict
+        """
+        for driver in self.instances.itervalues():
+            interface = getattr(driver, "interface", None)
+            if getattr(interface, "target_address", None) == source_address:
+                driver.publish_cov_value(point_values)
+
     @RPC.export
     def get_multiple_points(self, path, point_names, **kwargs):
         return self.instances[path].get_multiple_points(point_names, **kwargs)
@@ -190,6 +190,16 @@ class DriverAgent(BasicAgent):
         self.all_path_depth, self.all_path_breadth = self.get_paths_for_point(DRIVER_TOPIC_ALL)
 
 
+    @Core.receiver('onstop')
+    def stopping(self, sender, **kwargs):
+        interface = getattr(self, "interface", None)
+        if interface is None:
+            return
+        try:
+            interface.stop()
+        except Exception as e:
+            _log.error("Failure stopping interface of {}: {}".format(self.device_name, e))
+
     def setup_device(self):
 
         config = self.config
@@ -268,8 +278,7 @@ class DriverAgent(BasicAgent):
         if not results:
             return
         
-        utcnow = utils.get_aware_utc_now()
-        utcnow_string = utils.format_timestamp(utcnow)
+        utcnow_string = utils.format_aware_utc_now()
         
         headers = {
             headers_mod.DATE: utcnow_string,
@@ -278,8 +287,14 @@ class DriverAgent(BasicAgent):
         
             
 
+        #Points with change of value subscriptions are published
+        # individually by publish_cov_value when they change.
+        cov_points = getattr(self.interface, "cov_points", ())
+
         if self.publish_depth_first or self.publish_breadth_first:
             for point, value in results.iteritems():
+                if point in cov_points:
+                    continue
                 depth_first_topic, breadth_first_topic = self.get_paths_for_point(point)
                 message = [value, self.meta_data[point]]
                    
@@ -307,6 +322,36 @@ class DriverAgent(BasicAgent):
         self.parent.scrape_ending(self.device_name)
         
         
+    def publish_cov_value(self, point_values):
+        """Publish the points of a change of value notification.
+
+        Only the individual point topics are published. The next
+        scrape includes the new values in the full device publish."""
+        point_values = self.interface.update_cov_values(point_values)
+        if not point_values or not (self.publish_depth_first or self.publish_breadth_first):
+            return
+
+        utcnow_string = utils.format_aware_utc_now()
+
+        headers = {
+            headers_mod.DATE: utcnow_string,
+            headers_mod.TIMESTAMP: utcnow_string,
+        }
+
+        for point, value in point_values.iteritems():
+            depth_first_topic, breadth_first_topic = self.get_paths_for_point(point)
+            message = [value, self.meta_data[point]]
+
+            if self.publish_depth_first:
+                self._publish_wrapper(depth_first_topic,
+                                      headers=headers,
+                                      message=message)
+
+            if self.publish_breadth_first:
+                self._publish_wrapper(breadth_first_topic,
+                                      headers=headers,
+                                      message=message)
+
     def _publish_wrapper(self, topic, headers, message):
         while True:
             try:
@@ -291,6 +291,15 @@ class BaseInterface(object):
         """
         pass
         
+    def stop(self):
+        """
+        Called when the driver using this interface stops, including when
+        its configuration is changed or removed. Interfaces that hold
+        resources outside of the Master Driver, such as subscriptions on a
+        proxy agent, should release them here.
+        """
+        pass
+
     def get_register_by_name(self, name):
         """
         Get a register by it's point name.
@@ -600,6 +609,50 @@ class BasicRevert(object):
         result = self._set_point(point_name, value)        
         self._tracker.mark_dirty_point(point_name)
         return result
+
+    def set_multiple_points(self, path, point_names_values, **kwargs):
+        """
+        Implementation of :py:meth:`BaseInterface.set_multiple_points`
+
+        Passes arguments through to :py:meth:`BasicRevert._set_multiple_points`
+        and marks every point that was written successfully as dirty.
+
+        Currently \*\*kwargs is ignored.
+        """
+        errors = self._set_multiple_points(point_names_values)
+
+        results = {}
+        for point_name, value in point_names_values:
+            if point_name in errors:
+                results[path + '/' + point_name] = repr(errors[point_name])
+            else:
+                self._tracker.mark_dirty_point(point_name)
+
+        return results
+
+    def _set_multiple_points(self, point_names_values):
+        """
+        Set several points on the device.
+
+        The default implementation calls :py:meth:`BasicRevert._set_point`
+        once per point. Interfaces for protocols that can write more than
+        one point per request may override this to batch the writes.
+        This method is also used by :py:meth:`BasicRevert.revert_all`.
+
+        :param point_names_values: Point names and values to be set to.
+        :type point_names_values: [(str, k)] where k is the new value
+        :return: Point names to the exception raised while setting them.
+            Points missing from the result were set successfully.
+        :rtype: dict
+        """
+        errors = {}
+        for point_name, value in point_names_values:
+            try:
+                self._set_point(point_name, value)
+            except Exception as e:
+                errors[point_name] = e
+
+        return errors
     
     def scrape_all(self):
         """
@@ -652,21 +705,24 @@ class BasicRevert(object):
         """
         Implementation of :py:meth:`BaseInterface.revert_all`
 
-        Calls :py:meth:`BasicRevert._set_point` with `point_name`
-        and the value to revert the point to for every writable
+        Calls :py:meth:`BasicRevert._set_multiple_points` with
+        the value to revert the point to for every writable
         point on a device.
 
         Currently \*\*kwargs is ignored.
         """
         """Revert entire device to it's default state"""
         points = self._tracker.get_all_revert_values()
-        for point_name, value in points.iteritems():
-            if not isinstance(value, DriverInterfaceError):
-                try:
-                    self._set_point(point_name, value)
-                    self._tracker.clear_dirty_point(point_name)
-                except Exception as e:
-                    _log.warning("Error while reverting point {}: {}".format(point_name, str(e)))
+        revert_values = [(point_name, value) for point_name, value in points.iteritems()
+                         if not isinstance(value, DriverInterfaceError)]
+
+        errors = self._set_multiple_points(revert_values)
+
+        for point_name, value in revert_values:
+            if point_name in errors:
+                _log.warning("Error while reverting point {}: {}".format(point_name, str(errors[point_name])))
+            else:
+                self._tracker.clear_dirty_point(point_name)
                 
           
     def revert_point(self, point_name, **kwargs):
@@ -51,6 +51,8 @@
 # under Contract DE-AC05-76RL01830
 
 
+import gevent
+
 from master_driver.interfaces import BaseInterface, BaseRegister
 from csv import DictReader
 from StringIO import StringIO
@@ -65,26 +67,36 @@ from volttron.platform.jsonrpc import RemoteError
 #Logging is completely configured by now.
 _log = logging.getLogger(__name__)
 
+#Must match the error raised by the BACnet proxy for a handle it does not know.
+UNKNOWN_READ_PLAN = "Unknown read plan"
+LIMITS_CONFIG_PREFIX = "bacnet_limits/"
 
 
 class Register(BaseRegister):
     def __init__(self, instance_number, object_type, property_name, read_only, pointName, units,
                  description = '',
                  priority = None,
-                 list_index = None):
+                 list_index = None,
+                 cov_flag = False):
         super(Register, self).__init__("byte", read_only, pointName, units, description = '')
         self.instance_number = int(instance_number)
         self.object_type = object_type
         self.property = property_name
         self.priority = priority
         self.index = list_index
+        self.cov_flag = cov_flag
 
 
 class Interface(BaseInterface):
     def __init__(self, **kwargs):
         super(Interface, self).__init__(**kwargs)
         self.register_count = 10000
-        self.register_count_divisor = 1
+        self.read_point_map = {}
+        self.read_plan_handle = None
+        self.registered_plan_handle = None
+        self.cov_points = set()
+        self.cov_rejected = set()
+        self.cov_values = {}
 
 
     def configure(self, config_dict, registry_config_str):
@@ -96,12 +108,142 @@ class Interface(BaseInterface):
         self.max_per_request = config_dict.get("max_per_request")
         self.use_read_multiple = config_dict.get("use_read_multiple", True)
         self.timeout = float(config_dict.get("timeout", 30.0))
+        self.cov_lifetime = int(config_dict.get("cov_lifetime", 180))
+
+        self.limits_config_name = LIMITS_CONFIG_PREFIX + str(self.device_id)
+        self.load_limits()
+
+        self.read_point_map = self.build_read_point_map()
+        self.read_plan_handle = None
 
         self.ping_retry_interval = timedelta(seconds=config_dict.get("ping_retry_interval", 5.0))
         self.scheduled_ping = None
 
         self.ping_target()
 
+    def load_limits(self):
+        """Use a max_per_request learned during a previous run if it is
+        lower than the configured value."""
+        try:
+            limits = self.vip.config.get(self.limits_config_name)
+        except (KeyError, AttributeError):
+            return
+
+        learned = limits.get("max_per_request")
+        if learned is None:
+            return
+
+        if self.max_per_request is None or learned < self.max_per_request:
+            _log.info("Using previously learned max_per_request of {} for device {}".format(learned,
+                                                                                          self.device_id))
+            self.max_per_request = learned
+
+    def save_limits(self):
+        """Store the learned max_per_request so the next start of the
+        agent does not need to discover it again."""
+        try:
+            self.vip.config.set(self.limits_config_name, {"max_per_request": self.max_per_request})
+        except (gevent.Timeout, Exception) as e:
+            _log.warning("Unable to store learned limits for device {}: {}".format(self.device_id, e))
+
+    def build_read_point_map(self):
+        #TODO: support reading from an array.
+        point_map = {}
+        read_registers = self.get_registers_by_type("byte", True)
+        write_registers = self.get_registers_by_type("byte", False)
+        for register in read_registers + write_registers:
+            if register.point_name in self.cov_points:
+                continue
+            point_map[register.point_name] = [register.object_type,
+                                              register.instance_number,
+                                              register.property,
+                                              register.index]
+        return point_map
+
+    def register_read_plan(self):
+        #Release the plan this replaces so the proxy does not keep it.
+        self.release_read_plan()
+        self.read_plan_handle = self.vip.rpc.call(self.proxy_address, 'register_read_plan',
+                                                  self.target_address, self.read_point_map,
+                                                  self.max_per_request, self.use_read_multiple).get(timeout=self.timeout)
+        self.registered_plan_handle = self.read_plan_handle
+
+    def release_read_plan(self):
+        if self.registered_plan_handle is not None:
+            self.vip.rpc.notify(self.proxy_address, 'unregister_read_plan', self.registered_plan_handle)
+            self.registered_plan_handle = None
+
+    def stop(self):
+        """Release the read plan and COV subscriptions held by the proxy."""
+        if self.scheduled_ping is not None:
+            self.scheduled_ping.cancel()
+            self.scheduled_ping = None
+        self.release_read_plan()
+        self.read_plan_handle = None
+        for point_name in self.cov_points:
+            self.vip.rpc.notify(self.proxy_address, 'cancel_cov_subscription',
+                                self.target_address, point_name)
+        self.cov_points.clear()
+
+    def reduce_max_per_request(self):
+        current = self.max_per_request if self.max_per_request is not None else self.register_count
+        if current <= 1:
+            _log.error("Receiving a segmentationNotSupported error with 'max_per_request' setting of 1.")
+            return False
+
+        self.max_per_request = max(min(current, self.register_count) // 2, 1)
+        _log.info("Device requires a lower max_per_request setting. Trying: "+str(self.max_per_request))
+        self.read_plan_handle = None
+        return True
+
+    def establish_cov_subscriptions(self):
+        """Subscribe to change of value notifications for points with
+        the COV flag set. Points the device will not subscribe to are
+        polled instead."""
+        registers = self.get_registers_by_type("byte", True) + self.get_registers_by_type("byte", False)
+        changed = False
+
+        for register in registers:
+            point_name = register.point_name
+            if not register.cov_flag or point_name in self.cov_points or point_name in self.cov_rejected:
+                continue
+
+            try:
+                self.vip.rpc.call(self.proxy_address, 'create_cov_subscription',
+                                  self.target_address, point_name,
+                                  register.object_type, register.instance_number,
+                                  register.property, self.cov_lifetime).get(timeout=self.timeout)
+            except RemoteError as e:
+                _log.warning("COV subscription for {} failed, polling it instead: {}".format(point_name, e))
+                self.cov_rejected.add(point_name)
+                continue
+            except (errors.VIPError, gevent.Timeout) as e:
+                _log.warning("Unable to create COV subscription for {}: {}".format(point_name, e))
+                break
+
+            self.cov_points.add(point_name)
+            changed = True
+
+        if changed:
+            self.read_point_map = self.build_read_point_map()
+            self.read_plan_handle = None
+
+    def reset_cov_subscriptions(self):
+        """Called when the proxy has lost our subscriptions."""
+        self.cov_points.clear()
+        self.read_point_map = self.build_read_point_map()
+        self.read_plan_handle = None
+        self.establish_cov_subscriptions()
+
+    def update_cov_values(self, point_values):
+        """Store values from change of value notifications.
+
+        Returns the values for points this interface subscribed to."""
+        accepted = dict((point_name, value) for point_name, value in point_values.iteritems()
+                        if point_name in self.cov_points)
+        self.cov_values.update(accepted)
+        return accepted
+
     def schedule_ping(self):
         if self.scheduled_ping is None:
             now = datetime.now()
@@ -128,6 +270,8 @@ class Interface(BaseInterface):
         #Schedule retry.
         if not pinged:
             self.schedule_ping()
+        else:
+            self.establish_cov_subscriptions()
 
 
     def get_point(self, point_name, get_priority_array=False):
@@ -159,40 +303,45 @@ class Interface(BaseInterface):
         return result
 
     def scrape_all(self):
-        #TODO: support reading from an array.
-        point_map = {}
-        read_registers = self.get_registers_by_type("byte", True)
-        write_registers = self.get_registers_by_type("byte", False)
-        for register in read_registers + write_registers:
-            point_map[register.point_name] = [register.object_type,
-                                              register.instance_number,
-                                              register.property,
-                                              register.index]
+        limits_changed = False
+        plan_registered = False
 
         while True:
             try:
-                result = self.vip.rpc.call(self.proxy_address, 'read_properties',
-                                               self.target_address, point_map,
-                                               self.max_per_request, self.use_read_multiple).get(timeout=self.timeout)
+                if self.read_plan_handle is None:
+                    self.register_read_plan()
+                    plan_registered = True
+                result = self.vip.rpc.call(self.proxy_address, 'read_plan',
+                                           self.read_plan_handle).get(timeout=self.timeout)
             except RemoteError as e:
+                if UNKNOWN_READ_PLAN in e.message and not plan_registered:
+                    #The proxy restarted since we registered so our
+                    # COV subscriptions are gone as well.
+                    self.reset_cov_subscriptions()
+                    continue
                 if "segmentationNotSupported" in e.message:
-                    if self.max_per_request <= 1:
-                        _log.error("Receiving a segmentationNotSupported error with 'max_per_request' setting of 1.")
+                    if not self.reduce_max_per_request():
                         raise
-                    self.register_count_divisor += 1
-                    self.max_per_request = max(int(self.register_count/self.register_count_divisor), 1)
-                    _log.info("Device requires a lower max_per_request setting. Trying: "+str(self.max_per_request))
+                    limits_changed = True
                     continue
                 else:
                     raise
             except errors.Unreachable:
                 #If the Proxy is not running bail.
                 _log.warning("Unable to reach BACnet proxy.")
+                self.read_plan_handle = None
                 self.schedule_ping()
                 raise
             else:
                 break
 
+        if limits_changed:
+            self.save_limits()
+
+        for point_name in self.cov_points:
+            if point_name in self.cov_values:
+                result[point_name] = self.cov_values[point_name]
+
         return result
 
     def revert_all(self, priority=None):
@@ -247,6 +396,8 @@ class Interface(BaseInterface):
             units = regDef['Units']
             property_name = regDef['Property']
 
+            cov_flag = regDef.get('COV Flag', '').strip().lower() == 'true'
+
             register = Register(index,
                                 io_type,
                                 property_name,
@@ -255,6 +406,7 @@ class Interface(BaseInterface):
                                 units,
                                 description = description,
                                 priority = priority,
-                                list_index = list_index)
+                                list_index = list_index,
+                                cov_flag = cov_flag)
 
             self.insert_register(register)
@@ -82,6 +82,9 @@ _log = logging.getLogger(__name__)
 
 MODBUS_REGISTER_SIZE = 2
 MODBUS_READ_MAX = 100
+#Protocol limits for a single Write Multiple Registers/Coils request.
+MODBUS_WRITE_REGISTERS_MAX = 123
+MODBUS_WRITE_COILS_MAX = 1968
 PYMODBUS_REGISTER_STRUCT = struct.Struct('>H')
 
 path = os.path.dirname(os.path.abspath(__file__))
@@ -91,6 +94,34 @@ configFile = os.path.join(path, "example.csv")
 class ModbusInterfaceException(ModbusException):
     pass
 
+
+def merge_ranges(register_ranges, max_count=None, allow_overlap=True):
+    """Merges adjacent [start, end, items] ranges into as few ranges as possible.
+
+       If max_count is given no merged range will span more than max_count
+       registers. If allow_overlap is False ranges that share a register
+       are kept apart."""
+    result = []
+    current = None
+    for start, end, items in sorted(register_ranges, key=lambda x: (x[0], x[1])):
+        if current is not None:
+            too_long = max_count is not None and max(end, current[1]) - current[0] + 1 > max_count
+            overlapping = start <= current[1]
+            if (start <= current[1] + 1 and not too_long and
+                    (allow_overlap or not overlapping)):
+                current[1] = max(current[1], end)
+                current[2].extend(items)
+                continue
+            result.append(current)
+
+        current = [start, end, list(items)]
+
+    if current is not None:
+        result.append(current)
+
+    return result
+
+
 class ModbusRegisterBase(BaseRegister):
     def __init__(self, address, register_type, read_only, pointName, units, description = '', slave_id=0):
         super(ModbusRegisterBase, self).__init__(register_type, read_only, pointName, units, description = '')
@@ -111,6 +142,9 @@ class ModbusBitRegister(ModbusRegisterBase):
     
     def get_register_count(self):
         return 1
+
+    def get_register_values(self, value):
+        return [bool(value)]
     
     def get_state(self, client):
         response_bits = client.read_discrete_inputs(self.address, unit=self.slave_id) if self.read_only else client.read_coils(self.address, unit=self.slave_id)
@@ -188,14 +222,18 @@ class ModbusByteRegister(ModbusRegisterBase):
         #skip the result count
         return self.parse_struct.unpack(response_bytes[1:])[0]
 
+    def get_register_values(self, value):
+        value_bytes = self.parse_struct.pack(value)
+        register_values = []
+        for i in xrange(0, len(value_bytes), PYMODBUS_REGISTER_STRUCT.size):
+            register_values.extend(PYMODBUS_REGISTER_STRUCT.unpack_from(value_bytes, i))
+        if self.mixed_endian:
+            register_values.reverse()
+        return register_values
+
     def set_state(self, client, value):
         if not self.read_only:
-            value_bytes = self.parse_struct.pack(value)
-            register_values = []
-            for i in xrange(0, len(value_bytes), PYMODBUS_REGISTER_STRUCT.size):
-                register_values.extend(PYMODBUS_REGISTER_STRUCT.unpack_from(value_bytes, i))
-            if self.mixed_endian:
-                register_values.reverse()
+            register_values = self.get_register_values(value)
             client.write_registers(self.address, register_values, unit=self.slave_id)
             return self.get_state(client)
         return None
@@ -235,23 +273,7 @@ class Interface(BasicRevert, BaseInterface):
         """Merges any adjacent registers for more efficient scraping.
            May only be called after all registers have been inserted."""
         for key, register_ranges in self.register_ranges.items():
-            if not register_ranges:
-                continue
-            register_ranges.sort()
-            result = []
-            current = register_ranges[0]
-            for register_range in register_ranges[1:]:
-                if register_range[0] > current[1] + 1:
-                    result.append(current)
-                    current = register_range
-                    continue
-
-                current[1] = register_range[1]
-                current[2].extend(register_range[2])
-
-            result.append(current)
-
-            self.register_ranges[key] = result
+            self.register_ranges[key] = merge_ranges(register_ranges)
 
         
     def get_point(self, point_name):    
@@ -272,8 +294,52 @@ class Interface(BasicRevert, BaseInterface):
             try:
                 result = register.set_state(client, value)
             except (ConnectionException, ModbusIOException, ModbusInterfaceException) as ex:
-                IOError("Error encountered trying to write to point {}: {}".format(point_name, ex))
+                raise IOError("Error encountered trying to write to point {}: {}".format(point_name, ex))
         return result
+
+    def _set_multiple_points(self, point_names_values):
+        """Writes contiguous holding registers and coils with as few
+           Write Multiple Registers/Coils requests as possible over a
+           single connection."""
+        errors = {}
+        write_ranges = {'byte': [], 'bit': []}
+
+        for point_name, value in dict(point_names_values).iteritems():
+            try:
+                register = self.get_register_by_name(point_name)
+                if register.read_only:
+                    raise IOError("Trying to write to a point configured read only: "+point_name)
+                register_values = register.get_register_values(value)
+            except Exception as e:
+                errors[point_name] = e
+                continue
+
+            start, end = register.address, register.address + len(register_values) - 1
+            write_ranges[register.register_type].append([start, end, [(point_name, register_values)]])
+
+        if not write_ranges['byte'] and not write_ranges['bit']:
+            return errors
+
+        with modbus_client(self.ip_address, self.port) as client:
+            for register_type, write_func, max_count in (('byte', client.write_registers, MODBUS_WRITE_REGISTERS_MAX),
+                                                         ('bit', client.write_coils, MODBUS_WRITE_COILS_MAX)):
+                for start, end, writes in merge_ranges(write_ranges[register_type],
+                                                       max_count=max_count, allow_overlap=False):
+                    values = []
+                    for point_name, register_values in writes:
+                        values.extend(register_values)
+                    try:
+                        response = write_func(start, values, unit=self.slave_id)
+                        if response is None:
+                            raise ModbusInterfaceException("pymodbus returned None")
+                        if isinstance(response, ExceptionResponse):
+                            raise ModbusInterfaceException(str(response))
+                    except (ConnectionException, ModbusIOException, ModbusInterfaceException) as ex:
+                        error = IOError("Error encountered trying to write to registers {}-{}: {}".format(start, end, ex))
+                        for point_name, register_values in writes:
+                            errors[point_name] = error
+
+        return errors
     
     def scrape_byte_registers(self, client, read_only):
         result_dict = {}
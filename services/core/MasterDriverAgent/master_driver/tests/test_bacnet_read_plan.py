@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+#
+
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization
+# that has cooperated in the development of these materials, makes
+# any warranty, express or implied, or assumes any legal liability
+# or responsibility for the accuracy, completeness, or usefulness or
+# any information, apparatus, product, software, or process disclosed,
+# or represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does
+# not necessarily constitute or imply its endorsement, recommendation,
+# r favoring by the United States Government or any agency thereof,
+# or Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+import pytest
+
+from master_driver.interfaces.bacnet import Interface, UNKNOWN_READ_PLAN
+from volttron.platform.jsonrpc import RemoteError
+from volttron.platform.store import process_raw_config
+
+registry_config_string = """Volttron Point Name,Units,BACnet Object Type,Property,Writable,Index
+Point1,F,analogInput,presentValue,FALSE,1
+Point2,F,analogInput,presentValue,FALSE,2
+Point3,F,analogOutput,presentValue,TRUE,3
+Point4,F,analogOutput,presentValue,TRUE,4
+"""
+
+registry_config = process_raw_config(registry_config_string, config_type="csv")
+
+
+class FakeResult(object):
+    def __init__(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+
+    def get(self, timeout=None):
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+def remote_error(message):
+    return RemoteError(message, exc_type="RuntimeError", exc_args=[message])
+
+
+class FakeProxy(object):
+    """Stands in for the BACnet proxy as seen through vip.rpc."""
+    def __init__(self, max_objects=None, cov_objects=()):
+        self.max_objects = max_objects
+        self.cov_objects = cov_objects
+        self.plans = {}
+        self.next_handle = 0
+        self.subscriptions = []
+        self.calls = []
+
+    def call(self, peer, method, *args):
+        self.calls.append(method)
+        try:
+            return FakeResult(getattr(self, method)(*args))
+        except Exception as e:
+            return FakeResult(exception=e)
+
+    def notify(self, peer, method, *args):
+        self.calls.append(method)
+        getattr(self, method)(*args)
+
+    def ping_device(self, target_address, device_id):
+        pass
+
+    def register_read_plan(self, target_address, point_map, max_per_request, use_read_multiple):
+        handle = str(self.next_handle)
+        self.next_handle += 1
+        self.plans[handle] = (point_map, max_per_request)
+        return handle
+
+    def unregister_read_plan(self, handle):
+        self.plans.pop(handle, None)
+
+    def cancel_cov_subscription(self, target_address, point_name):
+        self.subscriptions.remove(point_name)
+
+    def create_cov_subscription(self, target_address, point_name, object_type, instance_number,
+                                property_name, lifetime):
+        if (object_type, instance_number) not in self.cov_objects:
+            raise remote_error("Device communication aborted: serviceRequestDenied")
+        self.subscriptions.append(point_name)
+
+    def read_plan(self, handle):
+        if handle not in self.plans:
+            raise remote_error(UNKNOWN_READ_PLAN + ": " + handle)
+        point_map, max_per_request = self.plans[handle]
+        if self.max_objects is not None and (max_per_request is None or max_per_request > self.max_objects):
+            raise remote_error("Device communication aborted: segmentationNotSupported")
+        return dict((name, 1.0) for name in point_map)
+
+
+class FakeConfig(object):
+    def __init__(self, store=None):
+        self.store = store if store is not None else {}
+
+    def get(self, config_name):
+        return self.store[config_name]
+
+    def set(self, config_name, contents):
+        self.store[config_name] = contents
+
+
+class FakeVIP(object):
+    def __init__(self, proxy, config):
+        self.rpc = proxy
+        self.config = config
+
+
+def make_interface(proxy, config):
+    interface = Interface(vip=FakeVIP(proxy, config), core=None)
+    interface.configure({"device_address": "10.0.0.1", "device_id": 500}, registry_config)
+    return interface
+
+
+@pytest.mark.driver
+def test_scrape_uses_registered_plan():
+    proxy = FakeProxy()
+    interface = make_interface(proxy, FakeConfig())
+
+    assert interface.scrape_all() == {"Point1": 1.0, "Point2": 1.0, "Point3": 1.0, "Point4": 1.0}
+    assert interface.scrape_all() == {"Point1": 1.0, "Point2": 1.0, "Point3": 1.0, "Point4": 1.0}
+    assert proxy.calls.count("register_read_plan") == 1
+    assert proxy.calls.count("read_plan") == 2
+
+
+@pytest.mark.driver
+def test_plan_registered_again_after_proxy_restart():
+    proxy = FakeProxy()
+    interface = make_interface(proxy, FakeConfig())
+    interface.scrape_all()
+
+    proxy.plans.clear()
+    assert len(interface.scrape_all()) == 4
+    assert proxy.calls.count("register_read_plan") == 2
+
+
+@pytest.mark.driver
+def test_learned_limits_persisted():
+    proxy = FakeProxy(max_objects=1)
+    config = FakeConfig()
+    interface = make_interface(proxy, config)
+
+    assert len(interface.scrape_all()) == 4
+    assert interface.max_per_request == 1
+    assert config.store["bacnet_limits/500"] == {"max_per_request": 1}
+
+    #A restarted driver should start with the learned value.
+    proxy = FakeProxy(max_objects=1)
+    interface = make_interface(proxy, config)
+    assert interface.max_per_request == 1
+    assert len(interface.scrape_all()) == 4
+    assert proxy.calls.count("register_read_plan") == 1
+
+
+@pytest.mark.driver
+def test_segmentation_error_at_minimum_raises():
+    proxy = FakeProxy(max_objects=0)
+    interface = make_interface(proxy, FakeConfig())
+
+    with pytest.raises(RemoteError):
+        interface.scrape_all()
+
+
+cov_registry_config_string = """Volttron Point Name,Units,BACnet Object Type,Property,Writable,Index,COV Flag
+Point1,F,analogInput,presentValue,FALSE,1,TRUE
+Point2,F,analogInput,presentValue,FALSE,2,TRUE
+Point3,F,analogOutput,presentValue,TRUE,3,
+"""
+
+cov_registry_config = process_raw_config(cov_registry_config_string, config_type="csv")
+
+
+def make_cov_interface(proxy):
+    interface = Interface(vip=FakeVIP(proxy, FakeConfig()), core=None)
+    interface.configure({"device_address": "10.0.0.1", "device_id": 500}, cov_registry_config)
+    return interface
+
+
+@pytest.mark.driver
+def test_cov_points_not_polled():
+    proxy = FakeProxy(cov_objects=[("analogInput", 1)])
+    interface = make_cov_interface(proxy)
+
+    #Point2 was rejected by the device and falls back to polling.
+    assert proxy.subscriptions == ["Point1"]
+    assert interface.cov_points == set(["Point1"])
+    assert sorted(interface.read_point_map) == ["Point2", "Point3"]
+
+    assert interface.update_cov_values({"Point1": 5.0, "Point3": 7.0}) == {"Point1": 5.0}
+    assert interface.scrape_all() == {"Point1": 5.0, "Point2": 1.0, "Point3": 1.0}
+
+
+@pytest.mark.driver
+def test_cov_subscriptions_restored_after_proxy_restart():
+    proxy = FakeProxy(cov_objects=[("analogInput", 1)])
+    interface = make_cov_interface(proxy)
+    interface.scrape_all()
+
+    proxy.plans.clear()
+    proxy.subscriptions = []
+    assert len(interface.scrape_all()) == 2
+    assert proxy.subscriptions == ["Point1"]
+
+
+@pytest.mark.driver
+def test_replaced_plan_is_released():
+    proxy = FakeProxy(max_objects=2)
+    interface = make_interface(proxy, FakeConfig())
+
+    #The plan is registered again with a lower max_per_request.
+    assert len(interface.scrape_all()) == 4
+    assert proxy.calls.count("register_read_plan") == 2
+    assert list(proxy.plans) == [interface.read_plan_handle]
+
+
+@pytest.mark.driver
+def test_stop_releases_plan_and_cov_subscriptions():
+    proxy = FakeProxy(cov_objects=[("analogInput", 1)])
+    interface = make_cov_interface(proxy)
+    interface.scrape_all()
+    assert proxy.plans and proxy.subscriptions == ["Point1"]
+
+    interface.stop()
+    assert proxy.plans == {}
+    assert proxy.subscriptions == []
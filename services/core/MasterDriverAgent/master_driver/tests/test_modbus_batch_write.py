@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+#
+
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization
+# that has cooperated in the development of these materials, makes
+# any warranty, express or implied, or assumes any legal liability
+# or responsibility for the accuracy, completeness, or usefulness or
+# any information, apparatus, product, software, or process disclosed,
+# or represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does
+# not necessarily constitute or imply its endorsement, recommendation,
+# r favoring by the United States Government or any agency thereof,
+# or Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+from contextlib import contextmanager
+
+import pytest
+
+from master_driver.interfaces import modbus
+from master_driver.interfaces.modbus import Interface, merge_ranges
+from volttron.platform.store import process_raw_config
+
+registry_config_string = """Volttron Point Name,Units,Modbus Register,Writable,Point Address,Default Value,Mixed Endian
+Reg1,F,>h,TRUE,0,1,
+Reg2,F,>h,TRUE,1,2,
+Float,F,>f,TRUE,2,3.5,TRUE
+Gap,F,>h,TRUE,10,4,
+ReadOnly,F,>h,FALSE,11,,
+Coil1,On/Off,BOOL,TRUE,0,0,
+Coil2,On/Off,BOOL,TRUE,1,1,
+"""
+
+registry_config = process_raw_config(registry_config_string, config_type="csv")
+
+
+class FakeResponse(object):
+    pass
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.writes = []
+
+    def write_registers(self, address, values, unit=0):
+        self.writes.append(('registers', address, list(values)))
+        return FakeResponse()
+
+    def write_coils(self, address, values, unit=0):
+        self.writes.append(('coils', address, list(values)))
+        return FakeResponse()
+
+
+@pytest.fixture
+def interface(monkeypatch):
+    client = FakeClient()
+    connections = []
+
+    @contextmanager
+    def fake_modbus_client(address, port):
+        connections.append((address, port))
+        yield client
+
+    monkeypatch.setattr(modbus, "modbus_client", fake_modbus_client)
+
+    interface = Interface()
+    interface.configure({"device_address": "127.0.0.1"}, registry_config)
+    interface.client = client
+    interface.connections = connections
+    return interface
+
+
+@pytest.mark.driver
+def test_merge_ranges_limits():
+    ranges = [[0, 1, ['a']], [2, 2, ['b']], [4, 4, ['c']], [4, 5, ['d']]]
+    assert merge_ranges(ranges) == [[0, 2, ['a', 'b']], [4, 5, ['c', 'd']]]
+    assert merge_ranges(ranges, max_count=2) == [[0, 1, ['a']], [2, 2, ['b']], [4, 5, ['c', 'd']]]
+    assert merge_ranges(ranges, allow_overlap=False) == [[0, 2, ['a', 'b']], [4, 4, ['c']], [4, 5, ['d']]]
+
+
+@pytest.mark.driver
+def test_contiguous_writes_batched(interface):
+    result = interface.set_multiple_points("device", [("Reg1", 10),
+                                                      ("Reg2", 20),
+                                                      ("Float", 1.0),
+                                                      ("Gap", 30),
+                                                      ("Coil1", True),
+                                                      ("Coil2", False)])
+    assert result == {}
+    assert len(interface.connections) == 1
+
+    float_registers = modbus.ModbusByteRegister(2, '>f', "Float", "F", False,
+                                                mixed_endian=True).get_register_values(1.0)
+    assert sorted(interface.client.writes) == sorted([('registers', 0, [10, 20] + float_registers),
+                                                      ('registers', 10, [30]),
+                                                      ('coils', 0, [True, False])])
+
+
+@pytest.mark.driver
+def test_read_only_point_reported(interface):
+    result = interface.set_multiple_points("device", [("Reg1", 10), ("ReadOnly", 1)])
+    assert result.keys() == ["device/ReadOnly"]
+    assert interface.client.writes == [('registers', 0, [10])]
+    assert interface._tracker.dirty_points == set()
+
+
+@pytest.mark.driver
+def test_revert_all_batched(interface):
+    interface.revert_all()
+    assert len(interface.connections) == 1
+    writes = dict(((kind, address), values) for kind, address, values in interface.client.writes)
+    assert writes[('registers', 0)][:2] == [1, 2]
+    assert writes[('registers', 10)] == [4]
+    assert writes[('coils', 0)] == [False, True]
@@ -58,6 +58,8 @@ import datetime
 import errno
 import logging
 import os, os.path
+from collections import defaultdict
+from multiprocessing.pool import ThreadPool
 from pprint import pprint
 import sqlite3
 import sys
@@ -66,6 +68,7 @@ import uuid
 import gevent
 import requests
 from requests import ConnectionError
+from requests.adapters import HTTPAdapter
 from volttron.utils.docs import doc_inherit
 from zmq.utils import jsonapi
 
@@ -73,11 +76,52 @@ from volttron.platform.vip.agent import *
 from volttron.platform.agent.base_historian import BaseHistorian
 from volttron.platform.agent import utils
 from volttron.platform.messaging import topics, headers as headers_mod
-from twisted.spread.pb import respond
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '3.1'
+__version__ = '3.2'
+
+
+def build_topic_index(datasets):
+    """Maps each input topic to the datasets and openeis sensors it is
+    published to.
+
+    :param datasets: The dataset_definitions from the configuration.
+    :returns: topic -> [(dataset_id, openeis_sensor), ...]
+    :rtype: dict
+    """
+    index = defaultdict(list)
+    for dsv in datasets.values():
+        ds_id = dsv["dataset_id"]
+        for point in dsv['points']:
+            for topic, openeis_sensor in point.items():
+                index[topic].append((ds_id, openeis_sensor))
+    return dict(index)
+
+
+def bucket_records(index, to_publish_list):
+    """Sorts records into a point map per dataset in a single pass.
+
+    :param index: The result of :py:func:`build_topic_index`.
+    :param to_publish_list: Records from the historian cache.
+    :returns: dataset_id -> (point_map, records) and the records whose
+              topic is not in any dataset.
+    :rtype: tuple
+    """
+    payloads = {}
+    unmapped = []
+    for to_pub in to_publish_list:
+        targets = index.get(to_pub['topic'])
+        if not targets:
+            unmapped.append(to_pub)
+            continue
+        for ds_id, openeis_sensor in targets:
+            point_map, records = payloads.setdefault(ds_id, ({}, []))
+            point_map.setdefault(openeis_sensor, []).append(
+                [to_pub['timestamp'], to_pub['value']])
+            records.append(to_pub)
+    return payloads, unmapped
+
 
 def historian(config_path, **kwargs):
 
@@ -104,8 +148,11 @@ def historian(config_path, **kwargs):
     datasets = config.get("dataset_definitions")
     assert datasets
     assert len(datasets) > 0
+
+    max_concurrent_requests = config.get("max_concurrent_requests", 10)
     
     headers = {'content-type': 'application/json'}
+    dataset_uri = uri + "/api/datasets/append"
         
     class OpenEISHistorian(BaseHistorian):
         '''An OpenEIS historian which allows the publishing of dynamic.
@@ -135,73 +182,74 @@ def historian(config_path, **kwargs):
         def publish_to_historian(self, to_publish_list):
             _log.debug("publish_to_historian number of items: {}"
                        .format(len(to_publish_list)))
-            
-            #pprint(to_publish_list)
-            dataset_uri = uri + "/api/datasets/append"
-            
-            # Build a paylooad for each of the points in each of the dataset
-            # definitions.
-            for dsk, dsv in datasets.items():
-                ds_id = dsv["dataset_id"]
-                ds_points = dsv['points'] #[unicode(p) for p in dsv['points']]
-                ignore_unmapped = dsv.get('ignore_unmapped_points', 0) 
-                
-                point_map = {}
-                try_publish = []
-                for to_pub in to_publish_list:
-                    for point in ds_points:                      
-                        if to_pub['topic'] in point.keys():
-                            try_publish.append(to_pub)
-                            # gets the value of the sensor for publishing.
-                            openeis_sensor = point[to_pub['topic']]
-                            if not openeis_sensor in point_map:
-                                point_map[openeis_sensor] = []
-                                
-                            point_map[openeis_sensor].append([to_pub['timestamp'],
-                                                               to_pub['value']])
-                        else:
-                            if ignore_unmapped:
-                                self.report_handled(to_pub)
-                            else:
-                                err = 'Point {topic} was not found in point map.' \
-                                    .format(**to_pub)
-                                _log.error(err)
-                                
-                    #pprint(point_map)
-                        
-                if len(point_map) > 0:
-                    payload = { 'dataset_id': ds_id,
-                               'point_map': point_map}
-                    payload = jsonapi.dumps(payload, 
-                                            default=datetime.datetime.isoformat)
-                    try:
-                        #resp = requests.post(login_uri, auth=auth)
-                        resp = requests.put(dataset_uri, verify=False, headers=headers, 
-                                            data=payload)
-                        if resp.status_code == requests.codes.ok:                       
-                            self.report_handled(try_publish)
-                    except ConnectionError:
-                        _log.error('Unable to connect to openeis at {}'.format(uri))
-                        return
-                        
-                        
-            '''
-            Transform the to_publish_list into a dictionary like the following
-            
-            dataset_extension = {
-                "dataset_id": dataset_id,
-                "point_map": 
-                {
-                    "New building/WholeBuildingPower": [["2/5/2014 10:00",48.78], ["2/5/2014 10:05",50.12], ["2/5/2014 10:10",48.54]],
-                    "New building/OutdoorAirTemperature": [["2/5/2014 10:00",48.78], ["2/5/2014 10:05",10.12], ["2/5/2014 10:10",48.54]]
-                }
-            }
-            '''
+
+            # Build a payload for each dataset the records are mapped to.
+            payloads, unmapped = bucket_records(self._topic_index,
+                                                to_publish_list)
+
+            for to_pub in unmapped:
+                if self._ignore_unmapped:
+                    self.report_handled(to_pub)
+                else:
+                    err = 'Point {topic} was not found in point map.' \
+                        .format(**to_pub)
+                    _log.error(err)
+
+            # The appends to each dataset are independent so they are sent
+            # at the same time.
+            for records in self._pool.map(self._append, payloads.items()):
+                if records:
+                    self.report_handled(records)
+
+        def _append(self, item):
+            """Sends one dataset's point map to openeis.
+
+            :returns: The records sent when openeis accepted them.
+            """
+            ds_id, (point_map, records) = item
+            payload = {'dataset_id': ds_id,
+                       'point_map': point_map}
+            payload = jsonapi.dumps(payload,
+                                    default=datetime.datetime.isoformat)
+            try:
+                resp = self._session.put(dataset_uri, verify=False,
+                                         headers=headers, data=payload)
+            except ConnectionError:
+                _log.error('Unable to connect to openeis at {}'.format(uri))
+                return None
+            if resp.status_code == requests.codes.ok:
+                return records
+            _log.error('Append to dataset {} failed with status {}'.format(
+                ds_id, resp.status_code))
+            return None
+
+        @Core.receiver("onstop")
+        def close_append_pool(self, sender, **kwargs):
+            """Stops the append threads and closes the shared session."""
+            pool = getattr(self, '_pool', None)
+            if pool is not None:
+                pool.close()
+                pool.join()
+            session = getattr(self, '_session', None)
+            if session is not None:
+                session.close()
 
         @doc_inherit
         def historian_setup(self):
-            # TODO Setup connection to openeis.
-            pass
+            self._topic_index = build_topic_index(datasets)
+            # Records in no dataset are dropped if any dataset ignores
+            # unmapped points, as they were before the index was added.
+            self._ignore_unmapped = any(
+                dsv.get('ignore_unmapped_points', 0)
+                for dsv in datasets.values())
+
+            # One keep-alive session shared by the append threads.
+            self._session = requests.Session()
+            self._session.auth = auth
+            adapter = HTTPAdapter(pool_maxsize=max_concurrent_requests)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+            self._pool = ThreadPool(max_concurrent_requests)
 
     OpenEISHistorian.__name__ = 'OpenEISHistorian'
     return OpenEISHistorian(**kwargs)
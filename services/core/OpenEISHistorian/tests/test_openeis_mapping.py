@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for mapping cached records to OpenEIS datasets.
+"""
+
+from openeis.historian import build_topic_index, bucket_records
+
+DATASETS = {
+    "ds1": {
+        "dataset_id": 1,
+        "points": [
+            {"campus1/building1/OutsideAirTemp": "building1/OutdoorAirTemperature"},
+            {"campus1/building1/HVACStatus": "building1/HVACStatus"}
+        ]
+    },
+    "ds2": {
+        "dataset_id": 2,
+        "points": [
+            {"campus1/building1/OutsideAirTemp": "building1/OAT"}
+        ]
+    }
+}
+
+
+def record(_id, topic, value):
+    return {'_id': _id, 'topic': topic, 'timestamp': '2017-01-01T00:00:00',
+            'value': value}
+
+
+def test_build_topic_index():
+    index = build_topic_index(DATASETS)
+
+    assert sorted(index["campus1/building1/OutsideAirTemp"]) == [
+        (1, "building1/OutdoorAirTemperature"), (2, "building1/OAT")]
+    assert index["campus1/building1/HVACStatus"] == [
+        (1, "building1/HVACStatus")]
+
+
+def test_bucket_records():
+    records = [record(1, "campus1/building1/OutsideAirTemp", 70.0),
+               record(2, "campus1/building1/HVACStatus", 1),
+               record(3, "campus1/building1/Unknown", 5),
+               record(4, "campus1/building1/OutsideAirTemp", 71.0)]
+
+    payloads, unmapped = bucket_records(build_topic_index(DATASETS), records)
+
+    assert unmapped == [records[2]]
+    point_map, handled = payloads[1]
+    assert point_map == {
+        "building1/OutdoorAirTemperature": [["2017-01-01T00:00:00", 70.0],
+                                            ["2017-01-01T00:00:00", 71.0]],
+        "building1/HVACStatus": [["2017-01-01T00:00:00", 1]]}
+    assert handled == [records[0], records[1], records[3]]
+    point_map, handled = payloads[2]
+    assert point_map == {
+        "building1/OAT": [["2017-01-01T00:00:00", 70.0],
+                          ["2017-01-01T00:00:00", 71.0]]}
+    assert handled == [records[0], records[3]]
@@ -63,11 +63,13 @@ import psutil
 
 from volttron.platform.vip.agent import Agent, RPC, Core
 from volttron.platform.agent import utils
+from volttron.platform.agent.known_identities import CONTROL
+from volttron.platform.messaging.health import Status, STATUS_BAD
 
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '3.6'
+__version__ = '3.7'
 
 
 def sysmon_agent(config_path, **kwargs):
@@ -84,6 +86,82 @@ def sysmon_agent(config_path, **kwargs):
     return SysMonAgent(config, **kwargs)
 
 
+class ProcessSampler(object):
+    """Sample resource usage of a set of named processes.
+
+    The :class:`psutil.Process` object for each pid is kept between calls
+    to :meth:`sample` so that CPU percent is measured over the time since
+    the previous sample and a process is only looked up when it first
+    appears.
+    """
+    def __init__(self):
+        self._processes = {}
+
+    def sample(self, pids):
+        """Return resource usage for each process.
+
+        :param pids: Map of name to pid. Names with a pid of None are
+                     skipped.
+        :type pids: dict
+        :returns: Map of name to usage dict
+        :rtype: dict
+        """
+        processes = {}
+        results = {}
+        for name, pid in pids.iteritems():
+            if pid is None:
+                continue
+            proc = self._processes.get(pid)
+            try:
+                if proc is None:
+                    proc = psutil.Process(pid)
+                    # The first call only primes the CPU counter.
+                    proc.cpu_percent(interval=None)
+                results[name] = self._sample_process(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            processes[pid] = proc
+        # Processes that have exited are dropped.
+        self._processes = processes
+        return results
+
+    @staticmethod
+    def _sample_process(proc):
+        cpu_times = proc.cpu_times()
+        memory = proc.memory_info()
+        usage = {'pid': proc.pid,
+                 'cpu_percent': proc.cpu_percent(interval=None),
+                 'cpu_user': cpu_times.user,
+                 'cpu_system': cpu_times.system,
+                 'rss': memory.rss,
+                 'num_threads': proc.num_threads()}
+        try:
+            usage['num_fds'] = proc.num_fds()
+        except AttributeError:
+            # Not available on Windows.
+            pass
+        try:
+            io = proc.io_counters()
+            usage['read_bytes'] = io.read_bytes
+            usage['write_bytes'] = io.write_bytes
+        except (AttributeError, psutil.AccessDenied):
+            # Not available on macOS.
+            pass
+        return usage
+
+
+def top_processes(usage, count):
+    """Return the names of the `count` processes using the most CPU and the
+    `count` processes using the most memory.
+    """
+    names = set()
+    for key in ('cpu_percent', 'rss'):
+        ranked = sorted(usage, key=lambda name: usage[name][key],
+                        reverse=True)
+        names.update(ranked[:count])
+    return names
+
+
 class SysMonAgent(Agent):
     """Monitor utilization of system resources (CPU, memory, disk)
 
@@ -102,8 +180,19 @@ class SysMonAgent(Agent):
             "cpu_check_interval": 5,
             "memory_check_interval": 5,
             "disk_check_interval": 5,
-            "disk_path": "/"
+            "disk_path": "/",
+            "agent_check_interval": 0,
+            "agent_top_n": 0,
+            "agent_thresholds": {}
         }
+
+    If agent_check_interval is greater than zero the CPU, memory, open file,
+    thread and I/O usage of the platform and of every running agent is
+    published to the agent_stats topic at that interval as a single message.
+    agent_top_n limits the message to the agents using the most CPU and the
+    most memory. agent_thresholds maps a usage key (for example rss or
+    num_fds) to a limit; an alert is sent through the health subsystem when
+    an agent goes over a limit.
     """
     def __init__(self, config, **kwargs):
         super(SysMonAgent, self).__init__(**kwargs)
@@ -112,10 +201,17 @@ class SysMonAgent(Agent):
         self.memory_check_interval = config.pop('memory_check_interval', 5)
         self.disk_check_interval = config.pop('disk_check_interval', 5)
         self.disk_path = config.pop('disk_path', '/')
+        self.agent_check_interval = config.pop('agent_check_interval', 0)
+        self.agent_top_n = config.pop('agent_top_n', 0)
+        self.agent_thresholds = config.pop('agent_thresholds', {})
         for key in config:
             _log.warn('Ignoring unrecognized cofiguration parameter %s', key)
 
         self._pub_greenlets = []
+        self._sampler = ProcessSampler()
+        self._agent_stats = {}
+        self._platform_pid = None
+        self._over_threshold = set()
 
     def _configure(self, config):
         self.base_topic = config.pop('base_topic', self.base_topic)
@@ -126,6 +222,11 @@ class SysMonAgent(Agent):
         self.disk_check_interval = config.pop('disk_check_interval',
                                               self.disk_check_interval)
         self.disk_path = config.pop('disk_path', self.disk_path)
+        self.agent_check_interval = config.pop('agent_check_interval',
+                                               self.agent_check_interval)
+        self.agent_top_n = config.pop('agent_top_n', self.agent_top_n)
+        self.agent_thresholds = config.pop('agent_thresholds',
+                                           self.agent_thresholds)
         for key in config:
             _log.warn('Ignoring unrecognized cofiguration parameter %s', key)
 
@@ -134,11 +235,11 @@ class SysMonAgent(Agent):
         """Set up periodic publishing of system resource data"""
         self._start_pub()
 
-    def _periodic_pub(self, func, period, wait=0):
+    def _periodic_pub(self, func, period, wait=0, name=None):
         """Periodically call func and publish its return value"""
         def pub_wrapper():
             data = func()
-            topic = self.base_topic + '/' + func.__name__
+            topic = self.base_topic + '/' + (name or func.__name__)
             self.vip.pubsub.publish(peer='pubsub', topic=topic,
                                     message=data)
         greenlet = self.core.periodic(period, pub_wrapper, wait=wait)
@@ -159,6 +260,58 @@ class SysMonAgent(Agent):
         """Return usage of disk mounted at configured path"""
         return psutil.disk_usage(self.disk_path).percent
 
+    @RPC.export
+    def agent_stats(self):
+        """Return the most recent per-agent resource usage"""
+        return self._agent_stats
+
+    def _sample_agents(self):
+        """Sample resource usage of the platform and all running agents"""
+        pids = {}
+        try:
+            if self._platform_pid is None:
+                self._platform_pid = self.vip.rpc.call(
+                    CONTROL, 'platform_pid').get(timeout=10)
+            pids['platform'] = self._platform_pid
+            status = self.vip.rpc.call(CONTROL, 'status_agents').get(timeout=10)
+        except Exception as e:
+            _log.error('Unable to get agent list from control: %s', e)
+            status = []
+        for uuid, name, (pid, returncode) in status:
+            if returncode is None:
+                if name in pids:
+                    name = '{} ({})'.format(name, uuid[:8])
+                pids[name] = pid
+
+        usage = self._sampler.sample(pids)
+        self._check_thresholds(usage)
+        if self.agent_top_n > 0:
+            top = top_processes(usage, self.agent_top_n)
+            usage = {name: usage[name] for name in top}
+        self._agent_stats = {'timestamp': utils.format_timestamp(
+                                 utils.get_aware_utc_now()),
+                             'agents': usage}
+        return self._agent_stats
+
+    def _check_thresholds(self, usage):
+        """Send an alert for each agent that has gone over a threshold"""
+        over = set()
+        for name, values in usage.iteritems():
+            for key, limit in self.agent_thresholds.iteritems():
+                value = values.get(key)
+                if value is None or value <= limit:
+                    continue
+                over.add((name, key))
+                if (name, key) in self._over_threshold:
+                    continue
+                context = '{} {} is {} (limit {})'.format(name, key, value,
+                                                          limit)
+                _log.warn(context)
+                self.vip.health.send_alert(
+                    'SysMonAgent {} {}'.format(key, name),
+                    Status.build(STATUS_BAD, context=context))
+        self._over_threshold = over
+
     @RPC.export
     def reconfigure(self, **kwargs):
         """Reconfigure the agent"""
@@ -173,6 +326,9 @@ class SysMonAgent(Agent):
         self._periodic_pub(self.cpu_percent, self.cpu_check_interval)
         self._periodic_pub(self.memory_percent, self.memory_check_interval)
         self._periodic_pub(self.disk_percent, self.disk_check_interval)
+        if self.agent_check_interval > 0:
+            self._periodic_pub(self._sample_agents, self.agent_check_interval,
+                               name='agent_stats')
 
     def _stop_pub(self):
         for greenlet in self._pub_greenlets:
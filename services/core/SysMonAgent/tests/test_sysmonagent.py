@@ -72,7 +72,8 @@ _test_config = {
     "cpu_check_interval": 1,
     "memory_check_interval": 1,
     "disk_check_interval": 1,
-    "disk_path": "/"
+    "disk_path": "/",
+    "agent_check_interval": 1
 }
 
 
@@ -103,7 +104,8 @@ def sysmon_tester_agent(request, volttron_instance, tmpdir):
 def listen(agent, config):
     """Assert all SysMonAgent topics have been heard"""
     base_topic = config['base_topic']
-    short_topics = ['cpu_percent', 'memory_percent', 'disk_percent']
+    short_topics = ['cpu_percent', 'memory_percent', 'disk_percent',
+                    'agent_stats']
     topics = [base_topic + '/' + x for x in short_topics]
     seen_topics = set()
 
@@ -133,3 +135,14 @@ def test_reconfigure_then_listen(sysmon_tester_agent):
     sysmon_tester_agent.vip.rpc.call('platform.sysmon', 'reconfigure',
                                      **new_config)
     listen(sysmon_tester_agent, new_config)
+
+
+def test_agent_stats(sysmon_tester_agent):
+    """Test that usage of the platform and running agents is reported"""
+    def platform_sampled():
+        stats = sysmon_tester_agent.vip.rpc.call(
+            'platform.sysmon', 'agent_stats').get(timeout=10)
+        return 'platform' in stats.get('agents', {}) and any(
+            name.startswith('sysmon') for name in stats['agents'])
+
+    assert poll_gevent_sleep(5, platform_sampled)
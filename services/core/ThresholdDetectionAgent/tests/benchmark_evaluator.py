@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Benchmark device evaluations per second for ThresholdDetectionAgent.
+
+Usage: python benchmark_evaluator.py [points] [seconds]
+"""
+
+import os
+import random
+import sys
+import time
+
+test_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(test_dir + '/../thresholddetection')
+from evaluator import ThresholdEvaluator, numpy
+
+
+def benchmark(point_count, seconds, vectorize):
+    rand = random.Random(0)
+    points = {}
+    for i in range(point_count):
+        points['point{}'.format(i)] = {'threshold_max': 90,
+                                       'threshold_min': 10,
+                                       'deadband': 2}
+    payloads = []
+    for _ in range(100):
+        payloads.append(dict((name, rand.uniform(0, 100)) for name in points))
+
+    evaluator = ThresholdEvaluator(points, vectorize=vectorize)
+    count = 0
+    start = time.time()
+    end = start + seconds
+    while time.time() < end:
+        for payload in payloads:
+            evaluator.evaluate(payload, now=count)
+            count += 1
+    elapsed = time.time() - start
+    return count / elapsed
+
+
+def main(argv=sys.argv):
+    point_count = int(argv[1]) if len(argv) > 1 else 200
+    seconds = float(argv[2]) if len(argv) > 2 else 2.0
+    modes = [False]
+    if numpy is not None:
+        modes.append(True)
+    for vectorize in modes:
+        rate = benchmark(point_count, seconds, vectorize)
+        print("{} points, {}: {:.0f} device evaluations/sec, "
+              "{:.0f} point evaluations/sec".format(
+                  point_count, 'numpy' if vectorize else 'python',
+                  rate, rate * point_count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Unit tests for the compiled threshold tables used by
+ThresholdDetectionAgent
+"""
+
+import os
+import sys
+
+import pytest
+
+test_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(test_dir + '/../thresholddetection')
+from evaluator import ThresholdEvaluator, ABOVE, BELOW, numpy
+
+vectorize_params = [False]
+if numpy is not None:
+    vectorize_params.append(True)
+
+
+@pytest.fixture(params=vectorize_params, ids=lambda v: 'numpy' if v else 'python')
+def vectorize(request):
+    return request.param
+
+
+def alerted_points(alerts):
+    return sorted((point, direction) for point, _, _, direction in alerts)
+
+
+def test_single_pass(vectorize):
+    evaluator = ThresholdEvaluator({'a': {'threshold_max': 10},
+                                    'b': {'threshold_min': 0},
+                                    'c': {'threshold_max': 10,
+                                          'threshold_min': 0}},
+                                   vectorize=vectorize)
+    alerts = evaluator.evaluate({'a': 11, 'b': -1, 'c': 5}, now=0)
+    assert alerted_points(alerts) == [('a', ABOVE), ('b', BELOW)]
+
+    alerts = evaluator.evaluate({'a': 9, 'b': 1, 'c': 11}, now=1)
+    assert alerted_points(alerts) == [('c', ABOVE)]
+    point, threshold, value, _ = alerts[0]
+    assert threshold == 10
+    assert value == 11
+
+
+def test_non_numeric_and_missing_values(vectorize):
+    evaluator = ThresholdEvaluator({'a': {'threshold_max': 10},
+                                    'b': {'threshold_max': 10},
+                                    'c': {'threshold_max': 10},
+                                    'd': {'threshold_max': 10}},
+                                   vectorize=vectorize)
+    alerts = evaluator.evaluate({'a': 'on', 'b': None, 'c': True}, now=0)
+    assert alerts == []
+
+
+def test_no_deadband_alerts_every_time(vectorize):
+    evaluator = ThresholdEvaluator({'a': {'threshold_max': 10}},
+                                   vectorize=vectorize)
+    for now in range(5):
+        assert len(evaluator.evaluate({'a': 11}, now=now)) == 1
+
+
+def test_deadband_hysteresis(vectorize):
+    evaluator = ThresholdEvaluator({'a': {'threshold_max': 10,
+                                          'threshold_min': 0,
+                                          'deadband': 2}},
+                                   vectorize=vectorize)
+    assert len(evaluator.evaluate({'a': 11}, now=0)) == 1
+    # Flapping around the threshold does not re-arm the point.
+    assert evaluator.evaluate({'a': 9}, now=1) == []
+    assert evaluator.evaluate({'a': 11}, now=2) == []
+    # Back inside the deadband re-arms the point.
+    assert evaluator.evaluate({'a': 7}, now=3) == []
+    assert len(evaluator.evaluate({'a': 11}, now=4)) == 1
+    # Crossing the other threshold alerts immediately.
+    assert alerted_points(evaluator.evaluate({'a': -1}, now=5)) == [('a', BELOW)]
+    assert evaluator.evaluate({'a': 1}, now=6) == []
+    assert evaluator.evaluate({'a': -1}, now=7) == []
+
+
+def test_alert_interval(vectorize):
+    evaluator = ThresholdEvaluator({'a': {'threshold_max': 10,
+                                          'alert_interval': 60}},
+                                   vectorize=vectorize)
+    assert len(evaluator.evaluate({'a': 11}, now=0)) == 1
+    assert evaluator.evaluate({'a': 12}, now=30) == []
+    assert evaluator.evaluate({'a': 5}, now=45) == []
+    assert len(evaluator.evaluate({'a': 11}, now=60)) == 1
+
+
+@pytest.mark.skipif(numpy is None, reason='numpy is not installed')
+def test_vectorized_matches_python():
+    import random
+    rand = random.Random(42)
+    points = {}
+    for i in range(200):
+        points['p{}'.format(i)] = {'threshold_max': rand.uniform(50, 100),
+                                   'threshold_min': rand.uniform(0, 50),
+                                   'deadband': rand.choice([None, 0, 5]),
+                                   'alert_interval': rand.choice([0, 3])}
+    python = ThresholdEvaluator(points, vectorize=False)
+    vectorized = ThresholdEvaluator(points, vectorize=True)
+    assert vectorized.vectorized
+
+    for now in range(50):
+        values = dict((name, rand.uniform(-10, 110)) for name in points)
+        assert (alerted_points(python.evaluate(values, now=now)) ==
+                alerted_points(vectorized.evaluate(values, now=now)))
@@ -64,6 +64,8 @@ from volttron.platform.vip.agent import Agent, Core, PubSub, RPC, compat
 from volttron.platform.agent import utils
 from volttron.platform.messaging.health import Status, STATUS_BAD
 
+from .evaluator import ThresholdEvaluator
+
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 __version__ = '3.7'
@@ -105,11 +107,19 @@ class ThresholdDetectionAgent(Agent):
             "devices/some/device/topic/all": {
                 "some_point": {
                     "threshold_max": 42,
-                    "threshold_min": 0
+                    "threshold_min": 0,
+                    "deadband": 2,
+                    "alert_interval": 300
                 }
             }
         }
 
+    ``deadband`` and ``alert_interval`` are optional. With a deadband a
+    point only alerts when it first crosses a threshold and is re-armed
+    once it is back inside the threshold by the deadband.
+    ``alert_interval`` is the minimum number of seconds between alerts
+    for the same topic or point.
+
     """
     def __init__(self, config, **kwargs):
         super(ThresholdDetectionAgent, self).__init__(**kwargs)
@@ -138,8 +148,12 @@ class ThresholdDetectionAgent(Agent):
 
     def _create_device_subscription(self, topic, device_points):
         """
-        Subscribe to points in a device's all publish and alert if
-        values are out of range
+        Subscribe to a device's all publish and alert if any of the
+        configured points are out of range
+
+        All points of the device are compiled into a single
+        :py:class:`ThresholdEvaluator` so each publish is evaluated
+        in one pass.
 
         :param topic: All topic from a device scrape
         :type topic: str
@@ -147,48 +161,31 @@ class ThresholdDetectionAgent(Agent):
         :param device_points: Dictionary of points to thresholds
         :type device_points: dict
         """
-        for point, values in device_points.iteritems():
-            threshold_max = values.get('threshold_max')
-            threshold_min = values.get('threshold_min')
+        evaluator = ThresholdEvaluator(device_points)
 
-            def callback(peer, sender, bus, topic, headers, message):
-                data = message[0].get(point)
-
-                try:
-                    float(data)
-                except ValueError:
-                    return
-
-                if threshold_max is not None and data > threshold_max:
-                    self._alert(topic, threshold_max, data, point=point)
-                elif threshold_min is not None and data < threshold_min:
-                    self._alert(topic, threshold_min, data, point=point)
+        def callback(peer, sender, bus, topic, headers, message):
+            if not isinstance(message, list) or not message:
+                return
+            for point, threshold, data, _ in evaluator.evaluate(message[0]):
+                self._alert(topic, threshold, data, point=point)
 
-            self.vip.pubsub.subscribe('pubsub', topic, callback)
+        self.vip.pubsub.subscribe('pubsub', topic, callback)
 
     def _create_standard_subscription(self, topic, values):
         """
         Subscribe to a topic and alert if its message is out of range
 
-        :param topic: All topic from a device scrape
+        :param topic: Topic to watch
         :type topic: str
 
-        :param device_points: Dictionary of points to thresholds
-        :type device_points: dict
+        :param values: Dictionary of thresholds for the topic
+        :type values: dict
         """
-        threshold_max = values.get('threshold_max')
-        threshold_min = values.get('threshold_min')
+        evaluator = ThresholdEvaluator({topic: values})
 
         def callback(peer, sender, bus, topic, headers, data):
-            try:
-                float(data)
-            except ValueError:
-                return
-
-            if threshold_max is not None and data > threshold_max:
-                self._alert(topic, threshold_max, data)
-            elif threshold_min is not None and data < threshold_min:
-                self._alert(topic, threshold_min, data)
+            for _, threshold, value, _ in evaluator.evaluate({topic: data}):
+                self._alert(topic, threshold, value)
 
         self.vip.pubsub.subscribe('pubsub', topic, callback)
 
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+#}}}
+
+"""
+Compiled threshold tables for ThresholdDetectionAgent.
+
+A :py:class:`ThresholdEvaluator` is built once per configured topic and
+evaluates every point of a publish in a single pass. Device tables that
+are wider than ``VECTORIZE_MIN_POINTS`` are evaluated with NumPy when it
+is installed.
+"""
+
+import logging
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_log = logging.getLogger(__name__)
+
+VECTORIZE_MIN_POINTS = 64
+
+ABOVE = 'above'
+BELOW = 'below'
+
+
+def _to_float(value):
+    """Return value as a float or None if it is not numeric."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ThresholdEvaluator(object):
+    """
+    Evaluate a table of point thresholds against published values.
+
+    Each point may be configured with:
+
+    - ``threshold_max``/``threshold_min``: Alert when a value is above or
+      below the threshold.
+    - ``deadband``: Once a point has crossed a threshold it stays in the
+      alarmed state until it comes back inside the threshold by at least
+      this amount. While alarmed no further alerts are raised for the
+      point. Without a deadband every out of range value is reported.
+    - ``alert_interval``: Minimum number of seconds between two alerts
+      for the point.
+
+    :param points: Dictionary of point names to threshold settings.
+    :type points: dict
+
+    :param vectorize: Use NumPy for the evaluation. Defaults to using
+                      NumPy, if installed, for tables with at least
+                      ``VECTORIZE_MIN_POINTS`` points.
+    :type vectorize: bool
+    """
+    def __init__(self, points, vectorize=None):
+        self.names = []
+        self.max_values = []
+        self.min_values = []
+        self.deadbands = []
+        self.latching = []
+        self.intervals = []
+
+        for name, values in points.iteritems():
+            threshold_max = values.get('threshold_max')
+            threshold_min = values.get('threshold_min')
+            if threshold_max is None and threshold_min is None:
+                _log.warning("No thresholds configured for {}".format(name))
+                continue
+            deadband = values.get('deadband')
+
+            self.names.append(name)
+            self.max_values.append(float('inf') if threshold_max is None
+                                   else float(threshold_max))
+            self.min_values.append(float('-inf') if threshold_min is None
+                                   else float(threshold_min))
+            self.latching.append(deadband is not None)
+            self.deadbands.append(float(deadband or 0.0))
+            self.intervals.append(float(values.get('alert_interval', 0.0)))
+
+        count = len(self.names)
+        self.alarmed_above = [False] * count
+        self.alarmed_below = [False] * count
+        self.last_alert = [float('-inf')] * count
+
+        if vectorize is None:
+            vectorize = count >= VECTORIZE_MIN_POINTS
+        self.vectorized = bool(vectorize) and numpy is not None
+        if self.vectorized:
+            self._compile_arrays()
+
+    def _compile_arrays(self):
+        self.max_values = numpy.array(self.max_values, dtype=float)
+        self.min_values = numpy.array(self.min_values, dtype=float)
+        self.clear_above = self.max_values - numpy.array(self.deadbands)
+        self.clear_below = self.min_values + numpy.array(self.deadbands)
+        self.latching = numpy.array(self.latching, dtype=bool)
+        self.intervals = numpy.array(self.intervals, dtype=float)
+        self.alarmed_above = numpy.array(self.alarmed_above, dtype=bool)
+        self.alarmed_below = numpy.array(self.alarmed_below, dtype=bool)
+        self.last_alert = numpy.array(self.last_alert, dtype=float)
+
+    def __len__(self):
+        return len(self.names)
+
+    def evaluate(self, values, now=None):
+        """
+        Evaluate published values against the table.
+
+        Points missing from values or with non-numeric values are
+        skipped and keep their alarmed state.
+
+        :param values: Dictionary of point names to published values.
+        :type values: dict
+
+        :param now: Time of the evaluation in seconds. Defaults to
+                    time.time().
+        :type now: float
+
+        :returns: List of (point, threshold, value, direction) tuples for
+                  the alerts that should be raised.
+        :rtype: list
+        """
+        if now is None:
+            now = time.time()
+        if self.vectorized:
+            return self._evaluate_vectorized(values, now)
+        return self._evaluate_python(values, now)
+
+    def _evaluate_python(self, values, now):
+        alerts = []
+        for index, name in enumerate(self.names):
+            value = _to_float(values.get(name))
+            if value is None or value != value:
+                continue
+
+            deadband = self.deadbands[index]
+            if value > self.max_values[index]:
+                direction = ABOVE
+                threshold = self.max_values[index]
+                was_alarmed = self.alarmed_above[index]
+                self.alarmed_above[index] = True
+                self.alarmed_below[index] = False
+            elif value < self.min_values[index]:
+                direction = BELOW
+                threshold = self.min_values[index]
+                was_alarmed = self.alarmed_below[index]
+                self.alarmed_below[index] = True
+                self.alarmed_above[index] = False
+            else:
+                if value <= self.max_values[index] - deadband:
+                    self.alarmed_above[index] = False
+                if value >= self.min_values[index] + deadband:
+                    self.alarmed_below[index] = False
+                continue
+
+            if was_alarmed and self.latching[index]:
+                continue
+            if now - self.last_alert[index] < self.intervals[index]:
+                continue
+
+            self.last_alert[index] = now
+            alerts.append((name, threshold, value, direction))
+        return alerts
+
+    def _evaluate_vectorized(self, values, now):
+        raw = [values.get(name) for name in self.names]
+        try:
+            data = numpy.array(raw, dtype=float)
+        except (TypeError, ValueError):
+            data = numpy.array([_to_float(v) for v in raw], dtype=float)
+        for index, value in enumerate(raw):
+            # numpy happily converts booleans, the python path does not.
+            if isinstance(value, bool):
+                data[index] = numpy.nan
+
+        with numpy.errstate(invalid='ignore'):
+            above = data > self.max_values
+            below = (data < self.min_values) & ~above
+            inside = ~(above | below) & ~numpy.isnan(data)
+            clear_above = inside & (data <= self.clear_above)
+            clear_below = inside & (data >= self.clear_below)
+
+        candidates = ((above & ~(self.alarmed_above & self.latching)) |
+                      (below & ~(self.alarmed_below & self.latching)))
+        candidates &= (now - self.last_alert) >= self.intervals
+
+        self.alarmed_above = (self.alarmed_above | above) & ~below & ~clear_above
+        self.alarmed_below = (self.alarmed_below | below) & ~above & ~clear_below
+        self.last_alert[candidates] = now
+
+        alerts = []
+        for index in numpy.flatnonzero(candidates):
+            if above[index]:
+                alerts.append((self.names[index], self.max_values[index],
+                               data[index], ABOVE))
+            else:
+                alerts.append((self.names[index], self.min_values[index],
+                               data[index], BELOW))
+        return alerts
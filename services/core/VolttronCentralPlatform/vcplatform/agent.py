@@ -81,7 +81,8 @@ from volttron.platform.agent.utils import (get_utc_seconds_from_epoch)
 from volttron.platform.agent import utils
 from volttron.platform.agent.exit_codes import INVALID_CONFIGURATION_CODE
 from volttron.platform.agent.known_identities import (
-    VOLTTRON_CENTRAL, VOLTTRON_CENTRAL_PLATFORM, CONTROL, CONFIGURATION_STORE)
+    VOLTTRON_CENTRAL, VOLTTRON_CENTRAL_PLATFORM, CONTROL, CONFIGURATION_STORE,
+    PLATFORM_DRIVER)
 from volttron.platform.agent.utils import (get_aware_utc_now)
 from volttron.platform.auth import AuthEntry, AuthFile
 from volttron.platform.jsonrpc import (INTERNAL_ERROR, INVALID_PARAMS)
@@ -186,6 +187,10 @@ class VolttronCentralPlatform(Agent):
         # This becomes a connection using the vcconnection.py file.
         self.volttron_central_connection = None
 
+        # Device tree built from the platform driver's configurations. Reset
+        # when the configuration store reports a change to them.
+        self._devices = None
+
     def _configure_main(self, config_name, action, contents):
         """
         This is the main configuration point for the agent.
@@ -888,40 +893,32 @@ class VolttronCentralPlatform(Agent):
         """
         RPC method for retrieving device data from the platform.
 
+        The device configurations and their registries are read from the
+        configuration store in a single call. The result is kept until the
+        store publishes a change to the platform driver's configurations.
+
         :return:
         """
+        if self._devices is not None:
+            return self._devices
 
         _log.debug('Getting devices')
-        config_list = self.vip.rpc.call(CONFIGURATION_STORE,
-                                        'manage_list_configs',
-                                        'platform.driver').get(timeout=5)
+        configs = self.vip.rpc.call(CONFIGURATION_STORE, 'manage_get_many',
+                                    PLATFORM_DRIVER,
+                                    raw=False).get(timeout=30)
+        registries = {name.lower(): contents
+                      for name, contents in configs.items()}
 
-        _log.debug('Config list is: {}'.format(config_list))
         devices = defaultdict(dict)
 
-        for cfg_name in config_list:
+        for cfg_name, device_config in configs.items():
             # Skip as we are only looking to do devices in this call.
             if not cfg_name.startswith('devices/'):
                 continue
 
-            _log.debug('Reading config store for device {}'.format(cfg_name))
-
-            device_config = self.vip.rpc.call('config.store', 'manage_get',
-                                              'platform.driver',
-                                              cfg_name,
-                                              raw=False).get(timeout=5)
-            _log.debug('DEVICE CONFIG IS: {}'.format(device_config))
-
             reg_cfg_name = device_config.get(
                 'registry_config')[len('config://'):]
-            _log.debug('Reading registry_config file {}'.format(
-                reg_cfg_name
-            ))
-            registry_config = self.vip.rpc.call('config.store',
-                                                'manage_get', 'platform.driver',
-                                                reg_cfg_name,
-                                                raw=False).get(timeout=5)
-            _log.debug('Registry Config: {}'.format(registry_config))
+            registry_config = registries.get(reg_cfg_name.lower(), [])
 
             points = []
             for pnt in registry_config:
@@ -929,8 +926,17 @@ class VolttronCentralPlatform(Agent):
 
             devices[cfg_name]['points'] = points
 
+        self._devices = devices
         return devices
 
+    @PubSub.subscribe('pubsub', topics.CONFIG_STORE_CHANGED(
+        identity=PLATFORM_DRIVER))
+    def _on_driver_config_change(self, peer, sender, bus, topic, headers,
+                                 message):
+        _log.debug('Platform driver configuration changed: {}'.format(
+            message))
+        self._devices = None
+
     def route_request(self, id, method, params):
         _log.debug(
             'platform agent routing request: {}, {}'.format(id, method))
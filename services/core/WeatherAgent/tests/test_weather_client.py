@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for the WeatherAgent response cache and request limits.
+"""
+
+import json
+
+import gevent
+import pytest
+from gevent.pywsgi import WSGIServer
+
+from weather.weatheragent import (WeatherClient, RequestCounter,
+                                  REQUESTS_EXHAUSTED)
+
+
+@pytest.fixture()
+def wu_stub():
+    """Serve current conditions for any location and count the requests."""
+    hits = []
+
+    def app(environ, start_response):
+        hits.append(environ['PATH_INFO'])
+        gevent.sleep(0.2)
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps({'current_observation': {'temp_f': 70.0}})]
+
+    server = WSGIServer(('127.0.0.1', 0), app, log=None)
+    server.start()
+    yield 'http://127.0.0.1:{}/api/KEY/conditions/q/'.format(
+        server.server_port), hits
+    server.stop()
+
+
+@pytest.fixture()
+def counter(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    return RequestCounter(500, 11, 3600)
+
+
+def test_concurrent_requests_share_one_fetch(wu_stub, counter):
+    url, hits = wu_stub
+    client = WeatherClient(url, counter, 300)
+
+    waiters = [gevent.spawn(client.get, location)
+               for location in ('99336', ' 99336', '99336 ', '99336')]
+    gevent.joinall(waiters, timeout=5)
+
+    assert [w.value for w in waiters] == [(True, {'temp_f': 70.0})] * 4
+    assert hits == ['/api/KEY/conditions/q/99336.json']
+
+    # Served from the cache.
+    assert client.get('99336') == (True, {'temp_f': 70.0})
+    assert len(hits) == 1
+
+
+def test_cache_expires_and_is_keyed_by_location(wu_stub, counter):
+    url, hits = wu_stub
+    client = WeatherClient(url, counter, 0)
+
+    client.get('WA/Richland')
+    client.get('wa/richland')
+    client.get('99336')
+    assert len(hits) == 3
+
+
+def test_request_limit(wu_stub, tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    url, hits = wu_stub
+    # One request per minute is held in reserve.
+    client = WeatherClient(url, RequestCounter(500, 3, 3600), 300)
+
+    assert client.get('1')[0]
+    assert client.get('2')[0]
+    assert client.get('3') == (False, REQUESTS_EXHAUSTED)
+    assert len(hits) == 2
+
+
+def test_daily_count_is_restored(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    counter = RequestCounter(2, 10, 3600)
+    assert counter.request_available()
+    assert counter.request_available()
+    assert not counter.request_available()
+
+    assert not RequestCounter(2, 10, 3600).request_available()
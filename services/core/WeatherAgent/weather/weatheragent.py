@@ -53,10 +53,20 @@
 
 # }}}
 import sys
+
+from gevent import monkey
+# Requests for different locations are made concurrently so they must not
+# block the hub.
+monkey.patch_socket()
+monkey.patch_ssl()
+
 import requests
 import datetime
 import logging
+import os
+import time
 from dateutil.parser import parse
+from gevent.event import AsyncResult
 
 from volttron.platform.agent.utils import jsonapi
 from volttron.platform.agent import utils
@@ -72,7 +82,7 @@ import settings
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '3.0'
+__version__ = '3.1'
 
 HEADER_NAME_DATE = headers_mod.DATE
 HEADER_NAME_CONTENT_TYPE = headers_mod.CONTENT_TYPE
@@ -112,20 +122,23 @@ categories = {'temperature': temperature, 'wind': wind,
 
 
 class RequestCounter:
+    """Limit requests made with a WU API key.
+
+    The per-minute limit is a token bucket that refills continuously at
+    minute_threshold tokens per minute, less a reserve of one. The daily
+    count is saved to .count so that it survives a restart.
+    """
     def __init__(self, daily_threshold, minute_threshold, poll_time):
-        dtime = datetime.datetime.now()
-        f = open('.count', 'w+')
-        line = f.readline()
-        if line:
-            saved_state = line.split(',')
-            text_date = saved_state[0]
-            saved_date = parse(text_date, fuzzy=True).date()
-            if saved_date == dtime.date() and saved_state[2] == settings.KEY:
-                self.daily = int(saved_state[1])
-        else:
-            self.daily = 0
         self.date = datetime.datetime.today().date()
-        self.per_minute_requests = []
+        self.daily = 0
+        if os.path.exists('.count'):
+            with open('.count', 'r') as f:
+                line = f.readline()
+            saved_state = line.split(',')
+            if len(saved_state) == 3:
+                saved_date = parse(saved_state[0], fuzzy=True).date()
+                if saved_date == self.date and saved_state[2] == settings.KEY:
+                    self.daily = int(saved_state[1])
         self.minute_reserve = 1
         self.daily_threshold = daily_threshold
         if poll_time < 180:
@@ -133,42 +146,102 @@ class RequestCounter:
                          'for free api plan limit is 500 queries per day. '
                          'poll_time should be greater than 3 minutes.')
         self.minute_threshold = minute_threshold - self.minute_reserve
+        self.tokens = float(self.minute_threshold)
+        self.last_refill = time.time()
 
     def request_available(self):
         '''
         Keep track of request on WU API key for saving state.
         '''
-        now = datetime.datetime.today()
-        if (now.date() - self.date).days < 1:
-            if self.daily >= self.daily_threshold:
-                False
-        else:
-            self.date = now.date()
+        today = datetime.datetime.today().date()
+        if today != self.date:
+            self.date = today
             self.daily = 0
-            f = open('.count', 'w+')
-            _count = ''.join([str(self.date), ',',
-                              str(self.daily), ',',
-                              settings.KEY])
-            f.write(_count)
-            f.close()
-        while (len(self.per_minute_requests) > 0 and
-                (now - self.per_minute_requests[-1]).seconds > 60):
-            self.per_minute_requests.pop()
-
-        if len(self.per_minute_requests) < self.minute_threshold:
-            self.per_minute_requests.insert(0, now)
-            self.daily += 1
-            f = open('.count', 'w+')
-            _count = ''.join([str(self.date), ',',
-                              str(self.daily), ',',
-                              settings.KEY])
-            f.write(_count)
-            f.close()
-        else:
+            self.save()
+        elif self.daily >= self.daily_threshold:
+            return False
+
+        now = time.time()
+        self.tokens = min(self.minute_threshold,
+                          self.tokens + (now - self.last_refill) *
+                          self.minute_threshold / 60.0)
+        self.last_refill = now
+        if self.tokens < 1:
             return False
 
+        self.tokens -= 1
+        self.daily += 1
+        self.save()
         return True
 
+    def save(self):
+        with open('.count', 'w') as f:
+            f.write(','.join([str(self.date), str(self.daily), settings.KEY]))
+
+
+class WeatherClient(object):
+    """Fetch current conditions from WU with a response cache.
+
+    Responses are cached for cache_ttl seconds by location. Requests for a
+    location that is already being fetched wait for that fetch and share
+    its result, so only one rate limited request is made.
+
+    :param base_url: URL up to and including "/conditions/q/"
+    :param request_counter: RequestCounter that limits upstream requests
+    :param cache_ttl: Seconds a response is reused for
+    """
+    def __init__(self, base_url, request_counter, cache_ttl):
+        self.base_url = base_url
+        self.request_counter = request_counter
+        self.cache_ttl = cache_ttl
+        self._session = requests.Session()
+        self._cache = {}
+        self._in_flight = {}
+
+    def get(self, location):
+        """Return (valid_data, observation) for a location.
+
+        :param location: Zip code or "region/city"
+        """
+        key = location.strip().lower()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.time():
+            return True, cached[1]
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            return pending.get()
+
+        pending = self._in_flight[key] = AsyncResult()
+        result = (False, None)
+        try:
+            result = self._fetch(location.strip())
+        finally:
+            del self._in_flight[key]
+            pending.set(result)
+
+        if result[0]:
+            now = time.time()
+            for expired in [k for k, (expires, _) in self._cache.iteritems()
+                            if expires <= now]:
+                del self._cache[expired]
+            self._cache[key] = (now + self.cache_ttl, result[1])
+        return result
+
+    def _fetch(self, location):
+        if not self.request_counter.request_available():
+            _log.warning("No requests available")
+            return (False, REQUESTS_EXHAUSTED)
+        try:
+            r = self._session.get(self.base_url + location + ".json",
+                                  timeout=30)
+            r.raise_for_status()
+            observation = r.json()['current_observation']
+            return (True, convert(observation))
+        except Exception as e:
+            _log.error(e)
+            return (False, None)
+
 
 def weather_service(config_path, **kwargs):
     config = utils.load_config(config_path)
@@ -184,6 +257,7 @@ def weather_service(config_path, **kwargs):
     zip_code = get_config("zip")
     key = get_config('key')
     on_request_only = get_config('on_request_only')
+    cache_ttl = config.get('cache_ttl', 300)
 
     state = ''
     country = ''
@@ -213,18 +287,21 @@ def weather_service(config_path, **kwargs):
                 (key if not key == '' else settings.KEY)
             self.baseUrl = base + "/conditions/q/"
 
-            self.requestUrl = self.baseUrl
+            self.client = WeatherClient(self.baseUrl, self.requestCounter,
+                                        cache_ttl)
+
             if(zip_code != ""):
-                self.requestUrl += zip_code + ".json"
-            elif self.region != "":
-                self.requestUrl += region + "/" + city + ".json"
+                self.location = zip_code
+            elif region != "":
+                self.location = region + "/" + city
             else:
                 # Error Need to handle this
                 print "No location selected"
+                self.location = None
             self.vip.pubsub.subscribe(peer='pubsub',
                                       prefix=topics.WEATHER_REQUEST,
                                       callback=self.handle_request)
-            if not on_request_only:
+            if not on_request_only and self.location is not None:
                 self.weather = self.core.periodic(poll_time,
                                                   self.weather_push,
                                                   wait=0)
@@ -280,8 +357,8 @@ def weather_service(config_path, **kwargs):
             '''
             Function called on periodic or request for weather information.
             '''
-            _log.debug("Requesting url: "+self.requestUrl)
-            (valid_data, observation) = self.request_data(self.requestUrl)
+            _log.debug("Requesting location: " + self.location)
+            (valid_data, observation) = self.client.get(self.location)
             if valid_data:
                 headers = {headers_mod.FROM: agent_id}
                 _log.debug('Headers: %s'.format(headers))
@@ -296,21 +373,19 @@ def weather_service(config_path, **kwargs):
             else:
                 msg = message
                 
-            request_url = self.baseUrl
-
             # Identify if a zipcode or region/city was sent
-            # Build request URL
             if 'zipcode' in msg:
-                request_url += msg['zipcode'] + '.json'
+                location = msg['zipcode']
             elif ('region' in msg) and ('city' in msg):
-                self.requestUrl += msg['region'] + "/" + msg['city'] + ".json"
+                location = msg['region'] + "/" + msg['city']
             else:
                 _log.error('Invalid request, no zipcode '
                            'or region/city in request')
                 # TODO: notify requester of error
+                return
 
-            # Request data
-            (valid_data, observation) = self.request_data(request_url)
+            # Request data, shared with any identical request in flight
+            (valid_data, observation) = self.client.get(location)
 
             # If data is valid, publish
             if valid_data:
@@ -330,25 +405,6 @@ def weather_service(config_path, **kwargs):
                     _log.error('Weather API response was invalid')
                     # TODO: send invalid data error back to requester
 
-        def request_data(self, requestUrl):
-            if self.requestCounter.request_available():
-                try:
-                    r = requests.get(self.requestUrl)
-                    r.raise_for_status()
-                    parsed_json = r.json()
-
-                    observation = parsed_json['current_observation']
-                    observation = convert(observation)
-                    valid_data = True
-                    return (valid_data, observation)
-                except Exception as e:
-                    _log.error(e)
-                    valid_data = False
-                    return (valid_data, None)
-            else:
-                _log.warning("No requests available")
-                return (False, REQUESTS_EXHAUSTED)
-
         def print_data(self):
             print "{0:*^40}".format(" ")
             for key in self.observation.keys():
@@ -285,7 +285,7 @@ def add_timing_data_to_header(headers, agent_id, phase):
     else:
         agent_timing_data = timing_data[agent_id]
 
-    agent_timing_data[phase] = utils.format_timestamp(utils.get_aware_utc_now())
+    agent_timing_data[phase] = utils.format_aware_utc_now()
 
     values = agent_timing_data.values()
 
@@ -293,10 +293,14 @@ def add_timing_data_to_header(headers, agent_id, phase):
         return 0.0
 
     #Assume 2 phases and proper format.
-    time1 = datetime.strptime(values[0][11:26], "%H:%M:%S.%f")
-    time2 = datetime.strptime(values[1][11:26], "%H:%M:%S.%f")
+    return abs(_seconds_of_day(values[0]) - _seconds_of_day(values[1]))
 
-    return abs((time1 - time2).total_seconds())
+
+def _seconds_of_day(time_stamp_str):
+    # Only the HH:MM:SS.mmmmmm part of a format_timestamp string is used.
+    return (int(time_stamp_str[11:13]) * 3600 +
+            int(time_stamp_str[14:16]) * 60 +
+            float(time_stamp_str[17:26]))
 
 class BaseHistorianAgent(Agent):
     """This is the base agent for historian Agents.
@@ -61,8 +61,10 @@ import argparse
 import calendar
 import errno
 import logging
+import struct
 import sys
 import syslog
+import threading
 import traceback
 from datetime import datetime, tzinfo, timedelta
 
@@ -73,6 +75,7 @@ import re
 import stat
 import time
 from volttron.platform import get_home, get_address
+from volttron.platform.vip import serialization
 from dateutil.parser import parse
 from dateutil.tz import tzutc, tzoffset
 from tzlocal import get_localzone
@@ -303,6 +306,128 @@ class JsonFormatter(logging.Formatter):
         return jsonapi.dumps(dct)
 
 
+# Batches of log records sent to the platform by BatchedLogHandler are
+# framed as the marker byte, the payload length and a list of log record
+# dictionaries encoded with msgpack, or JSON if msgpack is unavailable.
+# Only plain data is decoded, so a misbehaving agent cannot do more than
+# send a malformed batch.
+LOG_BATCH_MARKER = b'\x1e'
+LOG_BATCH_HEADER = struct.Struct('>I')
+
+_LOG_RECORD_FIELDS = ('name', 'levelno', 'levelname', 'pathname', 'filename',
+                      'module', 'lineno', 'funcName', 'created', 'msecs',
+                      'relativeCreated', 'thread', 'threadName', 'process',
+                      'processName')
+_LOG_VALUE_TYPES = (str, unicode, int, long, float, bool, type(None))
+
+
+def encode_log_batch(records):
+    """Frame a list of log record dictionaries for the platform."""
+    payload = (serialization.MSGPACK or serialization.JSON).dumps(records)
+    return LOG_BATCH_MARKER + LOG_BATCH_HEADER.pack(len(payload)) + payload
+
+
+def decode_log_batch(payload):
+    """Return the log record dictionaries in a batch payload.
+
+    Raises ValueError if the payload is not a list of dictionaries."""
+    try:
+        records = serialization.detect(payload).loads(payload)
+    except Exception as e:
+        raise ValueError('invalid log batch: {}'.format(e))
+    if (not isinstance(records, list) or
+            not all(isinstance(record, dict) for record in records)):
+        raise ValueError('log batch is not a list of records')
+    return records
+
+
+class BatchedLogHandler(logging.Handler):
+    """Sends log records to the platform in binary batches.
+
+    Records are buffered and written together when interval seconds
+    have passed since the first buffered record, when capacity records
+    are buffered or when a record at flush_level or above is logged.
+    Unlike JsonFormatter only the standard record attributes are sent
+    and the message is formatted by the agent.
+    """
+
+    def __init__(self, stream=None, interval=0.5, capacity=500,
+                 flush_level=logging.WARNING):
+        logging.Handler.__init__(self)
+        self.stream = sys.stderr if stream is None else stream
+        self.interval = interval
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self.buffer = []
+        self._timer = None
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.record_dict(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if (record.levelno >= self.flush_level or
+                len(self.buffer) >= self.capacity):
+            self.flush()
+        elif self._timer is None:
+            if isinstance(threading.current_thread(), threading._MainThread):
+                self._timer = gevent.spawn_later(self.interval,
+                                                 self._timed_flush)
+            else:
+                # Greenlets spawned here would never run.
+                self.flush()
+
+    @staticmethod
+    def record_dict(record):
+        dct = {}
+        for field in _LOG_RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if type(value) not in _LOG_VALUE_TYPES:
+                value = str(value)
+            dct[field] = value
+        message = record.getMessage()
+        if type(message) not in (str, unicode):
+            message = unicode(message)
+        dct['msg'] = message
+        dct['args'] = ()
+        dct['exc_info'] = None
+        dct['exc_text'] = None
+        if record.exc_info:
+            dct['exc_text'] = ''.join(
+                traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            dct['exc_text'] = record.exc_text
+        return dct
+
+    def _timed_flush(self):
+        self._timer = None
+        self.acquire()
+        try:
+            self.flush()
+        finally:
+            self.release()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        records, self.buffer = self.buffer, []
+        try:
+            self.stream.write(encode_log_batch(records))
+            self.stream.flush()
+        except Exception:
+            # Records are lost if the platform closed the pipe.
+            pass
+
+    def close(self):
+        self.acquire()
+        try:
+            self.flush()
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+
 class AgentFormatter(logging.Formatter):
     def __init__(self, fmt=None, datefmt=None):
         if fmt is None:
@@ -332,10 +457,19 @@ class AgentFormatter(logging.Formatter):
 def setup_logging(level=logging.DEBUG):
     root = logging.getLogger()
     if not root.handlers:
-        handler = logging.StreamHandler()
         if isapipe(sys.stderr) and '_LAUNCHED_BY_PLATFORM' in os.environ:
-            handler.setFormatter(JsonFormatter())
+            if os.environ.get('AGENT_LOG_FORMAT') == 'binary':
+                handler = BatchedLogHandler()
+            else:
+                handler = logging.StreamHandler()
+                handler.setFormatter(JsonFormatter())
+            # Records the platform would discard are not created at all.
+            try:
+                level = max(level, int(os.environ['AGENT_LOG_LEVEL']))
+            except (KeyError, ValueError):
+                pass
         else:
+            handler = logging.StreamHandler()
             fmt = '%(asctime)s %(name)s %(levelname)s: %(message)s'
             handler.setFormatter(logging.Formatter(fmt))
 
@@ -356,11 +490,15 @@ def format_timestamp(time_stamp):
     :rtype: str
     """
 
-    time_str = time_stamp.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    time_str = '%04d-%02d-%02dT%02d:%02d:%02d.%06d' % (
+        time_stamp.year, time_stamp.month, time_stamp.day, time_stamp.hour,
+        time_stamp.minute, time_stamp.second, time_stamp.microsecond)
 
     if time_stamp.tzinfo is not None:
-        sign = '+'
         td = time_stamp.tzinfo.utcoffset(time_stamp)
+        if not td:
+            return time_str + '+00:00'
+        sign = '+'
         if td.days < 0:
             sign = '-'
             td = -td
@@ -368,52 +506,81 @@ def format_timestamp(time_stamp):
         seconds = td.seconds
         minutes, seconds = divmod(seconds, 60)
         hours, minutes = divmod(minutes, 60)
-        time_str += "{sign}{HH:02}:{MM:02}".format(sign=sign,
-                                                   HH=hours,
-                                                   MM=minutes)
+        time_str += '%s%02d:%02d' % (sign, hours, minutes)
 
     return time_str
 
 
+_utc_now_cache = [None, None]
+
+
+def format_aware_utc_now():
+    """Return the current UTC time formatted by
+    :py:func:`format_timestamp`.
+
+    Equivalent to ``format_timestamp(get_aware_utc_now())``. The date and
+    time up to the second is only formatted once per second.
+
+    :returns: current UTC time in string format
+    :rtype: str
+    """
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _utc_now_cache
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _utc_now_cache[:] = second, prefix
+    return '%s.%06d+00:00' % (prefix, int((now - second) * 1000000))
+
+
+_TIMESTAMP_RE = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?'
+    r'(Z|[+-]\d\d(?::?\d\d)?)?$')
+_timezones = {None: None, 'Z': pytz.UTC, '+00:00': pytz.UTC}
+
+
+def _parse_timezone(time_zone_str):
+    seconds_offset = int(time_zone_str[1:3]) * 3600
+    if len(time_zone_str) > 3:
+        seconds_offset += int(time_zone_str[-2:]) * 60
+    if time_zone_str[0] == '-':
+        seconds_offset = -seconds_offset
+    if not seconds_offset:
+        return pytz.UTC
+    return tzoffset("", seconds_offset)
+
+
 def parse_timestamp_string(time_stamp_str):
     """
     Create a datetime object from the supplied date/time string.
-    Uses dateutil.parse with no extra parameters.
 
-    For performance reasons we try
-    YYYY-MM-DDTHH:MM:SS.mmmmmm
-    or
-    YYYY-MM-DDTHH:MM:SS.mmmmmm+HH:MM
-    based on the string length before falling back to dateutil.parse.
+    ISO 8601 strings with a T or space separator, optional fractional
+    seconds and an optional Z or +HH:MM style offset, which covers every
+    format the platform produces, are parsed directly. Anything else
+    falls back to dateutil.parse with no extra parameters.
+
+    Strings without an offset give naive datetimes. A Z or zero offset
+    gives pytz.UTC and other offsets a dateutil tzoffset.
 
     @param time_stamp_str:
     @return: value to convert
     """
 
-    if len(time_stamp_str) == 26:
+    match = _TIMESTAMP_RE.match(time_stamp_str)
+    if match is not None:
+        (year, month, day, hour, minute, second, fraction,
+         time_zone_str) = match.groups()
         try:
-            return datetime.strptime(time_stamp_str, "%Y-%m-%dT%H:%M:%S.%f")
-        except ValueError:
-            pass
-
-    elif len(time_stamp_str) == 32:
+            tz = _timezones[time_zone_str]
+        except KeyError:
+            tz = _timezones[time_zone_str] = _parse_timezone(time_zone_str)
+        if fraction is None:
+            microsecond = 0
+        else:
+            microsecond = int(fraction) * 10 ** (6 - len(fraction))
         try:
-            base_time_stamp_str = time_stamp_str[:26]
-            time_zone_str = time_stamp_str[26:]
-            time_stamp = datetime.strptime(base_time_stamp_str, "%Y-%m-%dT%H:%M:%S.%f")
-            #Handle most common case.
-            if time_zone_str == "+00:00":
-                return time_stamp.replace(tzinfo=pytz.UTC)
-
-            hours_offset = int(time_zone_str[1:3])
-            minutes_offset = int(time_zone_str[4:6])
-
-            seconds_offset = hours_offset * 3600 + minutes_offset * 60
-            if time_zone_str[0] == "-":
-                seconds_offset = -seconds_offset
-
-            return time_stamp.replace(tzinfo=tzoffset("", seconds_offset))
-
+            return datetime(int(year), int(month), int(day), int(hour),
+                            int(minute), int(second), microsecond, tz)
         except ValueError:
             pass
 
@@ -61,15 +61,18 @@
 
 import contextlib
 import errno
+import itertools
 import logging
 import os
 import shutil
 import signal
 import sys
+import time
 import uuid
 
 import gevent
 import gevent.event
+import gevent.pool
 from gevent.fileobject import FileObject
 from gevent import subprocess
 from gevent.subprocess import PIPE
@@ -83,7 +86,9 @@ except ImportError:
     import json as jsonapi
 
 from . import messaging
-from .agent.utils import is_valid_identity
+from .forkserver import ForkServer
+from .agent.utils import (is_valid_identity, LOG_BATCH_MARKER,
+                          LOG_BATCH_HEADER, decode_log_batch)
 from .messaging import topics
 from .packages import UnpackedPackage
 from .vip.agent import Agent
@@ -123,10 +128,45 @@ _level_map = {7: logging.DEBUG,      # LOG_DEBUG
               0: logging.CRITICAL,}  # LOG_EMERG
 
 
-def log_entries(name, agent, pid, level, stream):
-    log = logging.getLogger(name)
-    extra = {'processName': agent, 'process': pid}
-    for line in (l.rstrip('\r\n') for l in stream):
+def _read_exact(stream, size):
+    data = stream.read(size)
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def log_records(stream):
+    '''Read log output of an agent.
+
+    Yields (record, line) tuples. record is the dictionary of a log
+    record sent as a JSON line or in a batch written by the agent's
+    BatchedLogHandler, otherwise it is None and line is the text.
+    '''
+    while True:
+        first = stream.read(1)
+        if not first:
+            return
+        if first == LOG_BATCH_MARKER:
+            header = _read_exact(stream, LOG_BATCH_HEADER.size)
+            if len(header) < LOG_BATCH_HEADER.size:
+                return
+            (length,) = LOG_BATCH_HEADER.unpack(header)
+            payload = _read_exact(stream, length)
+            if len(payload) < length:
+                return
+            try:
+                records = decode_log_batch(payload)
+            except ValueError:
+                _log.error('discarding malformed log batch')
+                continue
+            for obj in records:
+                yield obj, None
+            continue
+        line = (first + stream.readline()).rstrip('\r\n')
+        obj = None
         if line[0:1] == '{' and line[-1:] == '}':
             try:
                 obj = jsonapi.loads(line)
@@ -134,7 +174,23 @@ def log_entries(name, agent, pid, level, stream):
                     obj['args'] = tuple(obj['args'])
                 except (KeyError, TypeError, ValueError):
                     pass
-                record = logging.makeLogRecord(obj)
+            except Exception:
+                obj = None
+        yield obj, line
+
+
+def log_entries(name, agent, pid, level, stream):
+    log = logging.getLogger(name)
+    extra = {'processName': agent, 'process': pid}
+    for obj, line in log_records(stream):
+        if obj is not None:
+            try:
+                if line is None:
+                    # Batched records carry every LogRecord attribute.
+                    record = logging.LogRecord.__new__(logging.LogRecord)
+                    record.__dict__.update(obj)
+                else:
+                    record = logging.makeLogRecord(obj)
             except Exception:
                 pass
             else:
@@ -148,12 +204,28 @@ def log_entries(name, agent, pid, level, stream):
                 record.__dict__.update(extra)
                 log.handle(record)
                 continue
+            if line is None:
+                continue
         if line[0:1] == '<' and line[2:3] == '>' and line[1:2].isdigit():
             yield _level_map.get(int(line[1]), level), line[3:]
         else:
             yield level, line
 
 
+def agent_log_level(name='agents.log'):
+    '''Return the lowest level of agent log records the platform keeps.
+
+    Agents are started with this level so they do not send records
+    that log_entries would discard.
+    '''
+    manager = logging.getLogger(name).manager
+    level = logging.getLogger(name).getEffectiveLevel()
+    for logger in manager.loggerDict.values():
+        if isinstance(logger, logging.Logger) and logger.level:
+            level = min(level, logger.level)
+    return level
+
+
 def log_stream(name, agent, pid, path, stream):
     log = logging.getLogger(name)
     extra = {'processName': agent, 'process': pid}
@@ -208,18 +280,82 @@ class ExecutionEnvironment(object):
         self.execute(*args, **kwargs)
 
 
+class ForkServerExecutionEnvironment(ExecutionEnvironment):
+    '''Environment for an agent forked by the AIP's forkserver.'''
+
+    def __init__(self, forkserver):
+        super(ForkServerExecutionEnvironment, self).__init__()
+        self.forkserver = forkserver
+
+    def execute(self, argv, cwd=None, env=None, **kwargs):
+        self.env = env
+        self.process = self.forkserver.spawn(argv, cwd, env)
+
+
+class PeerWatcher(object):
+    '''Tracks the peers connected to the router.
+
+    Used by autostart to wait for an agent's hello to reach the router
+    before starting the next priority tier.
+    '''
+    def __init__(self, address):
+        self.agent = Agent(identity='aip.autostart', address=address,
+                           enable_store=False)
+        self.peers = set()
+        self._events = {}
+        self._task = None
+
+    def start(self):
+        self.agent.vip.peerlist.onadd.connect(self._peer_added, self)
+        self.agent.vip.peerlist.ondrop.connect(self._peer_dropped, self)
+        event = gevent.event.Event()
+        self._task = gevent.spawn(self.agent.core.run, event)
+        event.wait()
+        self.peers.update(self.agent.vip.peerlist().get(timeout=10))
+
+    def stop(self):
+        self.agent.core.stop()
+        self._task.kill()
+
+    def _peer_added(self, sender, peer, **kwargs):
+        self.peers.add(peer)
+        event = self._events.get(peer)
+        if event is not None:
+            event.set()
+
+    def _peer_dropped(self, sender, peer, **kwargs):
+        self.peers.discard(peer)
+        event = self._events.get(peer)
+        if event is not None:
+            event.clear()
+
+    def wait(self, identity, timeout=None):
+        '''Wait for identity to connect; return True if it did.'''
+        event = self._events.setdefault(identity, gevent.event.Event())
+        if identity in self.peers:
+            return True
+        return event.wait(timeout)
+
+
 class AIPplatform(object):
     '''Manages the main workflow of receiving and sending agents.'''
 
     def __init__(self, env, **kwargs):
         self.env = env
         self.agents = {}
+        self.forkserver = None
+        # Seconds taken by autostart to start each agent as
+        # (started, ready); ready is None when readiness is not awaited.
+        self.start_latencies = {}
 
     def setup(self):
         '''Creates paths for used directories for the instance.'''
         for path in [self.run_dir, self.config_dir, self.install_dir]:
             if not os.path.exists(path):
                 os.makedirs(path, 0o755)
+        if getattr(self.env, 'agent_forkserver', False):
+            self.forkserver = ForkServer()
+            self.forkserver.start()
 
     def finish(self):
         for exeenv in self.agents.itervalues():
@@ -231,6 +367,8 @@ class AIPplatform(object):
         for exeenv in self.agents.itervalues():
             if exeenv.process.poll() is None:
                 exeenv.process.kill()
+        if self.forkserver is not None:
+            self.forkserver.stop()
 
     def shutdown(self):
         for agent_uuid in self.agents.iterkeys():
@@ -265,13 +403,43 @@ class AIPplatform(object):
             if priority is not None:
                 agents.append((priority, agent_uuid))
         agents.sort(reverse=True)
-        for _, agent_uuid in agents:
-            try:
-                self.start_agent(agent_uuid)
-            except Exception as exc:
-                errors.append((agent_uuid, str(exc)))
+        watcher = None
+        if getattr(self.env, 'autostart_wait_ready', False):
+            watcher = PeerWatcher('inproc://vip')
+            watcher.start()
+        try:
+            # Agents sharing a priority are started together and the
+            # next tier waits for the whole tier to start.
+            for priority, tier in itertools.groupby(agents, lambda a: a[0]):
+                errors.extend(self._autostart_tier(
+                    [agent_uuid for _, agent_uuid in tier], watcher))
+        finally:
+            if watcher is not None:
+                watcher.stop()
         return errors
 
+    def _autostart_tier(self, agent_uuids, watcher=None):
+        pool = gevent.pool.Pool(getattr(self.env, 'autostart_concurrency', 1))
+        tasks = [pool.spawn(self._autostart_agent, agent_uuid, watcher)
+                 for agent_uuid in agent_uuids]
+        gevent.joinall(tasks)
+        return [(agent_uuid, str(task.exception))
+                for agent_uuid, task in zip(agent_uuids, tasks)
+                if task.exception is not None]
+
+    def _autostart_agent(self, agent_uuid, watcher=None):
+        begin = time.time()
+        self.start_agent(agent_uuid)
+        started = time.time() - begin
+        self.start_latencies[agent_uuid] = (started, None)
+        if watcher is None:
+            return
+        timeout = getattr(self.env, 'autostart_ready_timeout', 30)
+        if not watcher.wait(self.agent_identity(agent_uuid), timeout):
+            raise RuntimeError('agent did not connect to the platform '
+                               'within {} seconds'.format(timeout))
+        self.start_latencies[agent_uuid] = (started, time.time() - begin)
+
     def land_agent(self, agent_wheel):
         if auth is None:
             raise NotImplementedError()
@@ -472,6 +640,7 @@ class AIPplatform(object):
                         remove.append(agent_uuid)
         for agent_uuid in remove:
             self.agents.pop(agent_uuid, None)
+            self.start_latencies.pop(agent_uuid, None)
 
     def status_agents(self):
         return [(agent_uuid, agent_name, self.agent_status(agent_uuid))
@@ -654,6 +823,11 @@ class AIPplatform(object):
         environ['AGENT_PUB_ADDR'] = self.publish_address
         environ['AGENT_UUID'] = agent_uuid
         environ['_LAUNCHED_BY_PLATFORM'] = '1'
+        environ['AGENT_LOG_LEVEL'] = str(agent_log_level())
+        if getattr(self.env, 'agent_log_format', 'json') == 'binary':
+            environ['AGENT_LOG_FORMAT'] = 'binary'
+        else:
+            environ.pop('AGENT_LOG_FORMAT', None)
 
         #For backwards compatibility create the identity file if it does not exist.
         identity_file = os.path.join(self.install_dir, agent_uuid, "IDENTITY")
@@ -674,7 +848,9 @@ class AIPplatform(object):
         else:
             argv = [sys.executable, '-m', module]
         resmon = getattr(self.env, 'resmon', None)
-        if resmon is None:
+        if resmon is None and self.forkserver is not None:
+            execenv = ForkServerExecutionEnvironment(self.forkserver)
+        elif resmon is None:
             execenv = ExecutionEnvironment()
         else:
             execreqs = self._read_execreqs(pkg.distinfo)
@@ -684,7 +860,8 @@ class AIPplatform(object):
 
         data_dir = self._get_data_dir(agent_path)
         execenv.execute(argv, cwd=data_dir, env=environ, close_fds=True,
-                        stdin=open(os.devnull), stdout=PIPE, stderr=PIPE)
+                        bufsize=-1, stdin=open(os.devnull), stdout=PIPE,
+                        stderr=PIPE)
         self.agents[agent_uuid] = execenv
         proc = execenv.process
         _log.info('agent %s has PID %s', agent_path, proc.pid)
@@ -118,6 +118,9 @@ class AuthService(Agent):
         self.zap_socket = None
         self._zap_greenlet = None
         self.auth_entries = []
+        self._credentials_index = {}
+        self._user_id_index = {}
+        self._regex_entries = []
         self._is_connected = False
 
     @Core.receiver('onsetup')
@@ -135,6 +138,7 @@ class AuthService(Agent):
         entries = [entry for entry in entries if entry.enabled]
         # sort the entries so the regex credentails follow the concrete creds
         entries.sort()
+        self._index_entries(entries)
         self.auth_entries = entries
         _log.info('auth file %s loaded', self.auth_file_path)
         if self._is_connected:
@@ -221,11 +225,58 @@ class AuthService(Agent):
                     pass
             timeout = (wait_list[0][0] - now) if wait_list else None
 
-    def authenticate(self, domain, address, mechanism, credentials):
-        for entry in self.auth_entries:
+    def _index_entries(self, entries):
+        """Index entries by mechanism and credentials and by user_id.
+
+        Entries with regular expression credentials cannot be indexed and
+        are kept in a separate list. Each entry is stored with its position
+        so lookups return the same entry as a scan of the whole list.
+        """
+        credentials_index = {}
+        user_id_index = {}
+        regex_entries = []
+        for position, entry in enumerate(entries):
+            user_id_index.setdefault(entry.user_id, (position, entry))
+            if entry.mechanism == 'NULL':
+                keys = [None]
+            elif isinstance(entry.credentials, List):
+                keys = entry.credentials
+            else:
+                keys = [entry.credentials]
+            if any(hasattr(key, 'regex') for key in keys):
+                regex_entries.append((position, entry))
+                continue
+            for key in set(keys):
+                credentials_index.setdefault(
+                    (entry.mechanism, key), []).append((position, entry))
+        self._credentials_index = credentials_index
+        self._user_id_index = user_id_index
+        self._regex_entries = regex_entries
+
+    def _find_entry(self, domain, address, mechanism, credentials):
+        """Return (position, entry) of the first matching entry or None."""
+        if mechanism == 'NULL' or not credentials:
+            key = None
+        else:
+            key = credentials[0]
+        found = None
+        for position, entry in self._credentials_index.get((mechanism, key), ()):
             if entry.match(domain, address, mechanism, credentials):
-                return entry.user_id or dump_user(
-                    domain, address, mechanism, *credentials[:1])
+                found = position, entry
+                break
+        for position, entry in self._regex_entries:
+            if found is not None and position > found[0]:
+                break
+            if entry.match(domain, address, mechanism, credentials):
+                return position, entry
+        return found
+
+    def authenticate(self, domain, address, mechanism, credentials):
+        found = self._find_entry(domain, address, mechanism, credentials)
+        if found is not None:
+            entry = found[1]
+            return entry.user_id or dump_user(
+                domain, address, mechanism, *credentials[:1])
         if mechanism == 'NULL' and address.startswith('localhost:'):
             parts = address.split(':')[1:]
             if len(parts) > 2:
@@ -264,17 +315,22 @@ class AuthService(Agent):
         :returns: tuple of capabiliy-list, group-list, role-list
         :rtype: tuple
         """
-        use_parts = True
+        by_user_id = self._user_id_index.get(user_id)
+        by_parts = None
         try:
             domain, address, mechanism, credentials = load_user(user_id)
         except ValueError:
-            use_parts = False
-        for entry in self.auth_entries:
-            if entry.user_id == user_id:
-                return [entry.capabilities, entry.groups, entry.roles]
-            elif use_parts:
-                if entry.match(domain, address, mechanism, [credentials]):
-                    return entry.capabilities, entry.groups, entry.roles
+            pass
+        else:
+            by_parts = self._find_entry(domain, address, mechanism,
+                                        [credentials])
+        if by_user_id is not None and (by_parts is None or
+                                       by_user_id[0] <= by_parts[0]):
+            entry = by_user_id[1]
+            return [entry.capabilities, entry.groups, entry.roles]
+        if by_parts is not None:
+            entry = by_parts[1]
+            return entry.capabilities, entry.groups, entry.roles
 
     def _get_authorizations(self, user_id, index):
         """Convenience method for getting authorization component by index"""
@@ -131,6 +131,11 @@ class ControlService(BaseAgent):
         del q
         return pk
 
+    @RPC.export
+    def platform_pid(self):
+        """Return the process id of the platform."""
+        return os.getpid()
+
     @RPC.export
     def clear_status(self, clear_all=False):
         self._aip.clear_status(clear_all)
@@ -170,6 +175,10 @@ class ControlService(BaseAgent):
     def status_agents(self):
         return self._aip.status_agents()
 
+    @RPC.export
+    def agent_start_latencies(self):
+        return self._aip.start_latencies
+
     @RPC.export
     def start_agent(self, uuid):
         if not isinstance(uuid, basestring):
@@ -674,6 +683,7 @@ def status_agents(opts):
             agents[uuid] = agent = Agent(name, None, uuid)
         status[uuid] = stat
     agents = agents.values()
+    latencies = opts.connection.call('agent_start_latencies')
 
     def get_status(agent):
         try:
@@ -684,7 +694,13 @@ def status_agents(opts):
         if stat is not None:
             return str(stat)
         if pid:
-            return 'running [{}]'.format(pid)
+            try:
+                started, ready = latencies[agent.uuid]
+            except KeyError:
+                return 'running [{}]'.format(pid)
+            if ready is None:
+                return 'running [{}] started in {:.2f}s'.format(pid, started)
+            return 'running [{}] ready in {:.2f}s'.format(pid, ready)
         return ''
 
     _show_filtered_agents(opts, 'STATUS', get_status, agents)
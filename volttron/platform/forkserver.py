@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+
+"""Pre-warmed launcher for agent processes.
+
+Instead of starting a new interpreter for every agent, the AIP may start
+a single forkserver process. The forkserver imports the modules every
+agent needs once and then forks a child for each agent. The children
+skip those imports and share the memory holding the imported modules.
+
+Requests are length prefixed JSON records sent over the AF_UNIX socket
+passed to the forkserver as stdin. Each spawn request is followed by the
+agent's stdin, stdout and stderr file descriptors. The forkserver replies
+with the pid of the new agent and reports the exit status of each agent
+when it is reaped.
+"""
+
+
+import atexit
+import errno
+import fcntl
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+from _multiprocessing import sendfd, recvfd
+from zmq.utils import jsonapi
+
+
+_log = logging.getLogger(__name__)
+
+# Imported by the forkserver before any agent is forked.
+PRELOAD_MODULES = ('gevent',
+                   'gevent.event',
+                   'gevent.subprocess',
+                   'zmq',
+                   'zmq.green',
+                   'volttron.platform.agent.utils',
+                   'volttron.platform.vip.agent',
+                   'volttron.platform.vip.agent.subsystems',
+                   'volttron.platform.messaging.headers',
+                   'volttron.platform.messaging.topics',
+                   'volttron.platform.jsonrpc')
+
+_HEADER = struct.Struct('>I')
+
+_SERVER_CODE = 'from volttron.platform.forkserver import serve; serve()'
+
+
+def _write_message(fd, message):
+    data = jsonapi.dumps(message)
+    data = _HEADER.pack(len(data)) + data
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _read_exact(fd, size, wait=None):
+    chunks = []
+    while size:
+        if wait is not None:
+            wait(fd)
+        chunk = os.read(fd, size)
+        if not chunk:
+            raise EOFError('forkserver connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def _read_message(fd, wait=None):
+    (length,) = _HEADER.unpack(_read_exact(fd, _HEADER.size, wait))
+    return jsonapi.loads(_read_exact(fd, length, wait))
+
+
+def _returncode(status):
+    """Convert a wait status to a subprocess.Popen style returncode."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+#
+# Forkserver process
+#
+
+def _run_agent(request):
+    env = request['env']
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(env)
+
+    # Build the module search path a new interpreter would get
+    # from PYTHONPATH.
+    pythonpath = [path for path in env.get('PYTHONPATH', '').split(os.pathsep) if path]
+    sys.path[:] = pythonpath + [path for path in sys.path if path not in pythonpath]
+
+    random.seed()
+
+    argv = request['argv']
+    if argv[1] == '-m':
+        import runpy
+        sys.argv = argv[2:]
+        runpy.run_module(argv[2], run_name='__main__', alter_sys=True)
+    elif argv[1] == '-c':
+        import imp
+        sys.argv = ['-c'] + argv[3:]
+        main = imp.new_module('__main__')
+        sys.modules['__main__'] = main
+        exec compile(argv[2], '<string>', 'exec') in main.__dict__
+    else:
+        raise ValueError('unsupported agent command line: {}'.format(argv))
+
+
+def _spawn(request, fds):
+    pid = os.fork()
+    if pid:
+        return pid
+
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        os.closerange(3, os.sysconf('SC_OPEN_MAX'))
+        _run_agent(request)
+        code = 0
+    except SystemExit as exc:
+        if exc.code is None:
+            code = 0
+        elif isinstance(exc.code, int):
+            code = exc.code
+        else:
+            sys.stderr.write('{}\n'.format(exc.code))
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            # Run exit handlers, such as flushing buffered log records,
+            # as an interpreter exiting normally would.
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _reap(control_fd):
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except OSError as e:
+            if e.errno == errno.ECHILD:
+                return
+            raise
+        if not pid:
+            return
+        _write_message(control_fd, {'exit': pid, 'returncode': _returncode(status)})
+
+
+def serve(control_fd=0):
+    """Run the forkserver until the AIP closes the control socket."""
+    # The platform stops agents itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    # Wake up select when a child exits.
+    wakeup_read, wakeup_write = os.pipe()
+    for fd in (wakeup_read, wakeup_write):
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    while True:
+        try:
+            readable = select.select([control_fd, wakeup_read], [], [], 1.0)[0]
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            readable = []
+
+        if wakeup_read in readable:
+            try:
+                os.read(wakeup_read, 4096)
+            except OSError:
+                pass
+
+        _reap(control_fd)
+
+        if control_fd not in readable:
+            continue
+
+        try:
+            request = _read_message(control_fd)
+        except EOFError:
+            return
+        fds = [recvfd(control_fd) for _ in xrange(3)]
+        try:
+            pid = _spawn(request, fds)
+        except Exception as e:
+            _write_message(control_fd, {'error': str(e)})
+        else:
+            _write_message(control_fd, {'pid': pid})
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+
+#
+# AIP side
+#
+
+class ForkedProcess(object):
+    """Stands in for the subprocess.Popen object of an agent started by
+    the forkserver."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self.orphaned = False
+        self.stdout = None
+        self.stderr = None
+
+    def poll(self):
+        if self.returncode is None and self.orphaned:
+            # The forkserver is gone and can no longer report the exit
+            # status so check if the process still exists.
+            try:
+                os.kill(self.pid, 0)
+            except OSError as e:
+                if e.errno == errno.ESRCH:
+                    self.returncode = -signal.SIGKILL
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """Wait for the process to exit and return its returncode.
+
+        As with gevent's Popen.wait() on Python 2, returns None if
+        timeout seconds pass before the process exits."""
+        import gevent
+        if timeout is not None:
+            with gevent.Timeout(timeout, False):
+                return self.wait()
+            return self.returncode
+        while self.poll() is None:
+            gevent.sleep(0.1)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except OSError as e:
+                if e.errno != errno.ESRCH:
+                    raise
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class ForkServer(object):
+    """Starts and talks to the forkserver process for the AIP."""
+
+    def __init__(self):
+        self.process = None
+        self._socket = None
+        self._processes = {}
+        self._replies = None
+        self._lock = None
+        self._reader = None
+
+    def start(self):
+        import gevent
+        from gevent import subprocess
+        from gevent.lock import Semaphore
+        from gevent.queue import Queue
+
+        self._socket, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # Not started with -m because agents replace __main__ in the
+            # children, which would tear down this module's globals.
+            # Modules imported by the forkserver keep their paths after
+            # agents change directory, so import them by absolute path.
+            env = os.environ.copy()
+            env['PYTHONPATH'] = os.pathsep.join(os.path.abspath(path) for path in sys.path)
+            self.process = subprocess.Popen([sys.executable, '-c', _SERVER_CODE],
+                                            cwd='/', env=env, stdin=child.fileno(),
+                                            close_fds=True)
+        finally:
+            child.close()
+        self._replies = Queue()
+        self._lock = Semaphore()
+        self._reader = gevent.spawn(self._read_loop)
+        _log.info('agent forkserver started with PID %s', self.process.pid)
+
+    def stop(self):
+        # Stop reading before the socket is closed and its descriptor reused.
+        if self._reader is not None:
+            self._reader.kill()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def _read_loop(self):
+        from gevent.socket import wait_read
+        fd = self._socket.fileno()
+        try:
+            while True:
+                message = _read_message(fd, wait_read)
+                if 'exit' in message:
+                    process = self._processes.pop(message['exit'], None)
+                    if process is not None:
+                        process.returncode = message['returncode']
+                    continue
+                if 'pid' in message:
+                    # Register before handing back so an early exit is not missed.
+                    process = ForkedProcess(message['pid'])
+                    self._processes[process.pid] = process
+                    message = process
+                self._replies.put(message)
+        except (EOFError, socket.error, OSError, ValueError) as e:
+            _log.error('lost connection to agent forkserver: %s', e)
+        finally:
+            for process in self._processes.itervalues():
+                process.orphaned = True
+            self._processes.clear()
+            self._replies.put({'error': 'forkserver is not running'})
+
+    def spawn(self, argv, cwd, env):
+        """Fork an agent and return a :py:class:`ForkedProcess` for it."""
+        from gevent.fileobject import FileObject
+
+        if self._socket is None or self._reader.dead:
+            raise OSError(errno.ECHILD, 'forkserver is not running')
+
+        with self._lock:
+            stdin = os.open(os.devnull, os.O_RDONLY)
+            stdout_read, stdout_write = os.pipe()
+            stderr_read, stderr_write = os.pipe()
+            try:
+                _write_message(self._socket.fileno(), {'argv': list(argv), 'cwd': cwd, 'env': dict(env)})
+                for fd in (stdin, stdout_write, stderr_write):
+                    sendfd(self._socket.fileno(), fd)
+                reply = self._replies.get()
+            except:
+                os.close(stdout_read)
+                os.close(stderr_read)
+                raise
+            finally:
+                for fd in (stdin, stdout_write, stderr_write):
+                    os.close(fd)
+
+        if not isinstance(reply, ForkedProcess):
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise OSError(errno.ECHILD, reply.get('error', 'forkserver error'))
+
+        reply.stdout = FileObject(stdout_read, 'rb')
+        reply.stderr = FileObject(stderr_read, 'rb')
+        return reply
+
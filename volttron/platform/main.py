@@ -73,7 +73,6 @@ import threading
 import uuid
 
 import gevent
-from gevent.fileobject import FileObject
 import zmq
 from zmq import green
 # Create a context common to the green and non-green zmq modules.
@@ -84,8 +83,8 @@ from . import aip
 from . import __version__
 from . import config
 from . import vip
-from .vip.agent import Agent, Core
 from .vip.agent.compat import CompatPubSub
+from .vip.pubsubservice import PubSubService, POLICIES
 from .vip.router import *
 from .vip.socket import decode_key, encode_key, Address
 from .vip.tracking import Tracker
@@ -95,7 +94,6 @@ from .web import MasterWebService
 from .store import ConfigStoreService
 from .agent import utils
 from .agent.known_identities import MASTER_WEB, CONFIGURATION_STORE, AUTH
-from .vip.agent.subsystems.pubsub import ProtectedPubSubTopics
 from .keystore import KeyStore, KnownHostsStore
 from ..utils.persistance import load_create_store
 
@@ -379,44 +377,6 @@ class Router(BaseRouter):
             return frames
 
 
-class PubSubService(Agent):
-    def __init__(self, protected_topics_file, *args, **kwargs):
-        super(PubSubService, self).__init__(*args, **kwargs)
-        self._protected_topics_file = os.path.abspath(protected_topics_file)
-
-    @Core.receiver('onstart')
-    def setup_agent(self, sender, **kwargs):
-        self._read_protected_topics_file()
-        self.core.spawn(utils.watch_file, self._protected_topics_file,
-                        self._read_protected_topics_file)
-        self.vip.pubsub.add_bus('')
-
-    def _read_protected_topics_file(self):
-        _log.info('loading protected-topics file %s',
-                  self._protected_topics_file)
-        try:
-            utils.create_file_if_missing(self._protected_topics_file)
-            with open(self._protected_topics_file) as fil:
-                # Use gevent FileObject to avoid blocking the thread
-                data = FileObject(fil, close=False).read()
-                topics_data = jsonapi.loads(data) if data else {}
-        except Exception:
-            _log.exception('error loading %s', self._protected_topics_file)
-        else:
-            write_protect = topics_data.get('write-protect', [])
-            topics = ProtectedPubSubTopics()
-            try:
-                for entry in write_protect:
-                    topics.add(entry['topic'], entry['capabilities'])
-            except KeyError:
-                _log.exception('invalid format for protected topics '
-                               'file {}'.format(self._protected_topics_file))
-            else:
-                self.vip.pubsub.protected_topics = topics
-                _log.info('protected-topics file %s loaded',
-                          self._protected_topics_file)
-
-
 def start_volttron_process(opts):
     '''Start the main volttron process.
 
@@ -616,9 +576,13 @@ def start_volttron_process(opts):
             ControlService(opts.aip, address=address, identity='control',
                            tracker=tracker, heartbeat_autostart=True,
                            enable_store=False, enable_channel=True),
-            PubSubService(protected_topics_file, address=address,
-                          identity='pubsub', heartbeat_autostart=True,
-                          enable_store=False),
+            PubSubService(protected_topics_file,
+                          queue_depth=opts.pubsub_queue_depth,
+                          queue_policy=opts.pubsub_queue_policy,
+                          queue_watermark=opts.pubsub_queue_watermark,
+                          alert_delay=opts.pubsub_alert_delay,
+                          address=address, identity='pubsub',
+                          heartbeat_autostart=True, enable_store=False),
             CompatPubSub(address=address, identity='pubsub.compat',
                          publish_address=opts.publish_address,
                          subscribe_address=opts.subscribe_address),
@@ -627,6 +591,8 @@ def start_volttron_process(opts):
                 address=address,
                 bind_web_address=opts.bind_web_address,
                 volttron_central_address=opts.volttron_central_address,
+                ws_flush_interval=opts.web_socket_flush_interval,
+                ws_batch_size=opts.web_socket_batch_size,
                 aip=opts.aip, enable_store=False)
         ]
         events = [gevent.event.Event() for service in services]
@@ -716,6 +682,47 @@ def main(argv=sys.argv):
     agents.add_argument(
         '--no-autostart', action='store_false', dest='autostart',
         help=argparse.SUPPRESS)
+    agents.add_argument(
+        '--autostart-concurrency', type=int, metavar='COUNT',
+        help='start up to COUNT agents of the same priority at once')
+    agents.add_argument(
+        '--autostart-wait-ready', action='store_true',
+        inverse='--no-autostart-wait-ready',
+        help='wait for autostarted agents to connect before starting '
+             'agents of the next priority')
+    agents.add_argument(
+        '--no-autostart-wait-ready', action='store_false',
+        dest='autostart_wait_ready', help=argparse.SUPPRESS)
+    agents.add_argument(
+        '--autostart-ready-timeout', type=float, metavar='SECONDS',
+        help='time to wait for each agent to connect with '
+             '--autostart-wait-ready')
+    agents.add_argument(
+        '--agent-log-format', choices=['json', 'binary'],
+        help='send agent log records as JSON lines or binary batches')
+    agents.add_argument(
+        '--agent-forkserver', action='store_true',
+        inverse='--no-agent-forkserver',
+        help='fork agents from a pre-warmed launcher process')
+    agents.add_argument(
+        '--no-agent-forkserver', action='store_false',
+        dest='agent_forkserver', help=argparse.SUPPRESS)
+    agents.add_argument(
+        '--pubsub-queue-depth', type=int, metavar='COUNT',
+        help='queue up to COUNT messages for each pubsub subscriber')
+    agents.add_argument(
+        '--pubsub-queue-policy', choices=POLICIES,
+        help='handle a full subscriber queue by dropping its oldest or '
+             'newest message or by dropping the subscriber\'s '
+             'subscriptions')
+    agents.add_argument(
+        '--pubsub-queue-watermark', type=int, metavar='COUNT',
+        help='consider subscribers with more than COUNT queued messages '
+             'slow')
+    agents.add_argument(
+        '--pubsub-alert-delay', type=float, metavar='SECONDS',
+        help='raise a health alert when a subscriber stays slow for '
+             'SECONDS')
     agents.add_argument(
         '--publish-address', metavar='ZMQADDR',
         help='ZeroMQ URL used for pre-3.x agent publishing (deprecated)')
@@ -731,6 +738,14 @@ def main(argv=sys.argv):
     agents.add_argument(
         '--bind-web-address', metavar='BINDWEBADDR', default=None,
         help='Bind a web server to the specified ip:port passed')
+    agents.add_argument(
+        '--web-socket-flush-interval', type=float, metavar='SECONDS',
+        help='send websocket messages in batches collected for SECONDS '
+             '(0 sends each message at once)')
+    agents.add_argument(
+        '--web-socket-batch-size', type=int, metavar='COUNT',
+        help='send a batch of websocket messages once it holds COUNT '
+             'messages')
     agents.add_argument(
         '--volttron-central-address', default=None,
         help='The web address of a volttron central install instance.')
@@ -805,6 +820,17 @@ def main(argv=sys.argv):
         verboseness=logging.WARNING,
         volttron_home=volttron_home,
         autostart=True,
+        autostart_concurrency=8,
+        autostart_wait_ready=False,
+        autostart_ready_timeout=30.0,
+        agent_forkserver=False,
+        agent_log_format='json',
+        pubsub_queue_depth=10000,
+        pubsub_queue_policy='drop-oldest',
+        pubsub_queue_watermark=5000,
+        pubsub_alert_delay=30.0,
+        web_socket_flush_interval=0.05,
+        web_socket_batch_size=100,
         publish_address=ipc + 'publish',
         subscribe_address=ipc + 'subscribe',
         vip_address=[],
@@ -1,8 +1,7 @@
 import logging
 
 from zmq.utils import jsonapi
-from volttron.platform.agent.utils import (get_aware_utc_now,
-                                           format_timestamp,
+from volttron.platform.agent.utils import (format_aware_utc_now,
                                            parse_timestamp_string)
 
 CURRENT_STATUS = "current_status"
@@ -41,7 +40,7 @@ class Status(object):
     def __init__(self):
         self._status = GOOD_STATUS
         self._context = None
-        self._last_updated = format_timestamp(get_aware_utc_now())
+        self._last_updated = format_aware_utc_now()
         self._status_changed_callback = None
 
     @property
@@ -81,7 +80,7 @@ class Status(object):
         status_changed = status != self._status
         self._status = status
         self._context = context
-        self._last_updated = format_timestamp(get_aware_utc_now())
+        self._last_updated = format_aware_utc_now()
 
         if status_changed and self._status_changed_callback:
             print(self._status_changed_callback())
@@ -194,6 +194,7 @@ _CONFIG_VALUE = _(CONFIG_PATH.replace('{base}',CONFIG_TOPIC_BASE))
 CONFIG_ADD = _(_CONFIG_VALUE.replace('{action}', 'add'))
 CONFIG_REMOVE = _(_CONFIG_VALUE.replace('{action}', 'remove'))
 CONFIG_UPDATE = _(_CONFIG_VALUE.replace('{action}', 'update'))
+CONFIG_STORE_CHANGED = _(CONFIG_TOPIC_BASE + '/store/{identity}')
 
 DRIVER_CONFIG_ADD = _(_CONFIG_VALUE.replace('{category}', 'driver'))
 DRIVER_CONFIG_REMOVE = _(_CONFIG_VALUE.replace('{category}', 'driver'))
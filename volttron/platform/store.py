@@ -65,15 +65,18 @@ import errno
 from csv import DictReader
 from StringIO import StringIO
 
+from copy import deepcopy
 from zmq.utils import jsonapi
 from gevent.lock import Semaphore
 
-from volttron.utils.persistance import PersistentDict
+from volttron.utils.persistance import JournaledPersistentDict
 from volttron.platform.agent.utils import parse_json_config
 from volttron.platform.vip.agent import errors
 from volttron.platform.jsonrpc import RemoteError, MethodNotFound
+from volttron.platform.messaging.topics import CONFIG_STORE_CHANGED
 
-from volttron.platform.storeutils import list_unique_links, check_for_recursion, strip_config_name, store_ext
+from volttron.platform.storeutils import (list_unique_links, check_for_recursion, strip_config_name, store_ext,
+                                          check_for_config_link)
 from .vip.agent import Agent, Core, RPC
 
 
@@ -141,6 +144,11 @@ class ConfigStoreService(Agent):
         self.store = {}
         self.store_path = os.path.join(os.environ['VOLTTRON_HOME'], 'configuration_store')
 
+    def _create_disk_store(self, store_path):
+        """Returns the on disk store for an agent. Changes are journaled
+        so updating one configuration does not rewrite the whole store."""
+        return JournaledPersistentDict(filename=store_path, flag='c', format='json')
+
     @Core.receiver('onsetup')
     def _setup(self, sender, **kwargs):
         _log.info("Initializing configuration store service.")
@@ -160,7 +168,7 @@ class ConfigStoreService(Agent):
             root, ext = os.path.splitext(store_path)
             agent_identity = os.path.basename(root)
             _log.debug("Processing store for agent {}".format(agent_identity))
-            store = PersistentDict(filename=store_path, flag='c', format='json')
+            store = self._create_disk_store(store_path)
             parsed_configs, name_map = process_store(agent_identity, store)
             self.store[agent_identity] = {"configs": parsed_configs,
                                           "store": store,
@@ -194,6 +202,7 @@ class ConfigStoreService(Agent):
 
         # Sync will delete the file if the store is empty.
         agent_disk_store.async_sync()
+        self._publish_change(identity, "DELETE_ALL")
 
         with agent_store_lock:
             try:
@@ -249,6 +258,81 @@ class ConfigStoreService(Agent):
 
         return agent_configs[real_config_name]
 
+    @RPC.export
+    def manage_get_many(self, identity, config_names=None, raw=True, resolve=False):
+        """Returns the contents of many configurations of an agent in one call.
+
+        :param identity: VIP IDENTITY of the agent that owns the configurations.
+        :param config_names: Configurations to return. All of the agent's configurations if None.
+        :param raw: Return the configurations as stored instead of parsed.
+        :param resolve: Replace "config://" references in parsed configurations
+            with the contents of the referenced configuration.
+        :type identity: str
+        :type config_names: list
+        :type raw: bool
+        :type resolve: bool
+        :returns: Configuration contents keyed by configuration name. Names
+            that are not in the store are left out.
+        :rtype: dict
+        """
+        agent_store = self.store.get(identity)
+        if agent_store is None:
+            return {}
+
+        agent_configs = agent_store["configs"]
+        agent_disk_store = agent_store["store"]
+        agent_name_map = agent_store["name_map"]
+
+        if config_names is None:
+            config_names = agent_name_map.values()
+
+        results = {}
+        gathered = {}
+        for config_name in config_names:
+            config_name_lower = strip_config_name(config_name).lower()
+            real_config_name = agent_name_map.get(config_name_lower)
+            if real_config_name is None:
+                continue
+
+            if raw:
+                results[config_name] = agent_disk_store[real_config_name]["data"]
+            elif resolve:
+                results[config_name] = self._resolve_config(config_name_lower, agent_configs,
+                                                            agent_name_map, gathered)
+            else:
+                results[config_name] = agent_configs[real_config_name]
+
+        return results
+
+    def _resolve_config(self, config_name_lower, agent_configs, agent_name_map, gathered):
+        """Returns a copy of a parsed configuration with its references
+        replaced by the referenced configurations. Configurations already
+        resolved in gathered are reused."""
+        if config_name_lower in gathered:
+            return gathered[config_name_lower]
+
+        real_config_name = agent_name_map.get(config_name_lower)
+        contents = deepcopy(agent_configs.get(real_config_name))
+        gathered[config_name_lower] = contents
+        self._resolve_links(contents, agent_configs, agent_name_map, gathered)
+        return contents
+
+    def _resolve_links(self, contents, agent_configs, agent_name_map, gathered):
+        if isinstance(contents, dict):
+            items = contents.items()
+        elif isinstance(contents, list):
+            items = list(enumerate(contents))
+        else:
+            return
+
+        for key, value in items:
+            if isinstance(value, (dict, list)):
+                self._resolve_links(value, agent_configs, agent_name_map, gathered)
+            elif isinstance(value, str):
+                link = check_for_config_link(value)
+                if link is not None:
+                    contents[key] = self._resolve_config(link, agent_configs, agent_name_map, gathered)
+
     @RPC.export
     def set_config(self, config_name, contents, trigger_callback=False, send_update=True):
         identity = bytes(self.vip.rpc.context.vip_message.peer)
@@ -270,7 +354,7 @@ class ConfigStoreService(Agent):
         if agent_store is None:
             # Initialize a new store.
             store_path = os.path.join(self.store_path, identity + store_ext)
-            store = PersistentDict(filename=store_path, flag='c', format='json')
+            store = self._create_disk_store(store_path)
             agent_store = {
                 "configs": {}, "store": store, "name_map": {},
                 "lock": Semaphore()
@@ -331,6 +415,7 @@ class ConfigStoreService(Agent):
 
         # Sync will delete the file if the store is empty.
         agent_disk_store.async_sync()
+        self._publish_change(identity, "DELETE", config_name)
 
         if send_update:
             with agent_store_lock:
@@ -369,6 +454,13 @@ class ConfigStoreService(Agent):
                                   trigger_callback=trigger_callback,
                                   send_update=send_update)
 
+    def _publish_change(self, identity, action, config_name=None):
+        """Tells subscribers that the store of an agent changed so cached
+        copies of its configurations can be dropped."""
+        topic = CONFIG_STORE_CHANGED(identity=identity)
+        self.vip.pubsub.publish("pubsub", topic,
+                                message={"action": action, "config_name": config_name})
+
     def _add_config_to_store(self, identity, config_name, raw, parsed,
                              config_type, trigger_callback=False,
                              send_update=True):
@@ -380,7 +472,7 @@ class ConfigStoreService(Agent):
         if agent_store is None:
             #Initialize a new store.
             store_path = os.path.join(self.store_path, identity+ store_ext)
-            store = PersistentDict(filename=store_path, flag='c', format='json')
+            store = self._create_disk_store(store_path)
             agent_store = {"configs": {}, "store": store, "name_map": {}, "lock": Semaphore()}
             self.store[identity] = agent_store
 
@@ -409,6 +501,7 @@ class ConfigStoreService(Agent):
         agent_disk_store.async_sync()
 
         _log.debug("Agent {} config {} stored.".format(identity, config_name))
+        self._publish_change(identity, action, config_name)
 
         if send_update:
             with agent_store_lock:
@@ -77,8 +77,8 @@ class Agent(object):
                      enable_channel):
             self.peerlist = PeerList(core)
             self.ping = Ping(core)
-            self.rpc = RPC(core, owner)
-            self.hello = Hello(core)
+            self.rpc = RPC(core, owner, self.peerlist)
+            self.hello = Hello(core, self.rpc.serializers)
             self.pubsub = PubSub(core, self.rpc, self.peerlist, owner)
             if enable_channel:
                 self.channel = Channel(core)
@@ -62,7 +62,7 @@ from contextlib import closing
 from zmq import green as zmq
 from zmq.utils import jsonapi
 
-from . import Core, RPC, PeerList, PubSub
+from . import Core, Hello, RPC, PeerList, PubSub
 from .subsystems.pubsub import encode_peer
 from volttron.platform.messaging.headers import Headers
 
@@ -92,8 +92,9 @@ class CompatPubSub(object):
                  subscribe_address=SUBSCRIBE_ADDRESS):
         self.core = Core(
             self, identity=identity, address=address, context=context)
-        self.rpc = RPC(self.core, self)
         self.peerlist = PeerList(self.core)
+        self.rpc = RPC(self.core, self, self.peerlist)
+        self.hello = Hello(self.core, self.rpc.serializers)
         self.pubsub = PubSub(self.core, self.rpc, self.peerlist, self)
         self.peer = peer
         self.publish_address = publish_address
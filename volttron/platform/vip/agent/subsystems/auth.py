@@ -80,7 +80,11 @@ class Auth(SubsystemBase):
         self._core = weakref.ref(core)
         self._rpc = weakref.ref(rpc)
         self._user_to_capabilities = {}
+        self._capability_sets = {}
         self._dirty = True
+        # Incremented by every push so that a fetch which was already in
+        # flight does not overwrite newer capabilities.
+        self._generation = 0
 
         def onsetup(sender, **kwargs):
             rpc.export(self._update_capabilities, 'auth.update')
@@ -90,11 +94,16 @@ class Auth(SubsystemBase):
     def _fetch_capabilities(self):
         while self._dirty:
             self._dirty = False
+            generation = self._generation
             try:
-                self._user_to_capabilities = self._rpc().call(AUTH,
+                user_to_capabilities = self._rpc().call(AUTH,
                     'get_user_to_capabilities').get(timeout=10)
             except RemoteError:
                 self._dirty = True
+                continue
+            if generation == self._generation:
+                self._user_to_capabilities = user_to_capabilities
+                self._capability_sets = {}
 
     def get_capabilities(self, user_id):
         """Gets capabilities for a given user.
@@ -107,8 +116,31 @@ class Auth(SubsystemBase):
         self._fetch_capabilities()
         return self._user_to_capabilities.get(user_id, [])
 
+    def get_capability_set(self, user_id):
+        """Gets capabilities for a given user as a cached frozenset.
+
+        The cache is only invalidated when the auth service pushes
+        updated capabilities.
+
+        :param user_id: user id field from VOLTTRON Interconnect Protocol
+        :type user_id: str
+        :returns: set of capabilities
+        :rtype: frozenset
+        """
+        self._fetch_capabilities()
+        try:
+            return self._capability_sets[user_id]
+        except KeyError:
+            caps = frozenset(self._user_to_capabilities.get(user_id, []))
+            self._capability_sets[user_id] = caps
+            return caps
+
     def _update_capabilities(self, user_to_capabilities):
         identity = bytes(self._rpc().context.vip_message.peer)
         if identity == AUTH:
+            # The pushed mapping is complete so there is no need to
+            # fetch it again.
+            self._generation += 1
             self._user_to_capabilities = user_to_capabilities
-            self._dirty = True
+            self._capability_sets = {}
+            self._dirty = False
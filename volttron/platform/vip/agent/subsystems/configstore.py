@@ -368,6 +368,42 @@ class ConfigStore(SubsystemBase):
 
         return self._gather_config(config_name)
 
+    def get_many(self, config_names=None):
+        """Returns the contents of many configurations at once.
+
+        References shared between the configurations are resolved once.
+
+        :param config_names: Names of configurations to return. All
+            configurations if None.
+        :type config_names: list
+        :returns: Configuration contents keyed by configuration name
+        :rtype: dict
+
+        :Return Values:
+        The contents of each configuration found. Names that are not in
+        the store are left out.
+        """
+        if not self._initialized:
+            try:
+                self._rpc().call(CONFIGURATION_STORE, "get_configs").get()
+            except errors.Unreachable as e:
+                _log.error("Connected platform does not support the Configuration Store feature.")
+            except errors.VIPError as e:
+                _log.error("Error retrieving agent configurations: {}".format(e))
+
+        if config_names is None:
+            config_names = self.list()
+
+        results = {}
+        already_gathered = {}
+        for config_name in config_names:
+            config_name_lower = config_name.lower()
+            if config_name_lower not in self._store and config_name_lower not in self._default_store:
+                continue
+            results[config_name] = self._gather_child_configs(config_name_lower, already_gathered)
+
+        return results
+
     def _check_call_from_process_callbacks(self):
         frame_records = inspect.stack()
         try:
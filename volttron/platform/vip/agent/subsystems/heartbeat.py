@@ -58,8 +58,7 @@ from datetime import datetime
 
 from .base import SubsystemBase
 from volttron.platform.messaging.headers import DATE
-from volttron.platform.agent.utils import (get_aware_utc_now,
-                                           format_timestamp)
+from volttron.platform.agent.utils import format_aware_utc_now
 
 """The heartbeat subsystem adds an optional periodic publish to all agents.
 Heartbeats can be started with agents and toggled on and off at runtime.
@@ -147,7 +146,7 @@ class Heartbeat(SubsystemBase):
 
     def publish(self):
         topic = 'heartbeat/' + self.core().identity
-        headers = {DATE: format_timestamp(get_aware_utc_now())}
+        headers = {DATE: format_aware_utc_now()}
         message = self.owner.vip.health.get_status()
 
         self.pubsub().publish('pubsub', topic, headers, message)
@@ -78,10 +78,16 @@ class Hello(SubsystemBase):
     executing agent does not know.  This subsystem allows the agent to be
     able to determine it's identity from a peer.  By default that peer is
     the connected router, however this could be another agent.
+
+    Agents also advertise the message serializers they support in the
+    hello and welcome. When serializers (a
+    :py:class:`volttron.platform.vip.serialization.PeerSerializers`) is
+    given, the advertisements received from peers are recorded in it.
     """
 
-    def __init__(self, core):
+    def __init__(self, core, serializers=None):
         self.core = weakref.ref(core)
+        self.serializers = serializers
         self._results = ResultsDictionary()
         core.register('hello', self._handle_hello, self._handle_error)
 
@@ -103,32 +109,53 @@ class Hello(SubsystemBase):
         _log.info('Requesting hello from peer ({})'.format(peer))
         socket = self.core().socket
         result = next(self._results)
-        socket.send_vip(peer, b'hello', [b'hello'], msg_id=result.ident)
+        args = [b'hello']
+        if self.serializers is not None:
+            args.append(self.serializers.advertisement())
+        socket.send_vip(peer, b'hello', args, msg_id=result.ident)
         return result
 
     __call__ = hello
 
     def _handle_hello(self, message):
-        _log.info('Handling hello message {}'.format(message))
+        _log.debug('Handling hello message {}'.format(message))
         try:
             op = bytes(message.args[0])
         except IndexError:
             _log.error('missing hello subsystem operation')
             return
+        serializers = self.serializers
         if op == b'hello':
             socket = self.core().socket
+            if serializers is not None:
+                serializers.update(bytes(message.peer), self._advertised(
+                    message.args, 1))
             message.user = b''
             message.args = [b'welcome', b'1.0', socket.identity, message.peer]
+            if serializers is not None:
+                message.args.append(serializers.advertisement())
             socket.send_vip_object(message, copy=False)
         elif op == b'welcome':
+            # Peers which predate serializer negotiation only send the
+            # first four arguments.
+            if serializers is not None and bytes(message.peer):
+                serializers.update(bytes(message.peer), self._advertised(
+                    message.args, 4))
             try:
                 result = self._results.pop(bytes(message.id))
             except KeyError:
                 return
-            result.set([bytes(arg) for arg in message.args[1:]])
+            result.set([bytes(arg) for arg in message.args[1:4]])
         else:
             _log.error('unknown hello subsystem operation')
 
+    @staticmethod
+    def _advertised(args, index):
+        try:
+            return bytes(args[index])
+        except IndexError:
+            return None
+
     def _handle_error(self, sender, message, error, **kwargs):
         try:
             result = self._results.pop(bytes(message.id))
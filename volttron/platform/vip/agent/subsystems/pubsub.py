@@ -66,7 +66,6 @@ import weakref
 
 from zmq import green as zmq
 from zmq import SNDMORE
-from zmq.utils import jsonapi
 
 from .base import SubsystemBase
 from ..decorators import annotate, annotations, dualmethod, spawn
@@ -101,6 +100,9 @@ class PubSub(SubsystemBase):
         self._peer_subscriptions = {}
         self._my_subscriptions = {}
         self.protected_topics = ProtectedPubSubTopics()
+        # Object with a push(peer, frames) method used to send messages
+        # to subscribers instead of sending them directly.
+        self.outbound = None
 
         def setup(sender, **kwargs):
             # pylint: disable=unused-argument
@@ -110,6 +112,7 @@ class PubSub(SubsystemBase):
             rpc_subsys.export(self._peer_list, 'pubsub.list')
             rpc_subsys.export(self._peer_publish, 'pubsub.publish')
             rpc_subsys.export(self._peer_push, 'pubsub.push')
+            rpc_subsys.export(self._peer_dropped, 'pubsub.dropped')
             core.onconnected.connect(self._connected)
             core.onviperror.connect(self._viperror)
             peerlist_subsys.onadd.connect(self._peer_add)
@@ -238,15 +241,27 @@ class PubSub(SubsystemBase):
                 subscribers |= subscription
         if subscribers:
             sender = encode_peer(peer)
-            json_msg = jsonapi.dumps(jsonrpc.json_method(
+            request = jsonrpc.json_method(
                 None, 'pubsub.push',
-                [sender, bus, topic, headers, message], None))
-            frames = [zmq.Frame(b''), zmq.Frame(b''),
-                      zmq.Frame(b'RPC'), zmq.Frame(json_msg)]
+                [sender, bus, topic, headers, message], None)
+            # Encode the push once for each serializer in use.
+            encoded = {}
+            serializer_for = self.rpc().serializer_for
+            outbound = self.outbound
             socket = self.core().socket
             for subscriber in subscribers:
-                socket.send(subscriber, flags=SNDMORE)
-                socket.send_multipart(frames, copy=False)
+                serializer = serializer_for(subscriber)
+                try:
+                    frames = encoded[serializer]
+                except KeyError:
+                    frames = encoded[serializer] = [
+                        zmq.Frame(b''), zmq.Frame(b''), zmq.Frame(b'RPC'),
+                        zmq.Frame(serializer.dumps(request))]
+                if outbound is not None:
+                    outbound.push(subscriber, frames)
+                else:
+                    socket.send(subscriber, flags=SNDMORE)
+                    socket.send_multipart(frames, copy=False)
         return len(subscribers)
 
     def _peer_push(self, sender, bus, topic, headers, message):
@@ -268,6 +283,14 @@ class PubSub(SubsystemBase):
             # No callbacks for topic; synchronize with sender
             self.synchronize(peer)
 
+    def _peer_dropped(self):
+        '''Handle notice that a peer dropped our subscriptions.'''
+        peer = bytes(self.rpc().context.vip_message.peer)
+        _log.warning('%r dropped our subscriptions because we fell behind; '
+                     'subscribing again', peer)
+        delay = random.random()
+        self.core().spawn_later(delay, self.synchronize, peer)
+
     def synchronize(self, peer):
         '''Unsubscribe from stale/forgotten/unsolicited subscriptions.'''
         if peer is None:
@@ -403,8 +426,8 @@ class PubSub(SubsystemBase):
         required_caps = self.protected_topics.get(topic)
         if required_caps:
             user = str(self.rpc().context.vip_message.user)
-            caps = self._owner.vip.auth.get_capabilities(user)
-            if not set(required_caps) <= set(caps):
+            if not set(required_caps) <= self._owner.vip.auth.get_capability_set(user):
+                caps = self._owner.vip.auth.get_capabilities(user)
                 msg = ('to publish to topic "{}" requires capabilities {},'
                       ' but capability list {} was'
                       ' provided').format(topic, required_caps, caps)
@@ -63,15 +63,16 @@ import os
 import sys
 import traceback
 import weakref
+from contextlib import contextmanager
 
 import gevent.local
 from gevent.event import AsyncResult
-from zmq.utils import jsonapi
 
 from .base import SubsystemBase
 from ..errors import VIPError
 from ..results import counter, ResultsDictionary
 from ..decorators import annotate, annotations, dualmethod, spawn
+from ... import serialization
 from .... import jsonrpc
 
 from zmq.green import ZMQError, ENOTSOCK
@@ -93,10 +94,29 @@ class Dispatcher(jsonrpc.Dispatcher):
         self._results = ResultsDictionary()
 
     def serialize(self, json_obj):
-        return jsonapi.dumps(json_obj)
+        return self._serializer().dumps(json_obj)
 
     def deserialize(self, json_string):
-        return jsonapi.loads(json_string)
+        return self._serializer().loads(json_string)
+
+    def _serializer(self):
+        return getattr(self.local, 'serializer', None) or serialization.JSON
+
+    @contextmanager
+    def serializing(self, serializer):
+        '''Encode messages built in this context using serializer.'''
+        local = self.local
+        previous = getattr(local, 'serializer', None)
+        local.serializer = serializer
+        try:
+            yield
+        finally:
+            local.serializer = previous
+
+    def dispatch(self, json_string, context=None):
+        # Responses are encoded the same way as the request.
+        with self.serializing(serialization.detect(json_string)):
+            return super(Dispatcher, self).dispatch(json_string, context)
 
     def batch_call(self, requests):
         methods = []
@@ -206,7 +226,7 @@ class Dispatcher(jsonrpc.Dispatcher):
 
 
 class RPC(SubsystemBase):
-    def __init__(self, core, owner):
+    def __init__(self, core, owner, peerlist_subsys=None):
         self.core = weakref.ref(core)
         self._owner = owner
         self.context = None
@@ -214,6 +234,8 @@ class RPC(SubsystemBase):
         self._dispatcher = None
         self._counter = counter()
         self._outstanding = weakref.WeakValueDictionary()
+        self.serializers = serialization.PeerSerializers()
+        self._probed = set()
         core.register('RPC', self._handle_subsystem, self._handle_error)
         self._isconnected = True
 
@@ -229,6 +251,9 @@ class RPC(SubsystemBase):
         core.onsetup.connect(setup, self)
         core.ondisconnected.connect(self._disconnected)
         core.onconnected.connect(self._connected)
+        if peerlist_subsys is not None:
+            peerlist_subsys.onadd.connect(self._peer_changed, self)
+            peerlist_subsys.ondrop.connect(self._peer_changed, self)
         self._iterate_exports()
 
     def _connected(self, sender, **kwargs):
@@ -236,6 +261,37 @@ class RPC(SubsystemBase):
 
     def _disconnected(self, sender, **kwargs):
         self._isconnected = False
+        self.serializers.clear()
+        self._probed.clear()
+
+    def _peer_changed(self, sender, peer, **kwargs):
+        # A peer which reconnects may be running a different version.
+        self.serializers.forget(peer)
+        self._probed.discard(peer)
+
+    def serializer_for(self, peer):
+        '''Return the serializer to use for messages sent to peer.
+
+        JSON is used until the peer is known to support something
+        better. The first time an unknown peer is seen, a hello
+        advertising our serializers is sent to it; its welcome (handled
+        by the hello subsystem) records the serializer to use.
+        '''
+        serializer = self.serializers.get(peer)
+        if serializer is not None:
+            return serializer
+        if (peer and peer not in self._probed and
+                len(self.serializers.names) > 1 and self._isconnected):
+            self._probed.add(peer)
+            try:
+                self.core().socket.send_vip(
+                    peer, b'hello',
+                    [b'hello', self.serializers.advertisement()],
+                    msg_id=b'serializers.probe')
+            except ZMQError as exc:
+                if exc.errno == ENOTSOCK:
+                    _log.debug("Socket send on non socket {}".format(self.core().identity))
+        return serialization.JSON
 
     def _iterate_exports(self):
         '''Iterates over exported methods and adds authorization checks
@@ -253,8 +309,8 @@ class RPC(SubsystemBase):
         '''
         def checked_method(*args, **kwargs):
             user = str(self.context.vip_message.user)
-            caps = self._owner.vip.auth.get_capabilities(user)
-            if not required_caps <= set(caps):
+            if not required_caps <= self._owner.vip.auth.get_capability_set(user):
+                caps = self._owner.vip.auth.get_capabilities(user)
                 msg = ('method "{}" requires capabilities {},'
                       ' but capability list {} was'
                       ' provided').format(method.__name__, required_caps, caps)
@@ -265,8 +321,12 @@ class RPC(SubsystemBase):
     @spawn
     def _handle_subsystem(self, message):
         dispatch = self._dispatcher.dispatch
+        requests = [bytes(msg) for msg in message.args]
+        for request in requests:
+            self.serializers.learn(bytes(message.peer),
+                                   serialization.detect(request))
         responses = [response for response in (
-            dispatch(bytes(msg), message) for msg in message.args) if response]
+            dispatch(request, message) for request in requests) if response]
         if responses:
             message.user = ''
             message.args = responses
@@ -302,7 +362,8 @@ class RPC(SubsystemBase):
         return decorate
 
     def batch(self, peer, requests):
-        request, results = self._dispatcher.batch_call(requests)
+        with self._dispatcher.serializing(self.serializer_for(peer)):
+            request, results = self._dispatcher.batch_call(requests)
         if results:
             items = weakref.WeakSet(results)
             ident = '%s.%s' % (next(self._counter), id(items))
@@ -321,7 +382,8 @@ class RPC(SubsystemBase):
         return results or None
 
     def call(self, peer, method, *args, **kwargs):
-        request, result = self._dispatcher.call(method, args, kwargs)
+        with self._dispatcher.serializing(self.serializer_for(peer)):
+            request, result = self._dispatcher.call(method, args, kwargs)
         ident = '%s.%s' % (next(self._counter), hash(result))
         self._outstanding[ident] = result
 
@@ -336,7 +398,8 @@ class RPC(SubsystemBase):
     __call__ = call
 
     def notify(self, peer, method, *args, **kwargs):
-        request = self._dispatcher.notify(method, args, kwargs)
+        with self._dispatcher.serializing(self.serializer_for(peer)):
+            request = self._dispatcher.notify(method, args, kwargs)
 
         if self._isconnected:
             try:
@@ -84,6 +84,7 @@ class WebSubSystem(SubsystemBase):
         rpc.export(self._opened, 'client.opened')
         rpc.export(self._closed, 'client.closed')
         rpc.export(self._message, 'client.message')
+        rpc.export(self._messages, 'client.messages')
         rpc.export(self._route_callback, 'route.callback')
 
         def onstop(sender, **kwargs):
@@ -204,7 +205,7 @@ class WebSubSystem(SubsystemBase):
         :type endpoint: str
         :type message: str
         """
-        _log.debug('SENDING DATA TO CALLBACK {} {}'.format(endpoint, message))
+        _log.debug('SENDING DATA TO CALLBACK %s %s', endpoint, message)
         self._rpc().call(MASTER_WEB, 'websocket_send', endpoint, message).get(
             timeout=5)
 
@@ -241,8 +242,12 @@ class WebSubSystem(SubsystemBase):
             if callbacks[1]:
                 callbacks[1](endpoint)
 
+    def _messages(self, endpoint, messages):
+        for message in messages:
+            self._message(endpoint, message)
+
     def _message(self, endpoint, message):
-        print('Client received message callback')
+        _log.debug('Client received message callback')
 
         callbacks = self._ws_endpoint.get(endpoint)
         if callbacks is None:
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""The platform pubsub service and its per-subscriber send queues.
+
+The service forwards each publish to its subscribers through the
+router. A subscriber which stops reading, such as a historian blocked
+on a slow database, would otherwise fill the router's queue for that
+peer. Publishes to it would then be dropped silently.
+
+Instead, the service keeps a bounded queue for each subscriber. Only a
+window of messages may be sent to a subscriber before it acknowledges
+them. Every ack_interval messages the service pings the subscriber; the
+pong acknowledges everything sent before the ping. Messages beyond the
+window wait in the subscriber's queue. A full queue is handled by the
+configured policy:
+
+drop-oldest
+    discard the oldest queued message
+drop-newest
+    discard the new message
+disconnect
+    discard the queue, drop all of the subscriber's subscriptions and
+    tell the subscriber, which subscribes again
+
+A ping that is not answered within ack_timeout seconds releases the
+window as if it had been answered, so a lost pong cannot stall a
+subscriber for good.
+
+A health alert is raised when a queue stays over its watermark for
+alert_delay seconds.
+"""
+
+from __future__ import absolute_import
+
+import logging
+import os
+import time
+from collections import deque
+
+import gevent
+from gevent.fileobject import FileObject
+from zmq import SNDMORE
+from zmq.utils import jsonapi
+
+from .agent import Agent, Core, RPC
+from .agent.subsystems.pubsub import ProtectedPubSubTopics
+from ..agent import utils
+from ..messaging.health import STATUS_BAD, Status
+
+
+__all__ = ['OutboundQueues', 'PubSubService', 'POLICIES']
+
+
+_log = logging.getLogger(__name__)
+
+POLICIES = ('drop-oldest', 'drop-newest', 'disconnect')
+
+
+class SubscriberQueue(object):
+    """Messages waiting to be sent to one subscriber."""
+
+    def __init__(self, peer):
+        self.peer = peer
+        self.messages = deque()
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.over_watermark = None
+        self.alerted = False
+        # Greenlets waiting for outstanding pings, by sequence number.
+        self.pings = {}
+
+    @property
+    def in_flight(self):
+        return self.sent - self.acked
+
+    def stats(self):
+        return {'queued': len(self.messages),
+                'in_flight': self.in_flight,
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'over_watermark': self.over_watermark is not None}
+
+
+class OutboundQueues(object):
+    """Bounded send queues for each subscriber.
+
+    :param send: Called with a peer and frames to send them.
+    :param ping: Called with a peer to ping it; returns an AsyncResult.
+    :param disconnect: Called with a peer to drop its subscriptions.
+    :param max_depth: Maximum number of messages queued per subscriber.
+    :param policy: What to do when a queue is full; one of POLICIES.
+    :param watermark: Queue depth above which a subscriber is slow.
+    :param alert_delay: Seconds a queue must stay over the watermark
+                        before onalert is called.
+    :param onalert: Called with a peer and its stats when it is slow or
+                    disconnected.
+    :param window: Messages sent to a subscriber before waiting for it
+                   to acknowledge them.
+    :param ack_interval: Messages between acknowledgement pings.
+    :param ack_timeout: Seconds to wait for a ping to be answered.
+    """
+
+    def __init__(self, send, ping, disconnect, max_depth=10000,
+                 policy='drop-oldest', watermark=5000, alert_delay=30.0,
+                 onalert=None, window=1000, ack_interval=100,
+                 ack_timeout=30.0):
+        if policy not in POLICIES:
+            raise ValueError('invalid policy {!r}; expected one of '
+                             '{}'.format(policy, ', '.join(POLICIES)))
+        if ack_interval > window:
+            raise ValueError('ack_interval must not exceed window')
+        self._send = send
+        self._ping = ping
+        self._disconnect = disconnect
+        self.max_depth = max_depth
+        self.policy = policy
+        self.watermark = watermark
+        self.alert_delay = alert_delay
+        self.onalert = onalert
+        self.window = window
+        self.ack_interval = ack_interval
+        self.ack_timeout = ack_timeout
+        self._queues = {}
+        self._disconnects = {}
+
+    def push(self, peer, frames):
+        """Send frames to peer or queue them if peer is behind."""
+        try:
+            queue = self._queues[peer]
+        except KeyError:
+            queue = self._queues[peer] = SubscriberQueue(peer)
+        if not queue.messages and queue.in_flight < self.window:
+            self._send_one(queue, frames)
+            return
+        if len(queue.messages) >= self.max_depth:
+            if self.policy == 'disconnect':
+                self._drop_subscriber(queue)
+                return
+            queue.dropped += 1
+            if self.policy == 'drop-newest':
+                self._check_watermark(queue)
+                return
+            queue.messages.popleft()
+        queue.messages.append(frames)
+        self._check_watermark(queue)
+
+    def remove(self, peer):
+        """Forget the queue of a peer which has gone away."""
+        self._queues.pop(peer, None)
+
+    def stats(self):
+        """Return the queue statistics of each subscriber."""
+        stats = {peer: queue.stats()
+                 for peer, queue in self._queues.iteritems()}
+        for peer in self._disconnects:
+            stats.setdefault(peer, {'queued': 0, 'in_flight': 0, 'sent': 0,
+                                    'dropped': 0, 'over_watermark': False})
+        for peer, peer_stats in stats.iteritems():
+            peer_stats['disconnects'] = self._disconnects.get(peer, 0)
+        return stats
+
+    def _send_one(self, queue, frames):
+        self._send(queue.peer, frames)
+        queue.sent += 1
+        if queue.sent % self.ack_interval == 0:
+            sequence = queue.sent
+            queue.pings[sequence] = gevent.spawn(
+                self._await_ack, queue, sequence, self._ping(queue.peer))
+
+    def _await_ack(self, queue, sequence, result):
+        try:
+            result.get(timeout=self.ack_timeout)
+        except gevent.Timeout:
+            _log.warning('subscriber %r did not acknowledge messages within '
+                         '%.1f seconds', queue.peer, self.ack_timeout)
+        except Exception:
+            # Errors (e.g. an unreachable peer) also release the window;
+            # the peer is removed when the router reports it gone.
+            pass
+        self._acked(queue, sequence)
+
+    def _acked(self, queue, sequence):
+        queue.pings.pop(sequence, None)
+        if self._queues.get(queue.peer) is not queue:
+            return
+        queue.acked = max(queue.acked, sequence)
+        messages = queue.messages
+        while messages and queue.in_flight < self.window:
+            self._send_one(queue, messages.popleft())
+        self._check_watermark(queue)
+
+    def _check_watermark(self, queue):
+        if len(queue.messages) < self.watermark:
+            if queue.over_watermark is not None:
+                queue.over_watermark = None
+                if queue.alerted:
+                    queue.alerted = False
+                    _log.info('subscriber %r caught up', queue.peer)
+            return
+        now = time.time()
+        if queue.over_watermark is None:
+            queue.over_watermark = now
+        elif (not queue.alerted and
+                now - queue.over_watermark >= self.alert_delay):
+            queue.alerted = True
+            _log.warning('subscriber %r has been over its watermark of %d '
+                         'queued messages for %.1f seconds', queue.peer,
+                         self.watermark, now - queue.over_watermark)
+            if self.onalert is not None:
+                self.onalert(queue.peer, queue.stats())
+
+    def _drop_subscriber(self, queue):
+        peer = queue.peer
+        del self._queues[peer]
+        self._disconnects[peer] = self._disconnects.get(peer, 0) + 1
+        _log.warning('dropping subscriptions of subscriber %r; its queue of '
+                     '%d messages is full', peer, len(queue.messages))
+        stats = queue.stats()
+        stats['disconnects'] = self._disconnects[peer]
+        self._disconnect(peer)
+        if self.onalert is not None:
+            self.onalert(peer, stats)
+
+
+class PubSubService(Agent):
+    """Agent hosting the platform message bus.
+
+    :param protected_topics_file: Path of the protected topics file.
+    :param queue_depth: Maximum messages queued for each subscriber.
+    :param queue_policy: What to do when a subscriber's queue is full;
+                         one of POLICIES.
+    :param queue_watermark: Queue depth at which a subscriber is slow.
+    :param alert_delay: Seconds a subscriber may stay slow before a
+                        health alert is raised.
+    """
+
+    def __init__(self, protected_topics_file, queue_depth=10000,
+                 queue_policy='drop-oldest', queue_watermark=5000,
+                 alert_delay=30.0, **kwargs):
+        super(PubSubService, self).__init__(**kwargs)
+        self._protected_topics_file = os.path.abspath(protected_topics_file)
+        self.outbound = OutboundQueues(
+            self._send, self.vip.ping, self._disconnect,
+            max_depth=queue_depth, policy=queue_policy,
+            watermark=queue_watermark, alert_delay=alert_delay,
+            onalert=self._alert)
+        self.vip.pubsub.outbound = self.outbound
+        self.vip.peerlist.ondrop.connect(self._peer_drop, self)
+
+    @Core.receiver('onstart')
+    def setup_agent(self, sender, **kwargs):
+        self._read_protected_topics_file()
+        self.core.spawn(utils.watch_file, self._protected_topics_file,
+                        self._read_protected_topics_file)
+        self.vip.pubsub.add_bus('')
+
+    @RPC.export
+    def get_queue_stats(self):
+        """Return the send queue statistics of each subscriber.
+
+        :returns: Dictionary of peer to a dictionary with the number of
+                  messages queued, sent but not acknowledged (in_flight),
+                  sent and dropped, whether the queue is over its
+                  watermark and how often the peer was disconnected.
+        """
+        return self.outbound.stats()
+
+    def _send(self, peer, frames):
+        socket = self.core.socket
+        socket.send(peer, flags=SNDMORE)
+        socket.send_multipart(frames, copy=False)
+
+    def _disconnect(self, peer):
+        # pylint: disable=protected-access
+        self.vip.pubsub._peer_drop(self, peer)
+        self.vip.rpc.notify(peer, 'pubsub.dropped')
+
+    def _peer_drop(self, sender, peer, **kwargs):
+        self.outbound.remove(peer)
+
+    def _alert(self, peer, stats):
+        context = dict(stats, peer=peer)
+        self.core.spawn(self.vip.health.send_alert, 'pubsub.slow_subscriber',
+                        Status.build(STATUS_BAD, context=context))
+
+    def _read_protected_topics_file(self):
+        _log.info('loading protected-topics file %s',
+                  self._protected_topics_file)
+        try:
+            utils.create_file_if_missing(self._protected_topics_file)
+            with open(self._protected_topics_file) as fil:
+                # Use gevent FileObject to avoid blocking the thread
+                data = FileObject(fil, close=False).read()
+                topics_data = jsonapi.loads(data) if data else {}
+        except Exception:
+            _log.exception('error loading %s', self._protected_topics_file)
+        else:
+            write_protect = topics_data.get('write-protect', [])
+            topics = ProtectedPubSubTopics()
+            try:
+                for entry in write_protect:
+                    topics.add(entry['topic'], entry['capabilities'])
+            except KeyError:
+                _log.exception('invalid format for protected topics '
+                               'file {}'.format(self._protected_topics_file))
+            else:
+                self.vip.pubsub.protected_topics = topics
+                _log.info('protected-topics file %s loaded',
+                          self._protected_topics_file)
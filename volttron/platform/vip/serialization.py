@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""Serializers for RPC and pubsub message bodies.
+
+JSON is the format every peer understands. Binary serializers (currently
+msgpack) are only used with a peer after that peer has advertised them
+in a hello/welcome exchange, or after it has sent us a message encoded
+with one. Binary bodies start with a one byte marker so the receiver can
+tell the format of each message. JSON bodies are unchanged, so older
+peers receive exactly what they always have.
+
+The serializers offered by an agent default to every available one in
+order of preference. Set the VOLTTRON_SERIALIZERS environment variable
+to a comma separated list (e.g. ``json``) to restrict them.
+"""
+
+from __future__ import absolute_import
+
+import os
+
+from zmq.utils import jsonapi
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+__all__ = ['JSON', 'MSGPACK', 'PeerSerializers', 'available', 'detect',
+           'get', 'negotiate']
+
+
+class JSONSerializer(object):
+    name = b'json'
+    marker = None
+
+    def dumps(self, obj):
+        return jsonapi.dumps(obj)
+
+    def loads(self, data):
+        return jsonapi.loads(data)
+
+
+def _json_key(key):
+    """Return key as JSON would turn it into an object key."""
+    if key is True:
+        return u'true'
+    if key is False:
+        return u'false'
+    if key is None:
+        return u'null'
+    if isinstance(key, float):
+        return unicode(repr(key))
+    if isinstance(key, (int, long)):
+        return unicode(key)
+    raise ValueError('invalid object key: {!r}'.format(key))
+
+
+def _json_object(dct):
+    for key in dct:
+        if type(key) is not unicode:
+            return {key if type(key) is unicode else _json_key(key): value
+                    for key, value in dct.iteritems()}
+    return dct
+
+
+class MsgpackSerializer(object):
+    """Encodes messages with msgpack.
+
+    Decoded messages have the same types JSON would give: strings are
+    unicode, sequences are lists and object keys are strings.
+    """
+    name = b'msgpack'
+    # 0xc1 is never used by the msgpack format and can never start a
+    # JSON document.
+    marker = b'\xc1'
+
+    def dumps(self, obj):
+        try:
+            # Byte strings are packed as text, as JSON encodes them.
+            return self.marker + msgpack.packb(obj, use_bin_type=False)
+        except (TypeError, ValueError, OverflowError):
+            # Let JSON handle (or reject) what msgpack cannot encode,
+            # such as integers wider than 64 bits. The receiver detects
+            # the format per message.
+            return JSON.dumps(obj)
+
+    def loads(self, data):
+        return msgpack.unpackb(memoryview(data)[1:], raw=False,
+                               object_hook=_json_object)
+
+
+JSON = JSONSerializer()
+MSGPACK = MsgpackSerializer() if msgpack is not None else None
+
+_serializers = {s.name: s for s in [JSON, MSGPACK] if s is not None}
+_preference = [b'msgpack', b'json']
+
+
+def get(name):
+    """Return the serializer named name or None if it is unavailable."""
+    return _serializers.get(name)
+
+
+def available():
+    """Return the names of the serializers this agent offers.
+
+    The names are in order of preference and always include json.
+    """
+    names = os.environ.get('VOLTTRON_SERIALIZERS')
+    if names:
+        names = [name.strip() for name in names.split(',')]
+    else:
+        names = _preference
+    names = [name for name in names if name in _serializers]
+    if JSON.name not in names:
+        names.append(JSON.name)
+    return tuple(names)
+
+
+def detect(data):
+    """Return the serializer that encoded the message body data."""
+    if MSGPACK is not None and data[:1] == MSGPACK.marker:
+        return MSGPACK
+    return JSON
+
+
+def negotiate(local, remote):
+    """Return the first serializer in local that remote also offers."""
+    for name in local:
+        if name in remote:
+            return _serializers[name]
+    return JSON
+
+
+class PeerSerializers(object):
+    """Track the serializer to use with each peer.
+
+    :param names: Serializers offered by this agent in order of
+                  preference. Defaults to :py:func:`available`.
+    """
+
+    def __init__(self, names=None):
+        self.names = tuple(names) if names else available()
+        self._peers = {}
+
+    def advertisement(self):
+        """Return the hello frame listing the serializers offered."""
+        return b','.join(self.names)
+
+    def update(self, peer, advertisement):
+        """Record the serializers advertised by peer.
+
+        An advertisement of None, as from peers which predate serializer
+        negotiation, selects JSON.
+        """
+        remote = advertisement.split(b',') if advertisement else ()
+        self._peers[peer] = negotiate(self.names, remote)
+
+    def learn(self, peer, serializer):
+        """Record that peer sent a message encoded with serializer."""
+        if serializer is not JSON and serializer.name in self.names:
+            self._peers[peer] = serializer
+
+    def get(self, peer):
+        """Return the serializer negotiated with peer or None."""
+        return self._peers.get(peer)
+
+    def forget(self, peer):
+        self._peers.pop(peer, None)
+
+    def clear(self):
+        self._peers.clear()
@@ -60,6 +60,7 @@ import logging
 import os
 import re
 import requests
+import socket
 import sys
 from urlparse import urlparse, urljoin
 
@@ -67,6 +68,7 @@ from gevent import pywsgi
 
 import gevent
 import gevent.pywsgi
+from ws4py.messaging import TextMessage
 from ws4py.websocket import WebSocket
 
 from ws4py.server.geventserver import (WebSocketWSGIApplication,
@@ -209,12 +211,15 @@ class VolttronWebSocket(WebSocket):
         # self.clients is set from within the server
         # and holds the list of all connected servers
         # we can dispatch to
-        self._log.debug('Socket received message: {}'.format(m))
+        self._log.debug('Socket received message: %s', m)
         app = self.environ['ws4py.app']
         identity, endpoint = self._get_identity_and_endpoint()
-        ip = self.environ['']
         app.client_received(endpoint, m)
 
+    def send_frames(self, data):
+        """Write already framed websocket messages to the client."""
+        self._write(data)
+
     def closed(self, code, reason="A client left the room without a proper explanation."):
         self._log.info('Socket closed!')
         app = self.environ.pop('ws4py.app')
@@ -234,8 +239,16 @@ class WebApplicationWrapper(object):
     """ A container class that will hold all of the applications registered
     with it.  The class provides a contianer for managing the routing of
     websocket, static content, and rpc function calls.
+
+    Websocket messages are batched per endpoint in both directions.
+    Messages sent to an endpoint are framed once and written to each
+    client together. Messages received on an endpoint are delivered to
+    the registered agent in a single notification. A batch is flushed
+    flush_interval seconds after its first message or once it holds
+    batch_size messages. A flush_interval of 0 disables batching.
     """
-    def __init__(self, masterweb, host, port):
+    def __init__(self, masterweb, host, port, flush_interval=0.05,
+                 batch_size=100):
         self.masterweb = masterweb
         self.port = port
         self.host = host
@@ -243,6 +256,10 @@ class WebApplicationWrapper(object):
         self.clients = []
         self.endpoint_clients = {}
         self._wsregistry = {}
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._outbound = {}
+        self._inbound = {}
         self._log = logging.getLogger(self.__class__.__name__)
 
     def favicon(self, environ, start_response):
@@ -277,10 +294,16 @@ class WebApplicationWrapper(object):
             self.endpoint_clients[endpoint].add((identity, client))
 
     def client_received(self, endpoint, message):
-        clients = self.endpoint_clients.get(endpoint, [])
-        for identity, _ in clients:
-            self.masterweb.vip.rpc.call(identity, 'client.message',
-                                        str(endpoint), str(message))
+        if endpoint in self._wsregistry:
+            self._batch(self._inbound, endpoint, str(message),
+                        self._flush_inbound)
+
+    def _flush_inbound(self, endpoint):
+        messages = self._inbound.pop(endpoint, None)
+        identity = self._wsregistry.get(endpoint)
+        if messages and identity:
+            self.masterweb.vip.rpc.notify(identity, 'client.messages',
+                                          str(endpoint), messages)
 
     def client_closed(self, client, endpoint, identity,
                       reason="Client left without proper explaination"):
@@ -319,16 +342,39 @@ class WebApplicationWrapper(object):
             pass
 
     def websocket_send(self, endpoint, message):
-        self._log.debug('Sending message to clients!')
-        clients = self.endpoint_clients.get(endpoint, [])
-        if not clients:
-            self._log.warn("There were no clients for endpoint {}".format(
-                endpoint))
-        for c in clients:
-            identity, client = c
-            self._log.debug('Sending endpoint&&message {}&&{}'.format(
-                endpoint, message))
-            client.send(message)
+        if not self.endpoint_clients.get(endpoint):
+            self._log.warn("There were no clients for endpoint %s", endpoint)
+            return
+        frame = TextMessage(message).single(mask=False)
+        self._batch(self._outbound, endpoint, frame, self._flush_outbound)
+
+    def _flush_outbound(self, endpoint):
+        frames = self._outbound.pop(endpoint, None)
+        if not frames:
+            return
+        data = b''.join(frames)
+        clients = list(self.endpoint_clients.get(endpoint, ()))
+        if self._log.isEnabledFor(logging.DEBUG):
+            self._log.debug('Sending %d messages (%d bytes) to %d clients of '
+                            '%s', len(frames), len(data), len(clients),
+                            endpoint)
+        for identity, client in clients:
+            try:
+                client.send_frames(data)
+            except (RuntimeError, socket.error) as exc:
+                self._log.debug('Unable to send to client of %s: %s',
+                                endpoint, exc)
+
+    def _batch(self, pending, endpoint, item, flush):
+        try:
+            batch = pending[endpoint]
+        except KeyError:
+            batch = pending[endpoint] = []
+            if self.flush_interval > 0:
+                gevent.spawn_later(self.flush_interval, flush, endpoint)
+        batch.append(item)
+        if len(batch) >= self.batch_size or self.flush_interval <= 0:
+            flush(endpoint)
 
     def __call__(self, environ, start_response):
         """
@@ -355,13 +401,19 @@ class MasterWebService(Agent):
     """
 
     def __init__(self, serverkey, identity, address, bind_web_address, aip,
-                 volttron_central_address=None, **kwargs):
+                 volttron_central_address=None, ws_flush_interval=0.05,
+                 ws_batch_size=100, **kwargs):
         """Initialize the discovery service with the serverkey
 
         serverkey is the public key in order to access this volttron's bus.
+        ws_flush_interval and ws_batch_size control the batching of
+        websocket messages (see :class:`WebApplicationWrapper`).
         """
         super(MasterWebService, self).__init__(identity, address, **kwargs)
 
+        self.ws_flush_interval = ws_flush_interval
+        self.ws_batch_size = ws_batch_size
+
         self.bind_web_address = bind_web_address
         self.serverkey = serverkey
         self.registeredroutes = []
@@ -396,8 +448,7 @@ class MasterWebService(Agent):
 
     @RPC.export
     def websocket_send(self, endpoint, message):
-        _log.debug("Sending data to {} with message {}".format(endpoint,
-                                                               message))
+        _log.debug("Sending data to %s with message %s", endpoint, message)
         self.appContainer.websocket_send(endpoint, message)
 
     @RPC.export
@@ -709,7 +760,9 @@ class MasterWebService(Agent):
         if not os.path.exists(logdir):
             os.makedirs(logdir)
 
-        self.appContainer = WebApplicationWrapper(self, hostname, port)
+        self.appContainer = WebApplicationWrapper(
+            self, hostname, port, flush_interval=self.ws_flush_interval,
+            batch_size=self.ws_batch_size)
         svr = WSGIServer((hostname, port), self.appContainer)
         self._server_greenlet = gevent.spawn(svr.serve_forever)
 
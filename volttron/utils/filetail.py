@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""Follow a growing file, such as a log, across truncation and rotation."""
+
+import io
+import logging
+import os
+
+_log = logging.getLogger(__name__)
+
+# Largest amount of a file read in one go while catching up.
+READ_SIZE = 1024 * 1024
+
+
+class FileTail(object):
+    """Keeps a file open and returns the complete lines appended to it.
+
+    The device and inode of the open file are compared with the path on
+    every read so that a file that has been truncated (copytruncate) or
+    replaced (rename and create) is detected. A replaced file is read to
+    its end before the new file is opened from the beginning. A file that
+    does not exist yet is read from the beginning once it is created.
+
+    :param path: Path of the file to follow.
+    :param inode: Inode recorded with `offset` by a previous run.
+    :param offset: Offset to resume from if the file at `path` still has
+                   the recorded inode. Without a recorded offset reading
+                   starts at the end of the file.
+    """
+    def __init__(self, path, inode=None, offset=None):
+        self.path = path
+        self._file = None
+        self.inode = None
+        self.position = 0
+        self._open(inode, offset)
+
+    def _open(self, inode=None, offset=None):
+        try:
+            # Unbuffered so a seek never reuses data from before a truncate.
+            f = io.open(self.path, 'rb', buffering=0)
+        except IOError as e:
+            _log.error("Unable to open %s: %s", self.path, e)
+            return
+        st = os.fstat(f.fileno())
+        if inode is None:
+            position = st.st_size
+        elif inode == st.st_ino and offset <= st.st_size:
+            position = offset
+        else:
+            _log.info("%s changed since offset was recorded, reading "
+                      "from the start", self.path)
+            position = 0
+        f.seek(position)
+        self._file = f
+        self.inode = st.st_ino
+        self.position = position
+
+    def read(self):
+        """Read the complete lines written since the last call.
+
+        :returns: List of (inode, start offset, lines) chunks. There is more
+                  than one chunk only when the file was truncated or
+                  replaced. Lines do not include the newline.
+        :rtype: list
+        """
+        chunks = []
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # Rotated away and not recreated yet.
+            st = None
+
+        if self._file is None:
+            if st is not None:
+                self._open(st.st_ino, 0)
+        elif st is not None and st.st_ino != self.inode:
+            chunks.append(self._read_lines())
+            self.close()
+            _log.info("%s was replaced, reopening", self.path)
+            self._open(st.st_ino, 0)
+        elif st is not None and st.st_size < self.position:
+            _log.info("%s was truncated, reading from the start", self.path)
+            self._file.seek(0)
+            self.position = 0
+
+        if self._file is not None:
+            chunks.append(self._read_lines())
+        return [chunk for chunk in chunks if chunk[2]]
+
+    def lines(self):
+        """Return the complete lines written since the last call."""
+        return [line for _, _, lines in self.read() for line in lines]
+
+    def _read_lines(self):
+        start = self.position
+        lines = []
+        buf = ''
+        while True:
+            data = self._file.read(READ_SIZE)
+            if not data:
+                break
+            buf += data
+            end = buf.rfind('\n')
+            if end < 0:
+                continue
+            lines.extend(buf[:end].split('\n'))
+            self.position += end + 1
+            buf = buf[end + 1:]
+        if buf:
+            # Keep a partial line until the writer finishes it.
+            self._file.seek(self.position)
+        return self.inode, start, lines
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
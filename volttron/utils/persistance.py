@@ -1,6 +1,7 @@
 # Module copied from
 # http://code.activestate.com/recipes/576642-persistent-dict-with-multiple-standard-file-format/
-import pickle, json, csv, os, shutil, shelve, logging
+import pickle, json, csv, os, shutil, shelve, logging, struct, errno, hashlib
+from collections import OrderedDict
 from threading import Thread
 from Queue import Queue
 from copy import deepcopy
@@ -51,10 +52,18 @@ class PersistentDict(dict):
     @staticmethod
     def _process_loop():
         while True:
-            filename, contents, format, mode = PersistentDict._event_queue.get()
-
-            PersistentDict._update_file(filename, contents, format, mode)
+            func, args = PersistentDict._event_queue.get()
+            try:
+                func(*args)
+            except Exception:
+                _log.exception("Error writing persistent store")
+            finally:
+                PersistentDict._event_queue.task_done()
 
+    @staticmethod
+    def wait_for_writes():
+        """ Block until all writes queued by async_sync are on disk """
+        PersistentDict._event_queue.join()
 
     def sync(self):
         """ Write dict to disk """
@@ -66,7 +75,8 @@ class PersistentDict(dict):
         """Write dict to disk via worker thread. Don't mix with sync if it can be helped"""
         if self.flag == 'r':
             return
-        PersistentDict._event_queue.put((self.filename, deepcopy(self), self.format, self.mode))
+        PersistentDict._event_queue.put((PersistentDict._update_file,
+                                         (self.filename, deepcopy(self), self.format, self.mode)))
 
     @staticmethod
     def _update_file(filename, contents, format, mode):
@@ -123,6 +133,275 @@ class PersistentDict(dict):
         raise ValueError('File not in a supported format')
 
 
+JOURNAL_RECORD_HEADER = struct.Struct('>I')
+
+
+def _encode_records(records):
+    chunks = []
+    for record in records:
+        payload = json.dumps(record, separators=(',', ':'))
+        chunks.append(JOURNAL_RECORD_HEADER.pack(len(payload)))
+        chunks.append(payload)
+    return ''.join(chunks)
+
+
+def _decode_records(data):
+    """ Yield each complete journal record in data and its end offset. """
+    offset = 0
+    header_size = JOURNAL_RECORD_HEADER.size
+    while offset + header_size <= len(data):
+        (length,) = JOURNAL_RECORD_HEADER.unpack_from(data, offset)
+        end = offset + header_size + length
+        if end > len(data):
+            return
+        try:
+            record = json.loads(data[offset + header_size:end])
+        except ValueError:
+            return
+        yield record, end
+        offset = end
+
+
+# Size of the record that starts a journal; digests are 40 hex digits.
+JOURNAL_START_SIZE = len(_encode_records([['snapshot', '0' * 40]]))
+
+
+class JournaledPersistentDict(PersistentDict):
+    """ Persistent dictionary that records changes in an append-only journal.
+
+    Instead of rewriting the whole file async_sync appends one length
+    prefixed JSON record per changed key to filename + '.journal'. Once the
+    journal grows past compact_threshold bytes the worker thread writes a
+    new snapshot to filename and removes the journal.
+
+    The journal starts with a record holding the digest of the snapshot it
+    applies to and loading only replays it on top of that snapshot. A
+    journal left behind by a crash during compaction belongs to an older
+    snapshot and is ignored. A partially written final record, as left by
+    a crash, is discarded.
+
+    Only changes made through the dict interface are journaled, so values
+    must be replaced rather than modified in place. Only the json format
+    is supported.
+
+    """
+
+    def __init__(self, filename, flag='c', mode=None, format='json',
+                 compact_threshold=1024*1024, *args, **kwds):
+        if format != 'json':
+            raise ValueError('JournaledPersistentDict only supports the json format')
+
+        self.journal_filename = filename + '.journal'
+        self.compact_threshold = compact_threshold
+        self._recording = False
+        self._changes = OrderedDict()
+        self._cleared = False
+
+        super(JournaledPersistentDict, self).__init__(filename, flag, mode, format, *args, **kwds)
+
+        # Digest of the snapshot on disk, needed to start a new journal.
+        self._snapshot_digest = None
+        if flag != 'n':
+            self._snapshot_digest = JournaledPersistentDict._file_digest(filename)
+        self._has_snapshot = self._snapshot_digest is not None
+        # Size of the valid journal; 0 when a new one must be started.
+        self._journal_size = 0
+        if self._has_snapshot:
+            self._journal_size = self._replay_journal()
+
+        self._recording = True
+
+    def _record(self, key):
+        if self._recording:
+            self._changes.pop(key, None)
+            self._changes[key] = True
+
+    def __setitem__(self, key, value):
+        super(JournaledPersistentDict, self).__setitem__(key, value)
+        self._record(key)
+
+    def __delitem__(self, key):
+        super(JournaledPersistentDict, self).__delitem__(key)
+        self._record(key)
+
+    def pop(self, key, *args):
+        result = super(JournaledPersistentDict, self).pop(key, *args)
+        self._record(key)
+        return result
+
+    def popitem(self):
+        key, value = super(JournaledPersistentDict, self).popitem()
+        self._record(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwds):
+        for key, value in dict(*args, **kwds).iteritems():
+            self[key] = value
+
+    def clear(self):
+        super(JournaledPersistentDict, self).clear()
+        if self._recording:
+            self._changes.clear()
+            self._cleared = True
+
+    def sync(self):
+        """ Write pending changes to disk """
+        if self.flag == 'r':
+            return
+        PersistentDict.wait_for_writes()
+        self._write_changes(lambda event: event[0](*event[1]))
+
+    def async_sync(self):
+        """Write pending changes to disk via worker thread."""
+        if self.flag == 'r':
+            return
+        self._write_changes(PersistentDict._event_queue.put)
+
+    def _write_changes(self, submit):
+        if not self:
+            # Mirror PersistentDict and remove the store when it is empty.
+            self._changes.clear()
+            self._cleared = False
+            self._journal_size = 0
+            self._has_snapshot = False
+            submit((JournaledPersistentDict._remove_files,
+                    (self.filename, self.journal_filename)))
+            return
+
+        data = self._encode_changes()
+
+        if not self._has_snapshot or self._journal_size + len(data) > self.compact_threshold:
+            # The snapshot includes the changes so they are not journaled.
+            # _compact replaces the journal with one for the new snapshot.
+            self._journal_size = JOURNAL_START_SIZE
+            self._has_snapshot = True
+            self._snapshot_digest = None
+            submit((JournaledPersistentDict._compact,
+                    (self.filename, self.journal_filename, dict(self), self.mode)))
+        elif data:
+            start = self._journal_size == 0
+            if start:
+                # Replaces a journal that belongs to an older snapshot.
+                data = _encode_records([['snapshot', self._snapshot_digest]]) + data
+            self._journal_size += len(data)
+            submit((JournaledPersistentDict._append,
+                    (self.journal_filename, data, self.mode, start)))
+
+    def _encode_changes(self):
+        records = []
+        if self._cleared:
+            records.append(['clear'])
+        for key in self._changes:
+            if key in self:
+                records.append(['set', key, dict.__getitem__(self, key)])
+            else:
+                records.append(['del', key])
+
+        self._changes.clear()
+        self._cleared = False
+        return _encode_records(records)
+
+    def _replay_journal(self):
+        """ Apply the journal to the loaded snapshot.
+
+        Returns the size in bytes of the valid part of the journal, or 0 if
+        there is no journal for the snapshot.
+        """
+        try:
+            with open(self.journal_filename, 'rb') as fileobj:
+                data = fileobj.read()
+        except IOError:
+            return 0
+
+        records = _decode_records(data)
+        try:
+            (operation, digest), offset = next(records)
+        except (StopIteration, ValueError, TypeError):
+            operation = digest = offset = None
+        if operation != 'snapshot' or digest != self._snapshot_digest:
+            _log.warning("Ignoring {} as it does not belong to the snapshot in {}".format(self.journal_filename,
+                                                                                         self.filename))
+            return 0
+
+        for record, end in records:
+            try:
+                self._apply_record(record)
+            except (ValueError, TypeError, IndexError):
+                break
+            offset = end
+
+        if offset < len(data):
+            _log.warning("Discarding {} bytes of incomplete journal in {}".format(len(data) - offset,
+                                                                                  self.journal_filename))
+            if self.flag != 'r':
+                with open(self.journal_filename, 'r+b') as fileobj:
+                    fileobj.truncate(offset)
+
+        return offset
+
+    def _apply_record(self, record):
+        operation = record[0]
+        if operation == 'set':
+            dict.__setitem__(self, record[1], record[2])
+        elif operation == 'del':
+            dict.pop(self, record[1], None)
+        elif operation == 'clear':
+            dict.clear(self)
+        else:
+            raise ValueError('Unknown journal operation: ' + repr(operation))
+
+    @staticmethod
+    def _append(journal_filename, data, mode, start=False):
+        with open(journal_filename, 'wb' if start else 'ab') as fileobj:
+            fileobj.write(data)
+        if mode is not None:
+            os.chmod(journal_filename, mode)
+
+    @staticmethod
+    def _compact(filename, journal_filename, contents, mode):
+        snapshot = json.dumps(contents, separators=(',', ':'))
+        digest = hashlib.sha1(snapshot).hexdigest()
+        JournaledPersistentDict._replace_file(filename, snapshot, mode)
+        # A crash before the journal is replaced leaves the old journal.
+        # It is ignored as it does not match the new snapshot, unless the
+        # snapshot did not change, in which case it restores the state
+        # from before the compaction.
+        JournaledPersistentDict._replace_file(journal_filename,
+                                              _encode_records([['snapshot', digest]]),
+                                              mode)
+
+    @staticmethod
+    def _replace_file(filename, data, mode):
+        tempname = filename + '.tmp'
+        with open(tempname, 'wb') as fileobj:
+            fileobj.write(data)
+        shutil.move(tempname, filename)  # atomic commit
+        if mode is not None:
+            os.chmod(filename, mode)
+
+    @staticmethod
+    def _file_digest(filename):
+        try:
+            with open(filename, 'rb') as fileobj:
+                return hashlib.sha1(fileobj.read()).hexdigest()
+        except IOError:
+            return None
+
+    @staticmethod
+    def _remove_files(*filenames):
+        for filename in filenames:
+            try:
+                os.remove(filename)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+
 if __name__ == '__main__':
     import random
 
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import io
+import logging
+import marshal
+
+import pytest
+
+from volttron.platform.agent.utils import (BatchedLogHandler, JsonFormatter,
+                                           LOG_BATCH_MARKER, LOG_BATCH_HEADER)
+from volttron.platform.aip import log_entries, agent_log_level
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def platform_log():
+    log = logging.getLogger('agents.log')
+    handler = CaptureHandler()
+    log.addHandler(handler)
+    log.setLevel(logging.DEBUG)
+    yield handler
+    log.removeHandler(handler)
+    log.setLevel(logging.NOTSET)
+
+
+@pytest.fixture
+def agent_logger():
+    log = logging.getLogger('test.agent.transport')
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+
+    def with_handler(handler):
+        log.handlers = [handler]
+        return log
+
+    yield with_handler
+    log.handlers = []
+    log.setLevel(logging.NOTSET)
+
+
+def test_batches_are_read_between_text_lines(platform_log, agent_logger):
+    stream = io.BytesIO()
+    handler = BatchedLogHandler(stream, capacity=2)
+    log = agent_logger(handler)
+
+    stream.write('plain text\n')
+    log.debug('first %s', 1)
+    log.info(u'second ☃')
+    stream.write('<3>syslog error\n')
+    try:
+        raise ValueError('bad')
+    except ValueError:
+        log.exception('failed')
+    handler.close()
+
+    stream.seek(0)
+    lines = list(log_entries('agents.log', 'agent', 1234, logging.INFO, stream))
+
+    assert lines == [(logging.INFO, 'plain text'),
+                     (logging.ERROR, 'syslog error')]
+    records = platform_log.records
+    assert [r.getMessage() for r in records] == ['first 1', u'second ☃', 'failed']
+    assert [r.levelno for r in records] == [logging.DEBUG, logging.INFO, logging.ERROR]
+    assert all(r.remote_name == 'test.agent.transport' for r in records)
+    assert all(r.process == 1234 and r.processName == 'agent' for r in records)
+    assert 'ValueError: bad' in records[2].exc_text
+
+
+def test_batch_is_written_at_flush_level_or_capacity(agent_logger):
+    stream = io.BytesIO()
+    handler = BatchedLogHandler(stream, capacity=3)
+    log = agent_logger(handler)
+
+    log.debug('one')
+    log.debug('two')
+    assert stream.getvalue() == ''
+    log.debug('three')
+    written = stream.getvalue()
+    assert written
+    log.warning('four')
+    assert len(stream.getvalue()) > len(written)
+    handler.close()
+
+
+def test_malformed_batches_are_discarded(platform_log):
+    def batch(payload):
+        return LOG_BATCH_MARKER + LOG_BATCH_HEADER.pack(len(payload)) + payload
+
+    stream = io.BytesIO(batch(marshal.dumps([{'name': 'x'}])) +
+                        batch(b'{"not": "a list"}') +
+                        batch(b'\xc1\xc1') +
+                        'after\n')
+    lines = list(log_entries('agents.log', 'agent', 1, logging.INFO, stream))
+    assert lines == [(logging.INFO, 'after')]
+    assert platform_log.records == []
+
+
+def test_json_lines_are_still_accepted(platform_log):
+    record = logging.LogRecord('json.agent', logging.WARNING, __file__, 1,
+                               'from %s', ('json',), None)
+    stream = io.BytesIO(JsonFormatter().format(record) + '\n')
+    assert list(log_entries('agents.log', 'agent', 1, logging.INFO, stream)) == []
+    assert platform_log.records[0].getMessage() == 'from json'
+
+
+def test_agent_log_level_includes_configured_loggers():
+    configured = logging.getLogger('test.agent.configured')
+    logging.getLogger('agents.log').setLevel(logging.WARNING)
+    try:
+        assert agent_log_level() == logging.WARNING
+        configured.setLevel(logging.DEBUG)
+        assert agent_log_level() == logging.DEBUG
+    finally:
+        configured.setLevel(logging.NOTSET)
+        logging.getLogger('agents.log').setLevel(logging.NOTSET)
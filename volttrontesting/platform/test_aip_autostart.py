@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import argparse
+
+import gevent
+import pytest
+
+from volttron.platform.aip import AIPplatform
+
+
+class FakeWatcher(object):
+    def __init__(self, connected):
+        self.connected = connected
+
+    def wait(self, identity, timeout=None):
+        return identity in self.connected
+
+
+class AutostartPlatform(AIPplatform):
+    '''AIP with installed agents faked out.'''
+
+    def __init__(self, priorities, **env):
+        env.setdefault('autostart_concurrency', 4)
+        super(AutostartPlatform, self).__init__(argparse.Namespace(**env))
+        self.priorities = priorities
+        self.events = []
+
+    def list_agents(self):
+        return {agent_uuid: agent_uuid for agent_uuid in self.priorities}
+
+    def _agent_priority(self, agent_uuid):
+        return self.priorities[agent_uuid]
+
+    def agent_identity(self, agent_uuid):
+        return agent_uuid + '.identity'
+
+    def start_agent(self, agent_uuid, quiet=False):
+        self.events.append(('begin', agent_uuid))
+        gevent.sleep(0.01)
+        if agent_uuid == 'broken':
+            raise ValueError('cannot start')
+        self.events.append(('end', agent_uuid))
+
+
+def test_tiers_start_concurrently_in_priority_order():
+    platform = AutostartPlatform({'a': '80', 'b': '80', 'c': '50',
+                                  'broken': '50', 'disabled': None})
+    errors = platform.autostart()
+
+    assert errors == [('broken', 'cannot start')]
+    begun = [agent for event, agent in platform.events if event == 'begin']
+    assert sorted(begun[:2]) == ['a', 'b']
+    assert sorted(begun[2:]) == ['broken', 'c']
+    # Both agents of the first tier begin before either finishes and the
+    # second tier waits for the first.
+    assert [event for event, _ in platform.events[:2]] == ['begin', 'begin']
+    assert platform.events.index(('begin', 'c')) > platform.events.index(('end', 'a'))
+    assert sorted(platform.start_latencies) == ['a', 'b', 'c']
+    assert all(ready is None for _, ready in platform.start_latencies.values())
+
+
+def test_concurrency_is_bounded():
+    platform = AutostartPlatform({'a': '50', 'b': '50', 'c': '50'},
+                                 autostart_concurrency=1)
+    platform.autostart()
+    assert [event for event, _ in platform.events] == ['begin', 'end'] * 3
+
+
+def test_ready_barrier():
+    platform = AutostartPlatform({'a': '50', 'b': '50'},
+                                 autostart_ready_timeout=0.1)
+    errors = platform._autostart_tier(['a', 'b'], FakeWatcher({'a.identity'}))
+
+    assert errors == [('b', 'agent did not connect to the platform '
+                            'within 0.1 seconds')]
+    started, ready = platform.start_latencies['a']
+    assert ready >= started
+    assert platform.start_latencies['b'][1] is None
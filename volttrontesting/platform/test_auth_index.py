@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import random
+
+import pytest
+
+from volttron.platform.auth import AuthEntry, AuthService, dump_user
+
+
+def key(char):
+    return char * 43
+
+
+def linear_authenticate(entries, domain, address, mechanism, credentials):
+    for entry in entries:
+        if entry.match(domain, address, mechanism, credentials):
+            return entry.user_id
+
+
+@pytest.fixture
+def auth_service(tmpdir):
+    service = AuthService(str(tmpdir.join('auth.json')), None,
+                          address='inproc://vip', identity='auth')
+    entries = [
+        AuthEntry(domain='vip', credentials=key('A'), user_id='a-vip'),
+        AuthEntry(credentials=key('A'), user_id='a-any', capabilities=['a']),
+        AuthEntry(credentials='/B.*/', user_id='b-regex'),
+        AuthEntry(credentials=key('B'), user_id='b-exact'),
+        AuthEntry(mechanism='PLAIN', credentials=['pw1', 'pw2'],
+                  user_id='pw1-or-pw2'),
+        AuthEntry(mechanism='NULL', address='/127\\..*/', user_id='null'),
+        AuthEntry(mechanism='PLAIN', credentials='secret', user_id='plain',
+                  capabilities=['p']),
+        AuthEntry(credentials='/.*/', user_id='anyone', capabilities=['any']),
+    ]
+    entries.sort()
+    service._index_entries(entries)
+    service.auth_entries = entries
+    return service
+
+
+@pytest.mark.parametrize('query', [
+    ('vip', 'tcp://1.2.3.4', 'CURVE', [key('A')]),
+    ('other', 'tcp://1.2.3.4', 'CURVE', [key('A')]),
+    ('vip', 'tcp://1.2.3.4', 'CURVE', [key('B')]),
+    ('vip', 'tcp://1.2.3.4', 'PLAIN', ['pw2']),
+    ('vip', 'tcp://1.2.3.4', 'CURVE', [key('E')]),
+    ('vip', '127.0.0.1', 'NULL', []),
+    ('vip', '10.0.0.1', 'NULL', []),
+    ('vip', 'tcp://1.2.3.4', 'PLAIN', ['secret']),
+    ('vip', 'tcp://1.2.3.4', 'PLAIN', ['wrong']),
+])
+def test_authenticate_matches_linear_scan(auth_service, query):
+    assert (auth_service.authenticate(*query) ==
+            linear_authenticate(auth_service.auth_entries, *query))
+
+
+def test_authenticate_random_entries(tmpdir):
+    service = AuthService(str(tmpdir.join('auth.json')), None,
+                          address='inproc://vip', identity='auth')
+    rand = random.Random(3)
+    chars = 'ABCDEFGH'
+    entries = []
+    for index in xrange(200):
+        domain = rand.choice([None, 'vip', 'other', '/v.*/'])
+        if rand.random() < 0.2:
+            credentials = '/{}.*/'.format(rand.choice(chars))
+        else:
+            credentials = key(rand.choice(chars))
+        entries.append(AuthEntry(domain=domain, credentials=credentials,
+                                 user_id='user{}'.format(index)))
+    entries.sort()
+    service._index_entries(entries)
+    service.auth_entries = entries
+    for _ in xrange(500):
+        query = (rand.choice(['vip', 'other', 'x']), 'tcp://1.2.3.4',
+                 'CURVE', [key(rand.choice(chars + 'XY'))])
+        assert (service.authenticate(*query) ==
+                linear_authenticate(entries, *query))
+
+
+def test_get_authorizations(auth_service):
+    assert auth_service.get_capabilities('a-any') == ['a']
+    assert auth_service.get_capabilities('unknown') == []
+    user = dump_user('vip', 'tcp://1.2.3.4', 'CURVE', key('Z'))
+    assert auth_service.get_capabilities(user) == ['any']
+    user = dump_user('vip', 'tcp://1.2.3.4', 'PLAIN', 'secret')
+    assert auth_service.get_capabilities(user) == ['p']
+    user = dump_user('vip', 'tcp://1.2.3.4', 'PLAIN', 'wrong')
+    assert auth_service.get_capabilities(user) == []
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+"""
+Tests for following files with FileTail.
+"""
+
+import os
+
+from volttron.utils.filetail import FileTail
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def test_tail_starts_at_end_and_holds_partial_lines(tmpdir):
+    path = str(tmpdir.join('log'))
+    append(path, 'old\n')
+    tail = FileTail(path)
+
+    append(path, 'one\ntw')
+    assert tail.read() == [(tail.inode, 4, ['one'])]
+    append(path, 'o\n')
+    assert tail.read() == [(tail.inode, 8, ['two'])]
+    assert tail.read() == []
+
+
+def test_tail_follows_truncate_and_replace(tmpdir):
+    path = str(tmpdir.join('log'))
+    append(path, 'old\n')
+    tail = FileTail(path)
+
+    # copytruncate
+    with open(path, 'wb') as f:
+        f.write('a\n')
+    assert tail.read() == [(tail.inode, 0, ['a'])]
+
+    # rename and create, with a late write to the old file.
+    old_inode = tail.inode
+    os.rename(path, path + '.1')
+    append(path + '.1', 'b\n')
+    append(path, 'c\n')
+    assert tail.read() == [(old_inode, 2, ['b']), (tail.inode, 0, ['c'])]
+    assert tail.inode != old_inode
+
+
+def test_tail_resumes_from_recorded_offset(tmpdir):
+    path = str(tmpdir.join('log'))
+    append(path, 'one\ntwo\n')
+    inode = os.stat(path).st_ino
+
+    tail = FileTail(path, inode, 4)
+    assert tail.read() == [(inode, 4, ['two'])]
+
+    # A different file at the path is read from the start.
+    tail = FileTail(path, inode + 1, 4)
+    assert tail.read() == [(inode, 0, ['one', 'two'])]
+
+
+def test_lines_follow_rotation_and_truncation(tmpdir):
+    path = str(tmpdir.join('volttron.log'))
+    append(path, 'old\n')
+    tail = FileTail(path)
+
+    append(path, 'a\nb')
+    assert tail.lines() == ['a']
+    append(path, '\n')
+    assert tail.lines() == ['b']
+
+    os.rename(path, path + '.1')
+    append(path + '.1', 'c\n')
+    append(path, 'd\n')
+    assert tail.lines() == ['c', 'd']
+
+    # copytruncate
+    open(path, 'wb').close()
+    assert tail.lines() == []
+    append(path, 'e\n')
+    assert tail.lines() == ['e']
+
+
+def test_file_created_later_is_read_from_start(tmpdir):
+    path = str(tmpdir.join('log'))
+    tail = FileTail(path)
+    assert tail.read() == []
+
+    append(path, 'a\n')
+    assert tail.lines() == ['a']
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import os
+import signal
+import sys
+
+import gevent
+import pytest
+
+from volttron.platform.aip import process_wait
+from volttron.platform.forkserver import ForkServer
+
+
+@pytest.fixture
+def forkserver():
+    server = ForkServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def agent_env(**extra):
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    env.update(extra)
+    return env
+
+
+def test_spawn_runs_code_with_agent_environment(forkserver, tmpdir):
+    code = ("import os, sys; "
+            "print(os.environ['AGENT_VIP_IDENTITY']); "
+            "print(os.getcwd()); "
+            "sys.stderr.write('to stderr\\n'); "
+            "sys.exit(3)")
+    proc = forkserver.spawn([sys.executable, '-c', code], str(tmpdir),
+                            agent_env(AGENT_VIP_IDENTITY='forked.agent'))
+    assert proc.pid != os.getpid()
+    lines = [line.rstrip('\n') for line in proc.stdout]
+    assert lines == ['forked.agent', str(tmpdir)]
+    assert proc.stderr.read() == 'to stderr\n'
+    assert gevent.with_timeout(5, process_wait, proc) == 3
+
+
+def test_spawn_runs_module_as_main(forkserver, tmpdir):
+    tmpdir.join('noop_agent.py').write(
+        "if __name__ == '__main__':\n"
+        "    print('ready')\n")
+    env = agent_env()
+    env['PYTHONPATH'] = str(tmpdir) + os.pathsep + env['PYTHONPATH']
+    proc = forkserver.spawn([sys.executable, '-m', 'noop_agent'], str(tmpdir), env)
+    assert proc.stdout.read() == 'ready\n'
+    assert gevent.with_timeout(5, process_wait, proc) == 0
+
+
+def test_signals_reach_forked_process(forkserver, tmpdir):
+    code = "import time; print('ready'); time.sleep(30)"
+    proc = forkserver.spawn([sys.executable, '-c', code], str(tmpdir), agent_env())
+    assert proc.stdout.readline() == 'ready\n'
+    assert proc.poll() is None
+    proc.send_signal(signal.SIGINT)
+    assert gevent.with_timeout(5, process_wait, proc) == 1
+    # Signalling a process that has exited is a no-op.
+    proc.kill()
+
+
+def test_wait_times_out(forkserver, tmpdir):
+    code = "import time; print('ready'); time.sleep(30)"
+    proc = forkserver.spawn([sys.executable, '-c', code], str(tmpdir), agent_env())
+    assert proc.stdout.readline() == 'ready\n'
+    assert proc.wait(timeout=0.2) is None
+    proc.kill()
+    assert proc.wait(timeout=5) == -signal.SIGKILL
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import json
+import os
+import shutil
+
+import pytest
+
+from volttron.utils.persistance import (PersistentDict,
+                                        JournaledPersistentDict,
+                                        JOURNAL_RECORD_HEADER)
+
+
+@pytest.fixture
+def store_path(tmpdir):
+    return str(tmpdir.join('agent.store'))
+
+
+def make_store(path, **kwargs):
+    return JournaledPersistentDict(filename=path, flag='c', format='json', **kwargs)
+
+
+def write(store, key, value):
+    store[key] = value
+    store.async_sync()
+    PersistentDict.wait_for_writes()
+
+
+@pytest.mark.config_store
+def test_changes_are_journaled(store_path):
+    store = make_store(store_path)
+    write(store, 'config', {'type': 'json', 'data': '{}'})
+    snapshot = open(store_path).read()
+
+    write(store, 'registry', {'type': 'csv', 'data': 'a,b'})
+    store.pop('config')
+    store.async_sync()
+    PersistentDict.wait_for_writes()
+
+    # Only the first write creates a snapshot.
+    assert open(store_path).read() == snapshot
+    assert os.path.getsize(store.journal_filename) > 0
+
+    assert make_store(store_path) == {'registry': {'type': 'csv', 'data': 'a,b'}}
+
+
+@pytest.mark.config_store
+def test_journal_compacted(store_path):
+    store = make_store(store_path, compact_threshold=256)
+    for i in range(50):
+        write(store, 'config{}'.format(i), {'type': 'raw', 'data': 'x' * 20})
+
+    if os.path.exists(store.journal_filename):
+        assert os.path.getsize(store.journal_filename) <= 256
+    with open(store_path) as f:
+        assert len(json.load(f)) > 1
+
+    assert make_store(store_path) == store
+
+
+@pytest.mark.config_store
+def test_incomplete_record_discarded(store_path):
+    store = make_store(store_path)
+    write(store, 'a', 1)
+    write(store, 'b', 2)
+
+    # Simulate a crash part way through appending a record.
+    payload = json.dumps(['set', 'c', 3])
+    with open(store.journal_filename, 'ab') as f:
+        f.write(JOURNAL_RECORD_HEADER.pack(len(payload)) + payload[:5])
+
+    recovered = make_store(store_path)
+    assert recovered == {'a': 1, 'b': 2}
+
+    # Later changes must not be hidden behind the torn record.
+    write(recovered, 'd', 4)
+    assert make_store(store_path) == {'a': 1, 'b': 2, 'd': 4}
+
+
+@pytest.mark.config_store
+def test_crash_during_compaction(store_path):
+    store = make_store(store_path)
+    write(store, 'a', 1)
+    write(store, 'b', 2)
+    store.pop('a')
+    store.async_sync()
+    PersistentDict.wait_for_writes()
+    journal = open(store.journal_filename, 'rb').read()
+
+    # Compact, then put the journal back as if we crashed before removing it.
+    store.compact_threshold = 0
+    write(store, 'c', 3)
+    with open(store.journal_filename, 'wb') as f:
+        f.write(journal)
+
+    assert make_store(store_path) == {'b': 2, 'c': 3}
+
+
+def compact_after_crash(store, *changes):
+    """Compact with changes, then put the journal from before the
+    compaction back as if we crashed before replacing it."""
+    journal = open(store.journal_filename, 'rb').read()
+    store.compact_threshold = 0
+    for key, value in changes:
+        store[key] = value
+    store.async_sync()
+    PersistentDict.wait_for_writes()
+    with open(store.journal_filename, 'wb') as f:
+        f.write(journal)
+
+
+@pytest.mark.config_store
+def test_crash_during_compaction_overwriting_journaled_key(store_path):
+    store = make_store(store_path)
+    write(store, 'a', 0)
+    write(store, 'k', 1)
+
+    compact_after_crash(store, ('k', 2), ('padding', 'x' * 100))
+
+    assert make_store(store_path) == {'a': 0, 'k': 2, 'padding': 'x' * 100}
+
+
+@pytest.mark.config_store
+def test_crash_during_compaction_with_journaled_clear(store_path):
+    store = make_store(store_path)
+    write(store, 'a', 1)
+    store.clear()
+    write(store, 'b', 2)
+
+    compact_after_crash(store, ('c', 3))
+
+    recovered = make_store(store_path)
+    assert recovered == {'b': 2, 'c': 3}
+    # The stale journal is replaced by the next write.
+    write(recovered, 'd', 4)
+    assert make_store(store_path) == {'b': 2, 'c': 3, 'd': 4}
+
+
+@pytest.mark.config_store
+def test_clear_and_empty_store(store_path):
+    store = make_store(store_path)
+    write(store, 'a', 1)
+    write(store, 'b', 2)
+    store.clear()
+    write(store, 'c', 3)
+    assert make_store(store_path) == {'c': 3}
+
+    store.pop('c')
+    store.async_sync()
+    PersistentDict.wait_for_writes()
+    assert not os.path.exists(store_path)
+    assert not os.path.exists(store.journal_filename)
+
+
+@pytest.mark.config_store
+def test_loads_existing_store(store_path):
+    legacy = PersistentDict(filename=store_path, flag='c', format='json')
+    legacy['config'] = {'type': 'raw', 'data': 'abc'}
+    legacy.sync()
+
+    store = make_store(store_path)
+    assert store == {'config': {'type': 'raw', 'data': 'abc'}}
+    write(store, 'other', {'type': 'raw', 'data': 'def'})
+    assert make_store(store_path) == {'config': {'type': 'raw', 'data': 'abc'},
+                                      'other': {'type': 'raw', 'data': 'def'}}
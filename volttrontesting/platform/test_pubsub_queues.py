@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+import gevent
+import pytest
+from gevent.event import AsyncResult
+
+from volttron.platform.vip.pubsubservice import OutboundQueues
+
+
+class FakePeers(object):
+    """Records what is sent to each peer and answers pings of
+    responsive peers."""
+
+    def __init__(self, *stalled):
+        self.stalled = set(stalled)
+        self.received = {}
+        self.pings = {}
+        self.disconnected = []
+        self.alerts = []
+
+    def send(self, peer, frames):
+        self.received.setdefault(peer, []).append(frames)
+
+    def ping(self, peer):
+        result = AsyncResult()
+        if peer in self.stalled:
+            self.pings.setdefault(peer, []).append(result)
+        else:
+            result.set([])
+        return result
+
+    def answer(self, peer):
+        self.stalled.discard(peer)
+        for result in self.pings.pop(peer, []):
+            result.set([])
+
+    def disconnect(self, peer):
+        self.disconnected.append(peer)
+
+    def alert(self, peer, stats):
+        self.alerts.append((peer, stats))
+
+    def queues(self, **kwargs):
+        kwargs.setdefault('window', 100)
+        kwargs.setdefault('ack_interval', 10)
+        return OutboundQueues(self.send, self.ping, self.disconnect,
+                              onalert=self.alert, **kwargs)
+
+
+def publish(queues, peers, count):
+    for index in range(count):
+        for peer in peers:
+            queues.push(peer, index)
+        if index % 10 == 0:
+            gevent.sleep(0)
+    gevent.sleep(0.01)
+
+
+def test_stalled_subscriber_does_not_block_others():
+    peers = FakePeers('slow')
+    queues = peers.queues(max_depth=500, watermark=400)
+    publish(queues, ['fast', 'slow'], 5000)
+
+    assert peers.received['fast'] == range(5000)
+    assert peers.received['slow'] == range(100)
+    stats = queues.stats()
+    assert stats['fast']['queued'] == 0
+    assert stats['fast']['dropped'] == 0
+    assert stats['slow']['queued'] == 500
+    assert stats['slow']['in_flight'] == 100
+    assert stats['slow']['dropped'] == 4400
+    assert stats['slow']['over_watermark']
+
+
+def test_subscriber_catches_up():
+    peers = FakePeers('slow')
+    queues = peers.queues()
+    publish(queues, ['slow'], 300)
+    assert len(peers.received['slow']) == 100
+
+    peers.answer('slow')
+    gevent.sleep(0.01)
+    assert peers.received['slow'] == range(300)
+    assert queues.stats()['slow']['queued'] == 0
+
+
+@pytest.mark.parametrize('policy, expected', [
+    ('drop-oldest', range(100) + range(250, 300)),
+    ('drop-newest', range(150)),
+])
+def test_drop_policies(policy, expected):
+    peers = FakePeers('slow')
+    queues = peers.queues(max_depth=50, watermark=50, policy=policy)
+    publish(queues, ['slow'], 300)
+    assert queues.stats()['slow']['dropped'] == 150
+
+    peers.answer('slow')
+    gevent.sleep(0.01)
+    assert peers.received['slow'] == expected
+
+
+def test_disconnect_policy():
+    peers = FakePeers('slow')
+    queues = peers.queues(max_depth=50, watermark=50, policy='disconnect')
+    publish(queues, ['slow'], 151)
+    assert peers.disconnected == ['slow']
+    assert len(peers.alerts) == 1
+    stats = queues.stats()['slow']
+    assert stats['disconnects'] == 1
+    assert stats['queued'] == 0
+
+
+def test_unanswered_ping_times_out():
+    peers = FakePeers('slow')
+    queues = peers.queues(ack_timeout=0.05)
+    publish(queues, ['slow'], 300)
+    assert len(peers.received['slow']) == 100
+
+    # Timed out pings release the window like answered ones.
+    gevent.sleep(0.3)
+    assert peers.received['slow'] == range(300)
+    assert queues.stats()['slow']['queued'] == 0
+
+def test_alert_when_over_watermark():
+    peers = FakePeers('slow')
+    queues = peers.queues(max_depth=1000, watermark=100, alert_delay=0.05)
+    publish(queues, ['slow'], 250)
+    assert not peers.alerts
+    gevent.sleep(0.1)
+    publish(queues, ['slow'], 10)
+    publish(queues, ['slow'], 10)
+    assert len(peers.alerts) == 1
+    peer, stats = peers.alerts[0]
+    assert peer == 'slow'
+    assert stats['queued'] > 100
+
+    with pytest.raises(ValueError):
+        peers.queues(policy='bogus')
+
+
+@pytest.mark.subsystems
+def test_stalled_agent_does_not_block_others(volttron_instance):
+    publisher = volttron_instance.build_agent()
+    fast = volttron_instance.build_agent(identity='queue.fast')
+    slow = volttron_instance.build_agent(identity='queue.slow')
+    received = {fast: [], slow: []}
+    for agent in (fast, slow):
+        agent.vip.pubsub.subscribe(
+            'pubsub', 'queues/test',
+            lambda peer, sender, bus, topic, headers, message, agent=agent:
+            received[agent].append(message)).get(timeout=5)
+    gevent.sleep(0.5)
+
+    # Stop the slow agent from handling pushes and answering pings.
+    slow.core.subsystems[b'RPC'] = lambda message: None
+    slow.core.subsystems[b'ping'] = lambda message: None
+
+    count = 2500
+    for index in range(count):
+        publisher.vip.pubsub.publish('pubsub', 'queues/test',
+                                     message=index).get(timeout=5)
+    gevent.sleep(1)
+    assert received[fast] == range(count)
+
+    stats = publisher.vip.rpc.call(
+        'pubsub', 'get_queue_stats').get(timeout=5)
+    assert stats['queue.slow']['in_flight'] == 1000
+    assert stats['queue.slow']['queued'] == count - 1000
+    assert stats['queue.fast']['queued'] == 0
+    for agent in (publisher, fast, slow):
+        agent.core.stop()
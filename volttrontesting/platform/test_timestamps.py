@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from dateutil.parser import parse
+from dateutil.tz import tzoffset
+
+from volttron.platform.agent.utils import (format_timestamp,
+                                           format_aware_utc_now,
+                                           parse_timestamp_string)
+
+
+@pytest.mark.parametrize('time_stamp', [
+    datetime(2017, 3, 4, 5, 6, 7, 89),
+    datetime(2017, 3, 4, 5, 6, 7),
+    datetime(1850, 1, 1),
+    pytz.UTC.localize(datetime(2017, 3, 4, 5, 6, 7, 123456)),
+    datetime(2017, 3, 4, 5, 6, 7, 1, tzoffset('', -(7 * 3600 + 30 * 60))),
+    datetime(2017, 3, 4, 5, 6, 7, 1, tzoffset('', 5 * 3600 + 45 * 60)),
+    pytz.timezone('US/Pacific').localize(datetime(2017, 7, 4, 5, 6, 7)),
+])
+def test_format_round_trip(time_stamp):
+    time_str = format_timestamp(time_stamp)
+    if time_stamp.year >= 1900:
+        expected = time_stamp.strftime('%Y-%m-%dT%H:%M:%S.%f')
+        if time_stamp.tzinfo is not None:
+            offset = time_stamp.strftime('%z')
+            expected += offset[:3] + ':' + offset[3:]
+        assert time_str == expected
+    assert parse_timestamp_string(time_str) == time_stamp
+
+
+@pytest.mark.parametrize('time_str', [
+    '2017-03-04T05:06:07',
+    '2017-03-04 05:06:07',
+    '2017-03-04T05:06:07.123',
+    '2017-03-04T05:06:07.123456',
+    '2017-03-04T05:06:07.1234567',
+    '2017-03-04T05:06:07Z',
+    '2017-03-04T05:06:07.123Z',
+    '2017-03-04T05:06:07.123456+00:00',
+    '2017-03-04T05:06:07-05:00',
+    '2017-03-04T05:06:07.5+0530',
+    '2017-03-04T05:06:07+05',
+    u'2017-03-04T05:06:07.000001-00:00',
+])
+def test_parse_matches_dateutil(time_str):
+    result = parse_timestamp_string(time_str)
+    expected = parse(time_str)
+    assert result == expected
+    assert (result.tzinfo is None) == (expected.tzinfo is None)
+    if result.tzinfo is not None:
+        assert result.utcoffset() == expected.utcoffset()
+
+
+def test_parse_utc_is_pytz():
+    assert parse_timestamp_string('2017-03-04T05:06:07Z').tzinfo is pytz.UTC
+    assert (parse_timestamp_string('2017-03-04T05:06:07.000000+00:00').tzinfo
+            is pytz.UTC)
+
+
+def test_parse_falls_back_to_dateutil():
+    assert parse_timestamp_string('March 4 2017 5:06') == datetime(2017, 3, 4, 5, 6)
+    with pytest.raises(ValueError):
+        parse_timestamp_string('2017-13-04T05:06:07')
+
+
+def test_format_aware_utc_now():
+    before = pytz.UTC.localize(datetime.utcnow())
+    first = format_aware_utc_now()
+    second = format_aware_utc_now()
+    after = pytz.UTC.localize(datetime.utcnow())
+
+    assert first.endswith('+00:00') and len(first) == 32
+    assert before - timedelta(milliseconds=1) <= parse_timestamp_string(first)
+    assert parse_timestamp_string(first) <= parse_timestamp_string(second)
+    assert parse_timestamp_string(second) <= after + timedelta(milliseconds=1)
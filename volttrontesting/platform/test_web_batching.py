@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+import gevent
+import pytest
+
+from volttron.platform.web import WebApplicationWrapper
+
+ENDPOINT = '/vc/ws/test'
+
+
+class FakeMasterWeb(object):
+    def __init__(self):
+        self.vip = self
+        self.rpc = self
+        self.notified = []
+
+    def call(self, identity, method, *args):
+        return True
+
+    def notify(self, identity, method, *args):
+        self.notified.append((identity, method) + args)
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.environ = {'REMOTE_ADDR': '127.0.0.1'}
+        self.writes = []
+
+    def send_frames(self, data):
+        self.writes.append(data)
+
+
+def _wrapper(**kwargs):
+    masterweb = FakeMasterWeb()
+    app = WebApplicationWrapper(masterweb, '127.0.0.1', 8080, **kwargs)
+    app.create_ws_endpoint(ENDPOINT, 'test.agent')
+    clients = [FakeClient(), FakeClient()]
+    for client in clients:
+        app.client_opened(client, ENDPOINT, 'test.agent')
+    return app, masterweb, clients
+
+
+@pytest.mark.web
+def test_outbound_messages_are_batched():
+    app, _, clients = _wrapper(flush_interval=0.05, batch_size=100)
+    for index in range(10):
+        app.websocket_send(ENDPOINT, 'message {}'.format(index))
+    assert all(not client.writes for client in clients)
+    gevent.sleep(0.1)
+    for client in clients:
+        assert len(client.writes) == 1
+        assert client.writes[0].count('message') == 10
+    assert clients[0].writes == clients[1].writes
+
+
+@pytest.mark.web
+def test_full_batch_is_sent_at_once():
+    app, _, clients = _wrapper(flush_interval=10, batch_size=5)
+    for index in range(12):
+        app.websocket_send(ENDPOINT, 'message {}'.format(index))
+    for client in clients:
+        assert len(client.writes) == 2
+        assert client.writes[1].count('message') == 5
+
+
+@pytest.mark.web
+def test_zero_interval_sends_each_message():
+    app, _, clients = _wrapper(flush_interval=0)
+    app.websocket_send(ENDPOINT, 'one')
+    app.websocket_send(ENDPOINT, 'two')
+    assert len(clients[0].writes) == 2
+
+
+@pytest.mark.web
+def test_inbound_messages_notify_agent_once():
+    app, masterweb, clients = _wrapper(flush_interval=0.05)
+    for index in range(5):
+        app.client_received(ENDPOINT, 'message {}'.format(index))
+    assert masterweb.notified == []
+    gevent.sleep(0.1)
+    expected = ['message {}'.format(index) for index in range(5)]
+    assert masterweb.notified == [('test.agent', 'client.messages',
+                                   ENDPOINT, expected)]
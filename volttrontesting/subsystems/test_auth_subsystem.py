@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+import gevent
+from gevent.event import AsyncResult
+
+from volttron.platform.agent.known_identities import AUTH
+from volttron.platform.vip.agent.subsystems.auth import Auth
+
+
+class FakeSignal(object):
+    def connect(self, receiver, owner):
+        pass
+
+
+class FakeCore(object):
+    onsetup = FakeSignal()
+
+
+class FakeRPC(object):
+    """Answers get_user_to_capabilities with results the test sets."""
+
+    def __init__(self):
+        self.pending = []
+
+        class Message(object):
+            peer = AUTH
+
+        class Context(object):
+            vip_message = Message()
+
+        self.context = Context()
+
+    def call(self, peer, method):
+        result = AsyncResult()
+        self.pending.append(result)
+        return result
+
+
+def test_push_during_fetch_is_not_overwritten():
+    core, rpc = FakeCore(), FakeRPC()
+    auth = Auth(None, core, rpc)
+
+    fetch = gevent.spawn(auth.get_capabilities, 'user')
+    gevent.sleep(0)
+    assert len(rpc.pending) == 1
+
+    auth._update_capabilities({'user': ['new']})
+    rpc.pending[0].set({'user': ['stale']})
+    fetch.join(timeout=1)
+
+    assert auth.get_capabilities('user') == ['new']
+    assert auth.get_capability_set('user') == frozenset(['new'])
+    assert len(rpc.pending) == 1
+
+
+def test_fetch_is_used_without_a_push():
+    core, rpc = FakeCore(), FakeRPC()
+    auth = Auth(None, core, rpc)
+
+    fetch = gevent.spawn(auth.get_capabilities, 'user')
+    gevent.sleep(0)
+    rpc.pending[0].set({'user': ['fetched']})
+    assert fetch.get(timeout=1) == ['fetched']
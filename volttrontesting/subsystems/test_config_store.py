@@ -240,6 +240,58 @@ def test_manage_get_raw_config(config_test_agent, rpc_agent):
 
     assert config == json_config
 
+@pytest.mark.config_store
+def test_manage_get_many_configs(config_test_agent, rpc_agent):
+    json_config = """{"registry": "config://registry.csv"}"""
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                           "config_test_agent", "devices/one", json_config, config_type="json").get()
+    csv_config = "Point Name,Units\npoint1,degreesFahrenheit\n"
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                           "config_test_agent", "registry.csv", csv_config, config_type="csv").get()
+
+    configs = rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_get_many',
+                                     "config_test_agent", ["devices/one", "registry.csv", "missing"],
+                                     raw=True).get()
+    assert configs == {"devices/one": json_config, "registry.csv": csv_config}
+
+    configs = rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_get_many',
+                                     "config_test_agent", raw=False).get()
+    registry = [{"Point Name": "point1", "Units": "degreesFahrenheit"}]
+    assert configs == {"devices/one": {"registry": "config://registry.csv"},
+                       "registry.csv": registry}
+
+    configs = rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_get_many',
+                                     "config_test_agent", ["devices/one"],
+                                     raw=False, resolve=True).get()
+    assert configs == {"devices/one": {"registry": registry}}
+
+    configs = rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_get_many',
+                                     "no_such_agent").get()
+    assert configs == {}
+
+
+@pytest.mark.config_store
+def test_manage_store_publishes_change(config_test_agent, rpc_agent):
+    messages = []
+
+    def on_change(peer, sender, bus, topic, headers, message):
+        messages.append((topic, message))
+
+    rpc_agent.vip.pubsub.subscribe('pubsub', 'config/store/config_test_agent', on_change).get()
+    try:
+        rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                               "config_test_agent", "config", """{"value":1}""", config_type="json").get()
+        rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_delete_config',
+                               "config_test_agent", "config").get()
+        gevent.sleep(0.5)
+    finally:
+        rpc_agent.vip.pubsub.unsubscribe('pubsub', 'config/store/config_test_agent', on_change).get()
+
+    assert messages == [
+        ("config/store/config_test_agent", {"action": "NEW", "config_name": "config"}),
+        ("config/store/config_test_agent", {"action": "DELETE", "config_name": "config"})]
+
+
 @pytest.mark.config_store
 def test_manage_list_config(config_test_agent, rpc_agent):
     json_config = """{"value":1}"""
@@ -294,6 +346,22 @@ def test_agent_get_config(default_config_test_agent, rpc_agent):
 
     assert config == {"value": 1}
 
+@pytest.mark.config_store
+def test_agent_get_many_configs(default_config_test_agent, rpc_agent):
+    json_config = """{"shared":"config://shared"}"""
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                           "config_test_agent", "config1", json_config, config_type="json").get()
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                           "config_test_agent", "config2", json_config, config_type="json").get()
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                           "config_test_agent", "shared", """{"value":1}""", config_type="json").get()
+
+    configs = default_config_test_agent.vip.config.get_many(["config1", "config2", "missing"])
+
+    assert configs == {"config1": {"shared": {"value": 1}},
+                       "config2": {"shared": {"value": 1}}}
+    assert sorted(default_config_test_agent.vip.config.get_many()) == ["config1", "config2", "shared"]
+
 @pytest.mark.config_store
 def test_agent_reference_config_and_callback_order(default_config_test_agent, rpc_agent):
     json_config = """{"config2":"config://config2", "config3":"config://config3"}"""
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+#}}}
+
+import random
+
+import gevent
+import pytest
+
+from volttron.platform.vip import serialization
+from volttron.platform.vip.agent import Agent
+from volttron.platform.vip.serialization import (JSON, MSGPACK,
+                                                 PeerSerializers)
+
+needs_msgpack = pytest.mark.skipif(MSGPACK is None,
+                                   reason='msgpack is not installed')
+
+
+def device_payload(points=500):
+    values = {'Point{}'.format(i): random.random() * 100
+              for i in range(points)}
+    meta = {'Point{}'.format(i): {'type': 'float', 'tz': 'US/Pacific',
+                                  'units': 'degreesFahrenheit'}
+            for i in range(points)}
+    return [values, meta]
+
+
+def record(agent):
+    """Record the serializer of each RPC message agent receives."""
+    received = []
+    serializers = agent.vip.rpc.serializers
+    learn = serializers.learn
+
+    def recording_learn(peer, serializer):
+        received.append(serializer)
+        learn(peer, serializer)
+    serializers.learn = recording_learn
+    return received
+
+
+class OldAgent(Agent):
+    """Agent which behaves like a peer that predates negotiation."""
+
+    def __init__(self, **kwargs):
+        super(OldAgent, self).__init__(**kwargs)
+        self.vip.hello.serializers = None
+        self.vip.rpc.serializers.names = (JSON.name,)
+        self.received = record(self)
+
+
+@needs_msgpack
+@pytest.mark.parametrize('serializer', [JSON, MSGPACK],
+                         ids=lambda s: s.name)
+def test_round_trip(serializer):
+    payload = device_payload()
+    data = serializer.dumps({'jsonrpc': '2.0', 'method': 'pubsub.push',
+                             'params': ['', '', 'devices/all', {}, payload]})
+    assert serialization.detect(data) is serializer
+    assert serializer.loads(data)['params'][4] == payload
+
+
+@needs_msgpack
+def test_msgpack_decodes_like_json():
+    message = {'str': 'text', u'unicode': u'\u2603', 1: 'int key',
+               2.5: 'float key', False: 'bool key', None: 'none key',
+               'nested': [{3: ('tuple', 'value')}], 'number': 10,
+               'float': 1.5, 'null': None, 'list': []}
+    from_json = JSON.loads(JSON.dumps(message))
+    from_msgpack = MSGPACK.loads(MSGPACK.dumps(message))
+    assert from_msgpack == from_json
+
+    def types(obj):
+        if isinstance(obj, dict):
+            return {(key, types(key)): types(value)
+                    for key, value in obj.iteritems()}
+        if isinstance(obj, list):
+            return [types(value) for value in obj]
+        # Depending on the JSON module, ASCII text may decode as str.
+        return basestring if isinstance(obj, basestring) else type(obj)
+    assert types(from_msgpack) == types(from_json)
+
+
+@needs_msgpack
+def test_msgpack_falls_back_to_json():
+    data = MSGPACK.dumps([2 ** 70])
+    assert serialization.detect(data) is JSON
+    assert JSON.loads(data) == [2 ** 70]
+
+
+@needs_msgpack
+def test_negotiation():
+    serializers = PeerSerializers([b'msgpack', b'json'])
+    serializers.update(b'new', b'msgpack,json')
+    serializers.update(b'old', None)
+    serializers.update(b'other', b'cbor,json')
+    assert serializers.get(b'new') is MSGPACK
+    assert serializers.get(b'old') is JSON
+    assert serializers.get(b'other') is JSON
+    assert serializers.get(b'unknown') is None
+
+    json_only = PeerSerializers([b'json'])
+    json_only.update(b'new', b'msgpack,json')
+    json_only.learn(b'other', MSGPACK)
+    assert json_only.get(b'new') is JSON
+    assert json_only.get(b'other') is None
+
+
+def test_available_honors_environment(monkeypatch):
+    monkeypatch.setenv('VOLTTRON_SERIALIZERS', 'json')
+    assert serialization.available() == (b'json',)
+    monkeypatch.setenv('VOLTTRON_SERIALIZERS', 'bogus')
+    assert serialization.available() == (b'json',)
+
+
+@needs_msgpack
+@pytest.mark.subsystems
+def test_mixed_version_rpc(volttron_instance):
+    old = volttron_instance.build_agent(identity='serializer.old',
+                                        agent_class=OldAgent)
+    new = volttron_instance.build_agent(identity='serializer.new')
+    for agent in (old, new):
+        agent.vip.rpc.export(lambda payload: payload, 'echo')
+
+    payload = device_payload()
+    for _ in range(3):
+        assert new.vip.rpc.call(
+            'serializer.old', 'echo', payload).get(timeout=5) == payload
+        assert old.vip.rpc.call(
+            'serializer.new', 'echo', payload).get(timeout=5) == payload
+    assert set(old.received) == {JSON}
+    assert new.vip.rpc.serializers.get('serializer.old') is JSON
+    assert old.vip.rpc.serializers.get('serializer.new') is None
+
+    other = volttron_instance.build_agent(identity='serializer.other')
+    other.vip.rpc.export(lambda payload: payload, 'echo')
+    for _ in range(3):
+        assert new.vip.rpc.call(
+            'serializer.other', 'echo', payload).get(timeout=5) == payload
+    assert new.vip.rpc.serializers.get('serializer.other') is MSGPACK
+    assert other.vip.rpc.serializers.get('serializer.new') is MSGPACK
+    for agent in (old, new, other):
+        agent.core.stop()
+
+
+@needs_msgpack
+@pytest.mark.subsystems
+def test_mixed_version_pubsub(volttron_instance):
+    old = volttron_instance.build_agent(identity='serializer.old.sub',
+                                        agent_class=OldAgent)
+    new = volttron_instance.build_agent(identity='serializer.new.sub')
+    new_received = record(new)
+    publisher = volttron_instance.build_agent()
+    messages = {old: [], new: []}
+    for agent in (old, new):
+        agent.vip.pubsub.subscribe(
+            'pubsub', 'devices/campus/building',
+            lambda peer, sender, bus, topic, headers, message, agent=agent:
+            messages[agent].append(message)).get(timeout=5)
+    gevent.sleep(0.5)
+
+    payload = device_payload()
+    for _ in range(3):
+        publisher.vip.pubsub.publish(
+            'pubsub', 'devices/campus/building/all', message=payload
+        ).get(timeout=5)
+    gevent.sleep(1)
+    assert messages[old] == [payload] * 3
+    assert messages[new] == [payload] * 3
+    assert set(old.received) == {JSON}
+    assert MSGPACK in new_received
+    assert new.vip.rpc.serializers.get('pubsub') is MSGPACK
+    assert publisher.vip.rpc.serializers.get('pubsub') is MSGPACK
+    for agent in (old, new, publisher):
+        agent.core.stop()